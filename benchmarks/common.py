@@ -0,0 +1,106 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+CLASSES = ["cloudy", "desert", "green_area", "water"]
+
+
+def synthetic_dataset(root, images_per_class=50, size=(512, 512), seed=0):
+    """Write a ``<root>/<class>/<image>.jpg`` dataset of random textured images."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    for class_index, class_name in enumerate(CLASSES):
+        class_dir = os.path.join(root, class_name)
+        os.makedirs(class_dir, exist_ok=True)
+        for i in range(images_per_class):
+            # Smooth colour gradients plus noise compress like real tiles, unlike pure noise
+            gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+            base = np.broadcast_to(gradient, (height, width, 3)) * (0.3 + 0.2 * class_index)
+            noise = rng.normal(0, 20, size=(height, width, 3))
+            image = np.clip(base + noise, 0, 255).astype(np.uint8)
+            cv2.imwrite(os.path.join(class_dir, f"{class_name}_{i}.jpg"), image)
+    return root
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Call ``fn`` ``warmup`` + ``repeat`` times and return the timed durations in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples, items=1):
+    """Latency percentiles (ms) and throughput for calls that each process ``items`` items."""
+    samples = np.asarray(samples, dtype=np.float64)
+    return {
+        "mean_ms": float(samples.mean() * 1000),
+        "p50_ms": float(np.percentile(samples, 50) * 1000),
+        "p90_ms": float(np.percentile(samples, 90) * 1000),
+        "p99_ms": float(np.percentile(samples, 99) * 1000),
+        "items_per_second": float(items * len(samples) / samples.sum()),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def write_results(results, path):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(baseline, current, threshold=0.1):
+    """Return the benchmarks that regressed by more than ``threshold`` (a fraction).
+
+    Throughput (``items_per_second``) regresses when it drops, and latency
+    percentiles (``*_ms``) when they grow. Benchmarks missing from either
+    run, or skipped in either, are not compared.
+    """
+    regressions = []
+    for name, result in current.items():
+        old = baseline.get(name)
+        if not isinstance(old, dict) or "skipped" in old or "skipped" in result:
+            continue
+        for metric, value in result.items():
+            previous = old.get(metric)
+            if not isinstance(previous, (int, float)) or previous <= 0:
+                continue
+            if metric == "items_per_second":
+                change = (previous - value) / previous
+            elif metric.endswith("_ms"):
+                change = (value - previous) / previous
+            else:
+                continue
+            if change > threshold:
+                regressions.append(
+                    {"benchmark": name, "metric": metric, "baseline": previous, "current": value, "change": change}
+                )
+    return regressions
@@ -0,0 +1,105 @@
+import tempfile
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CLASSES, measure, summarize
+from src.data.augmentation import BatchAugmenter, ImageAugmenter
+from src.data.cache import TensorCache
+from src.data.decode import IMAGE_SIZE, load_image
+from src.data.index import load_index
+from src.data.preprocessing import normalize_image, resize_image
+from src.data.shards import iter_shard, shard_paths, write_shards
+
+BATCH_SIZE = 32
+
+
+def _read_raw(paths):
+    # Decoded at full resolution, so resize_image has real work to do
+    return [cv2.imread(path) for path in paths]
+
+
+def benchmark_preprocessing(image_paths, repeat=5):
+    """Images/sec of decoding from disk and of the preprocessing.py functions."""
+    images = _read_raw(image_paths)
+    resized = [resize_image(image) for image in images]
+    return {
+        "decode.load_image": summarize(
+            measure(lambda: [load_image(path) for path in image_paths], repeat), len(image_paths)
+        ),
+        "preprocessing.resize_image": summarize(
+            measure(lambda: [resize_image(image) for image in images], repeat), len(images)
+        ),
+        "preprocessing.normalize_image": summarize(
+            measure(lambda: [normalize_image(image) for image in resized], repeat), len(resized)
+        ),
+    }
+
+
+def benchmark_augmentation(image_paths, repeat=5):
+    """Images/sec of per-image ImageAugmenter calls and of in-memory batch augmentation."""
+    images = [load_image(path) for path in image_paths]
+    augmenter = ImageAugmenter(angle=15, x_shift=25, y_shift=25)
+    batch_augmenter = BatchAugmenter(angle=15, x_shift=25, y_shift=25, scale=0.1, seed=0)
+    batches = [
+        np.stack(images[start : start + BATCH_SIZE]) for start in range(0, len(images), BATCH_SIZE)
+    ]
+    return {
+        "augmentation.image_augmenter": summarize(
+            measure(
+                lambda: [augmenter.translate_image(augmenter.rotate_image(image)) for image in images],
+                repeat,
+            ),
+            len(images),
+        ),
+        "augmentation.batch_augmenter": summarize(
+            measure(lambda: [batch_augmenter.augment_batch(batch) for batch in batches], repeat),
+            len(images),
+        ),
+    }
+
+
+def readable_images(data_dir):
+    """Return (paths, labels) of the dataset's images that cv2 can decode."""
+    image_paths, labels = load_index(data_dir).query(CLASSES)
+    readable = [cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8) is not None for path in image_paths]
+    return image_paths[readable].tolist(), labels[readable]
+
+
+def benchmark_loaders(data_dir, image_paths, labels, repeat=3):
+    """Images/sec of the dataset index, the decoded-image cache, tar shards and tf.data."""
+    results = {}
+    results["loader.index"] = summarize(
+        measure(lambda: load_index(data_dir), repeat), 1
+    )
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = TensorCache.open(image_paths, labels, work_dir + "/cache", target_size=IMAGE_SIZE)
+        rows = np.arange(len(cache))
+
+        def read_cache():
+            for start in range(0, len(rows), BATCH_SIZE):
+                cache.read_batch(rows[start : start + BATCH_SIZE])
+
+        results["loader.tensor_cache"] = summarize(measure(read_cache, repeat), len(rows))
+
+        shard_dir = work_dir + "/shards"
+        write_shards(image_paths, labels, shard_dir, shard_size=256)
+
+        def read_shards():
+            for path in shard_paths(shard_dir):
+                for _ in iter_shard(path):
+                    pass
+
+        results["loader.shards"] = summarize(measure(read_shards, repeat), len(image_paths))
+
+    try:
+        from src.model.data_preparation import make_dataset
+    except ImportError as e:
+        results["loader.tf_data"] = {"skipped": str(e)}
+    else:
+        dataset = make_dataset(np.array(image_paths), labels, batch_size=BATCH_SIZE)
+        results["loader.tf_data"] = summarize(
+            measure(lambda: [None for _ in dataset], repeat), len(image_paths)
+        )
+    return results
@@ -0,0 +1,75 @@
+import http.client
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from benchmarks.common import summarize
+
+
+def encode_multipart(field, filename, contents, content_type="image/jpeg"):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + contents + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def run_load(url, image_paths, concurrency=8, requests=500, path="/predict/"):
+    """Send ``requests`` uploads of the given images with ``concurrency`` keep-alive clients.
+
+    Returns the latency percentiles, the achieved requests/sec (as
+    ``items_per_second``) and the number of failed requests.
+    """
+    target = urlparse(url)
+    uploads = []
+    for image_path in image_paths:
+        with open(image_path, "rb") as f:
+            uploads.append(encode_multipart("file", os.path.basename(image_path), f.read()))
+
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def client():
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            body, content_type = uploads[index % len(uploads)]
+            start = time.perf_counter()
+            try:
+                connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                continue
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        return {"skipped": f"No successful requests ({len(errors)} errors)."}
+    result = summarize(latencies)
+    # Throughput of the whole run, not of one client
+    result["items_per_second"] = len(latencies) / elapsed
+    result["errors"] = len(errors)
+    return result
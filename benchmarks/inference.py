@@ -0,0 +1,47 @@
+import numpy as np
+
+from benchmarks.common import measure, summarize
+from src.app.backends import MODEL_EXTENSIONS, load_backend
+from src.app.tta import tta_predict_fn
+from src.data.decode import IMAGE_SIZE
+
+BATCH_SIZES = [1, 8, 32]
+TTA_VIEWS = [4, 8]
+
+
+def benchmark_backend(
+    backend_name, model_path, batch_sizes=BATCH_SIZES, repeat=30, num_threads=None, tta_views=TTA_VIEWS
+):
+    """Per-batch-size latency percentiles and images/sec of one inference backend.
+
+    With ``tta_views``, the smallest batch is also timed with test-time
+    augmentation (views built and predicted in one call) to show its cost.
+    """
+    try:
+        backend = load_backend(backend_name, model_path, num_threads=num_threads)
+    except (ImportError, OSError, ValueError) as e:
+        return {f"inference.{backend_name}": {"skipped": str(e)}}
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, *IMAGE_SIZE[::-1], 3), dtype=np.float32)
+        samples = measure(lambda: backend.predict(batch), repeat=repeat, warmup=3)
+        results[f"inference.{backend_name}.batch_{batch_size}"] = summarize(samples, batch_size)
+
+    batch = rng.random((min(batch_sizes), *IMAGE_SIZE[::-1], 3), dtype=np.float32)
+    for views in tta_views:
+        predict = tta_predict_fn(backend.predict, views)
+        samples = measure(lambda: predict(batch), repeat=repeat, warmup=3)
+        results[f"inference.{backend_name}.tta_{views}.batch_{len(batch)}"] = summarize(samples, len(batch))
+    return results
+
+
+def benchmark_backends(backends, model_stem="best_model", **kwargs):
+    """Benchmark each backend on ``<model_stem><extension>`` (e.g. best_model.tflite)."""
+    results = {}
+    for backend_name in backends:
+        results.update(
+            benchmark_backend(backend_name, model_stem + MODEL_EXTENSIONS[backend_name], **kwargs)
+        )
+    return results
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.common import compare, load_results, synthetic_dataset, write_results
+from benchmarks.data import (benchmark_augmentation, benchmark_loaders,
+                             benchmark_preprocessing, readable_images)
+
+SUITES = ["data", "inference", "http"]
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "test_data")
+
+
+def run_suites(args, data_dir):
+    image_paths, labels = readable_images(data_dir)
+    if not image_paths:
+        raise SystemExit(f"No decodable images in {data_dir}; try --synthetic.")
+    results = {}
+
+    if "data" in args.suites:
+        results.update(benchmark_preprocessing(image_paths, repeat=args.repeat))
+        results.update(benchmark_augmentation(image_paths, repeat=args.repeat))
+        results.update(benchmark_loaders(data_dir, image_paths, labels, repeat=args.repeat))
+
+    if "inference" in args.suites:
+        from benchmarks.inference import benchmark_backends
+
+        results.update(benchmark_backends(args.backends, model_stem=args.model_stem))
+
+    if "http" in args.suites:
+        from benchmarks.http_load import run_load
+
+        results["http.predict"] = run_load(
+            args.url, image_paths, concurrency=args.concurrency, requests=args.requests
+        )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, loading and inference throughput.")
+    parser.add_argument("--suites", nargs="*", choices=SUITES, default=["data"], help="Benchmark suites to run")
+    parser.add_argument("--data_dir", default=None, help="Dataset to benchmark on (defaults to tests/test_data)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic images per class instead of using --data_dir")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions of each benchmark")
+    parser.add_argument("--backends", nargs="*", default=["keras", "tflite", "onnx"], help="Inference backends to benchmark")
+    parser.add_argument("--model_stem", default="best_model", help="Model files to load, without extension")
+    parser.add_argument("--url", default="http://localhost:8000", help="Running API for the http suite")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=500, help="Total HTTP requests")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="Earlier results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown as a fraction (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as data_dir:
+            synthetic_dataset(data_dir, images_per_class=args.synthetic)
+            results = run_suites(args, data_dir)
+    else:
+        results = run_suites(args, args.data_dir or TEST_DATA_DIR)
+
+    write_results(results, args.output)
+    print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(load_results(args.baseline), results, threshold=args.threshold)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['benchmark']} {regression['metric']}: "
+                f"{regression['baseline']:.3f} -> {regression['current']:.3f} "
+                f"({regression['change']:+.0%})"
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
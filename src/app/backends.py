@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+
+# Default model file for each backend, as written by src/model/export.py
+MODEL_EXTENSIONS = {"keras": ".h5", "tflite": ".tflite", "onnx": ".onnx"}
+
+
+class KerasBackend:
+    """Full Keras/TensorFlow model loaded from an .h5 file."""
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+        from keras.models import load_model
+
+        if num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        self.model = load_model(model_path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """TFLite interpreter, using the standalone tflite_runtime package when available.
+
+    Handles both float models and full-integer quantised models, whose int8/uint8
+    inputs and outputs are (de)quantised with the tensor's scale and zero point.
+    """
+
+    def __init__(self, model_path=None, num_threads=None, model_content=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(
+            model_path=model_path, model_content=model_content, num_threads=num_threads
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+    def predict(self, batch):
+        # Resizing the input tensor reallocates, so only do it when the batch size changes
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = len(batch)
+        self.interpreter.set_tensor(self._input["index"], self._quantize_input(batch))
+        self.interpreter.invoke()
+        return self._dequantize_output(self.interpreter.get_tensor(self._output["index"]))
+
+    def _quantize_input(self, batch):
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input["quantization"]
+        info = np.iinfo(dtype)
+        quantized = np.round(batch / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, output):
+        if self._output["dtype"] == np.float32:
+            return output
+        scale, zero_point = self._output["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+
+class OnnxBackend:
+    """ONNX Runtime session on the CPU execution provider."""
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {"keras": KerasBackend, "tflite": TFLiteBackend, "onnx": OnnxBackend}
+
+
+def load_backend(name, model_path, num_threads=None):
+    """Instantiate the inference backend selected by name (keras, tflite or onnx)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}.")
+    return BACKENDS[name](model_path, num_threads=num_threads)
+
+
+def model_version(model_path):
+    """Identify the model file's current contents by its name, mtime and size."""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return os.path.basename(model_path)
+    return f"{os.path.basename(model_path)}@{stat.st_mtime_ns:x}-{stat.st_size:x}"
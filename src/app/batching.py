@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class BatchingEngine:
+    """Group concurrent inference requests into batches for a single model worker.
+
+    Callers ``await submit(image)`` with one preprocessed image. Queued images
+    are flushed as one batch once ``max_batch_size`` images are waiting or the
+    first one has waited ``max_wait_ms``. The blocking ``predict_fn`` runs on a
+    dedicated thread so the event loop keeps serving other clients, and each
+    caller receives its own row of the batch output.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self._in_flight = []
+        self._buffer = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="edge-inference"
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Fail anything still waiting so no caller hangs on shutdown
+        pending = list(self._in_flight)
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Batching engine stopped."))
+        self._in_flight = []
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, image):
+        """Queue a single preprocessed image and wait for its prediction."""
+        if self._task is None:
+            raise RuntimeError("Batching engine is not running.")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued before waiting for stragglers
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _stack(self, images):
+        # Reuse one preallocated batch buffer instead of allocating per batch
+        first = images[0]
+        if (
+            self._buffer is None
+            or self._buffer.shape[1:] != first.shape
+            or self._buffer.dtype != first.dtype
+        ):
+            self._buffer = np.empty((self.max_batch_size, *first.shape), dtype=first.dtype)
+        return np.stack(images, out=self._buffer[: len(images)])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            # Skip callers that gave up (e.g. client disconnected) while queued
+            self._in_flight = [(image, future) for image, future in batch if not future.done()]
+            if not self._in_flight:
+                continue
+
+            try:
+                images = self._stack([image for image, _ in self._in_flight])
+                predictions = await loop.run_in_executor(
+                    self._executor, self.predict_fn, images
+                )
+            except Exception as e:
+                for _, future in self._in_flight:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), prediction in zip(self._in_flight, predictions):
+                    if not future.done():
+                        future.set_result(prediction)
+            self._in_flight = []
@@ -0,0 +1,79 @@
+import os
+
+from src.app.backends import MODEL_EXTENSIONS
+from src.app.tta import MAX_VIEWS, TTA_AGGREGATIONS
+
+# Serving configuration, overridable through environment variables
+# Inference backend: keras, tflite or onnx (see src/app/backends.py)
+BACKEND = os.getenv("EDGE_BACKEND", "keras")
+MODEL_PATH = os.getenv("EDGE_MODEL_PATH", "best_model" + MODEL_EXTENSIONS.get(BACKEND, ".h5"))
+NUM_THREADS = int(os.getenv("EDGE_NUM_THREADS", "0")) or None
+
+# Versioned model registry (see src/app/registry.py). Without EDGE_REGISTRY_DIR
+# the single EDGE_MODEL_PATH file is served. The latest version is served
+# unless EDGE_MODEL_VERSION pins one, and the registry is polled for new
+# versions every EDGE_REGISTRY_POLL_SECONDS (0 disables polling). An optional
+# candidate version receives EDGE_CANDIDATE_WEIGHT of the traffic.
+REGISTRY_DIR = os.getenv("EDGE_REGISTRY_DIR") or None
+MODEL_VERSION = os.getenv("EDGE_MODEL_VERSION") or None
+REGISTRY_POLL_SECONDS = float(os.getenv("EDGE_REGISTRY_POLL_SECONDS", "0"))
+CANDIDATE_VERSION = os.getenv("EDGE_CANDIDATE_VERSION") or None
+CANDIDATE_WEIGHT = float(os.getenv("EDGE_CANDIDATE_WEIGHT", "0"))
+# Token required by /admin/reload in the X-Admin-Token header (unset: admin routes are disabled)
+ADMIN_TOKEN = os.getenv("EDGE_ADMIN_TOKEN") or None
+IMAGE_SIZE = (224, 224)
+# Output order of the model (same as CLASSES in src/model/data_preparation.py)
+CLASS_NAMES = ["cloudy", "desert", "green_area", "water"]
+
+# Dynamic batching: a batch is flushed as soon as it holds MAX_BATCH_SIZE
+# images or the oldest queued request has waited MAX_WAIT_MS milliseconds
+MAX_BATCH_SIZE = int(os.getenv("EDGE_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EDGE_MAX_WAIT_MS", "5"))
+
+# Batch endpoint: parallel decode workers, the cap on images per request and
+# on the uncompressed size of the images in an uploaded archive
+DECODE_WORKERS = int(os.getenv("EDGE_DECODE_WORKERS", str(os.cpu_count() or 1)))
+MAX_FILES_PER_REQUEST = int(os.getenv("EDGE_MAX_FILES_PER_REQUEST", "1024"))
+MAX_ARCHIVE_BYTES = int(os.getenv("EDGE_MAX_ARCHIVE_BYTES", str(512 << 20)))
+
+# Prediction cache: LRU entries kept in memory (0 disables it), their lifetime
+# and an optional directory shared by workers as a second tier, with its size
+# cap and how often expired or excess files are removed from it
+CACHE_MAX_ENTRIES = int(os.getenv("EDGE_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("EDGE_CACHE_TTL_SECONDS", "3600"))
+CACHE_DIR = os.getenv("EDGE_CACHE_DIR") or None
+CACHE_DISK_MAX_BYTES = int(os.getenv("EDGE_CACHE_DISK_MAX_BYTES", str(1 << 30)))
+CACHE_PRUNE_SECONDS = float(os.getenv("EDGE_CACHE_PRUNE_SECONDS", "300"))
+
+# Test-time augmentation, requested per call with ?tta=true: the number of
+# views per image (original included, at most 8) and how their outputs are combined
+TTA_VIEWS = int(os.getenv("EDGE_TTA_VIEWS", "4"))
+TTA_AGGREGATION = os.getenv("EDGE_TTA_AGGREGATION", "mean")
+# Fail at startup rather than on every ?tta=true request
+if not 1 <= TTA_VIEWS <= MAX_VIEWS:
+    raise ValueError(f"EDGE_TTA_VIEWS must be between 1 and {MAX_VIEWS}, got {TTA_VIEWS}.")
+if TTA_AGGREGATION not in TTA_AGGREGATIONS:
+    raise ValueError(
+        f"EDGE_TTA_AGGREGATION must be one of {TTA_AGGREGATIONS}, got '{TTA_AGGREGATION}'."
+    )
+
+# Scene endpoint: uploads are spooled to disk in chunks of this many bytes,
+# up to EDGE_SCENE_MAX_BYTES per scene.
+# Bands deeper than 8 bits are rescaled by their dtype range, or by the
+# per-band percentiles in EDGE_SCENE_STRETCH (e.g. "2,98")
+SCENE_UPLOAD_CHUNK_BYTES = 8 << 20
+SCENE_MAX_BYTES = int(os.getenv("EDGE_SCENE_MAX_BYTES", str(2 << 30)))
+SCENE_STRETCH = (
+    tuple(float(p) for p in os.environ["EDGE_SCENE_STRETCH"].split(","))
+    if os.getenv("EDGE_SCENE_STRETCH")
+    else None
+)
+
+# Similarity search on /similar: an embedding model exported by the pipeline
+# (best_model.embedding.*) and the index built by `python -m src.app.similarity`.
+# Without an embedding model the endpoint is disabled.
+EMBEDDING_MODEL_PATH = os.getenv("EDGE_EMBEDDING_MODEL_PATH") or None
+EMBEDDING_BACKEND = os.getenv("EDGE_EMBEDDING_BACKEND", BACKEND)
+SIMILARITY_INDEX_DIR = os.getenv("EDGE_SIMILARITY_INDEX_DIR", "similarity_index")
+SIMILARITY_N_PROBE = int(os.getenv("EDGE_SIMILARITY_N_PROBE", "8"))
+SIMILARITY_FLUSH_SIZE = int(os.getenv("EDGE_SIMILARITY_FLUSH_SIZE", "1024"))
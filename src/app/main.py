@@ -1,52 +1,694 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from keras.models import load_model
-from keras.preprocessing import image
+import asyncio
+import base64
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, File, Header, Query, Request, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import numpy as np
 
-app = FastAPI()
+from src.app import config, metrics
+from src.app.backends import load_backend
+from src.app.batching import BatchingEngine
+from src.app.metrics import process_rss_bytes, timed
+from src.app.prediction_cache import PredictionCache
+from src.app.registry import ModelServer, open_registry
+from src.app.scene import encode_png, render_class_map, run_scene
+from src.app.similarity import EmbeddingIndex
+from src.app.tta import aggregate, make_tta_augmenter, tta_predict_fn
+from src.app.uploads import extract_images, is_archive, is_image_name
+from src.data.augmentation import augment_image_for_inference
+from src.data.decode import preprocess_into
+from src.model.schema import TooManyImages, parse_tensor_upload
+
+logger = logging.getLogger(__name__)
+
+# Model versions come from a registry directory, or from the single model file
+registry = open_registry(config.REGISTRY_DIR, config.MODEL_PATH)
+
+
+def load_version(version):
+    # Load a model version with the configured backend (Keras, TFLite or ONNX Runtime)
+    model_path = registry.model_path(version, config.BACKEND)
+    return load_backend(config.BACKEND, model_path, num_threads=config.NUM_THREADS)
+
+
+# Serving metrics, rendered on /metrics together with the stage timings
+BATCH_SIZE = metrics.REGISTRY.histogram(
+    "edge_batch_size", "Images per model call.", buckets=metrics.BATCH_SIZE_BUCKETS
+)
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "edge_request_seconds", "Request duration in seconds by route.", ["path"]
+)
+REQUESTS = metrics.REGISTRY.counter(
+    "edge_requests_total", "Requests by route and status code.", ["path", "status"]
+)
+IN_FLIGHT = metrics.REGISTRY.gauge("edge_requests_in_flight", "Requests being processed.")
+QUEUE_DEPTH = metrics.REGISTRY.gauge("edge_queue_depth", "Images waiting for a batch.")
+CACHE_EVENTS = metrics.REGISTRY.counter(
+    "edge_prediction_cache_events_total", "Prediction cache lookups by result.", ["result"]
+)
+MODEL_INFO = metrics.REGISTRY.gauge(
+    "edge_model_info", "Model versions being served (always 1).", ["role", "version"]
+)
+TTA_INFERENCE_SECONDS = metrics.REGISTRY.histogram(
+    "edge_tta_inference_seconds",
+    "Model time of one test-time augmented image (all of its views) by view count.",
+    ["views"],
+)
+RSS_BYTES = metrics.REGISTRY.gauge(
+    "edge_process_resident_memory_bytes", "Resident memory of this worker process."
+)
+
+
+def make_engine(predict_fn):
+    def timed_predict(batch):
+        BATCH_SIZE.observe(len(batch))
+        with timed("predict"):
+            return predict_fn(batch)
+
+    # Requests are batched together and run on a dedicated inference thread
+    return BatchingEngine(
+        timed_predict,
+        max_batch_size=config.MAX_BATCH_SIZE,
+        max_wait_ms=config.MAX_WAIT_MS,
+    )
+
+
+# Repeated uploads are answered from cached outputs of the same model version
+prediction_cache = PredictionCache(
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+    disk_dir=config.CACHE_DIR,
+    disk_max_bytes=config.CACHE_DISK_MAX_BYTES,
+)
+
+# New versions are warmed up with a single image and a full batch, then swapped in
+models = ModelServer(
+    load_version,
+    make_engine,
+    warmup_batches=[
+        np.zeros((size, *config.IMAGE_SIZE[::-1], 3), dtype=np.float32)
+        for size in sorted({1, config.MAX_BATCH_SIZE})
+    ],
+    on_swap=prediction_cache.invalidate,
+)
+
+
+def served_models():
+    return {
+        role: served
+        for role, served in (("active", models.active), ("candidate", models.candidate))
+        if served is not None
+    }
+
+
+QUEUE_DEPTH.set_function(lambda: sum(m.engine.queue_depth for m in served_models().values()))
+MODEL_INFO.set_function(lambda: {(role, m.version): 1 for role, m in served_models().items()})
+
+
+def cache_events():
+    stats = prediction_cache.stats()
+    return {
+        (result,): stats[key]
+        for result, key in (("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))
+    }
+
+
+CACHE_EVENTS.set_function(cache_events)
+RSS_BYTES.set_function(process_rss_bytes)
+
+# Thread pool used to decode the files of a batch upload in parallel
+decode_pool = ThreadPoolExecutor(
+    max_workers=config.DECODE_WORKERS, thread_name_prefix="edge-decode"
+)
+
+
+async def poll_registry():
+    # Swap in newly published versions (or a rewritten model file) without a restart
+    while True:
+        await asyncio.sleep(config.REGISTRY_POLL_SECONDS)
+        try:
+            latest = registry.latest()
+            if latest != models.active.version:
+                candidate = models.candidate
+                await models.load(
+                    latest,
+                    candidate.version if candidate is not None else None,
+                    models.candidate_weight,
+                )
+        except Exception as e:
+            logger.warning(f"Could not load the latest model version: {e}")
+
+
+async def prune_prediction_cache():
+    # Keep the shared disk tier within its TTL and size cap while serving
+    while True:
+        try:
+            await run_in_threadpool(prediction_cache.prune_disk)
+        except Exception as e:
+            logger.warning(f"Could not prune the prediction cache: {e}")
+        await asyncio.sleep(config.CACHE_PRUNE_SECONDS)
+
 
-# Load the model
-model = load_model('best_model.h5')
+# Why the last attempt at the first model load failed, reported on /health/ready
+startup_error = None
+# Longest wait between retries of a failed first load
+STARTUP_RETRY_MAX_SECONDS = 60.0
 
-# Read and preprocess an image
-def read_image_file(file) -> np.ndarray:
+# Embedding model and tile index behind /similar, when EDGE_EMBEDDING_MODEL_PATH is set
+embedding_engine = None
+similarity_index = None
+# Searches read the index's append buffer, so they take turns with appends
+similarity_lock = threading.Lock()
+
+
+async def load_similarity():
+    global embedding_engine, similarity_index
+    backend = await run_in_threadpool(
+        load_backend, config.EMBEDDING_BACKEND, config.EMBEDDING_MODEL_PATH, config.NUM_THREADS
+    )
+    engine = make_engine(backend.predict)
+    await engine.start()
+    embedding_engine = engine
+    if EmbeddingIndex.exists(config.SIMILARITY_INDEX_DIR):
+        similarity_index = EmbeddingIndex(
+            config.SIMILARITY_INDEX_DIR, flush_size=config.SIMILARITY_FLUSH_SIZE
+        )
+
+
+async def load_initial_models():
+    global startup_error
+    # Retry with backoff, so an instance started before a good version was
+    # published (or while the registry was unreachable) still becomes ready
+    delay = 1.0
+    while True:
+        try:
+            await models.load(
+                config.MODEL_VERSION or registry.latest(),
+                config.CANDIDATE_VERSION,
+                config.CANDIDATE_WEIGHT,
+            )
+            break
+        except Exception as e:
+            startup_error = str(e)
+            logger.exception(f"Could not load the initial model version; retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, STARTUP_RETRY_MAX_SECONDS)
+    startup_error = None
+    if config.EMBEDDING_MODEL_PATH:
+        try:
+            await load_similarity()
+        except Exception:
+            # Classification keeps serving; /similar answers 503
+            logger.exception("Could not load the embedding model or similarity index")
+    if config.REGISTRY_POLL_SECONDS > 0 and not config.MODEL_VERSION:
+        await poll_registry()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The server accepts connections straight away; the model (and TensorFlow or
+    # ONNX Runtime with it) loads in the background until /health/ready passes
+    startup_task = asyncio.create_task(load_initial_models())
+    prune_task = asyncio.create_task(prune_prediction_cache()) if config.CACHE_DIR else None
+    yield
+    startup_task.cancel()
+    if prune_task is not None:
+        prune_task.cancel()
+    await models.stop()
+    if embedding_engine is not None:
+        await embedding_engine.stop()
+    if similarity_index is not None:
+        # Tiles appended since the last segment are written out before exiting
+        with similarity_lock:
+            similarity_index.flush()
+    decode_pool.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+if metrics.ENABLED:
+    @app.middleware("http")
+    async def track_requests(request, call_next):
+        IN_FLIGHT.inc(1)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            IN_FLIGHT.inc(-1)
+            # Label by route template so unknown paths cannot grow the series count
+            route = request.scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path)
+            REQUESTS.inc(1, path, str(status))
+
+
+def require_model():
+    # Prediction routes answer 503 until the first model version is warmed up
+    if models.active is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The model is still loading.",
+            headers={"Retry-After": "1"},
+        )
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Admin routes are disabled unless a token is configured, never left open
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin routes are disabled (EDGE_ADMIN_TOKEN is not set).")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+# Decode and preprocess an uploaded image buffer, optionally into a preallocated slot
+def read_image_file(contents, out=None) -> np.ndarray:
     try:
-        img = image.load_img(file, target_size=(224, 224))
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array /= 255.0
-        return img_array
+        with timed("decode"):
+            return preprocess_into(contents, out, target_size=config.IMAGE_SIZE)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
 
 # Define a dictionary to convert numerical predictions to labels
-labels = {0: 'desert', 1: 'water', 2: 'green_area', 3: 'cloudy'}
+labels = dict(enumerate(config.CLASS_NAMES))
+
+
+def prediction_fields(predictions):
+    predicted_index = int(np.argmax(predictions))
+    return {
+        "prediction": labels[predicted_index],
+        "probabilities": {labels[i]: float(p) for i, p in enumerate(predictions)},
+    }
+
+
+def json_response(content):
+    # Encoding happens here, inside the stage, rather than after the handler returns
+    with timed("serialize"):
+        return JSONResponse(content)
+
+
+def format_prediction(filename, predictions):
+    return {"filename": filename, **prediction_fields(predictions)}
+
+
+# Deterministic views for test-time augmentation (see src/app/tta.py)
+tta_augmenter = make_tta_augmenter()
+TTA_INFO = {"views": config.TTA_VIEWS, "aggregation": config.TTA_AGGREGATION}
+
+
+def cache_key_for(contents, model, tta=False):
+    # TTA outputs are cached apart from single-view predictions of the same upload
+    version = f"{model.version}+tta-{config.TTA_VIEWS}-{config.TTA_AGGREGATION}" if tta else model.version
+    return prediction_cache.key(contents, version)
+
 
-@app.post("/predict/")
-async def create_upload_file(file: UploadFile = File(...)):
+def make_tta_views(image):
+    with timed("tta"):
+        return augment_image_for_inference(image, tta_augmenter, config.TTA_VIEWS)
+
+
+async def run_model(model, image, tta=False):
+    """Queue an image (or, with ``tta``, all of its views) for the next batch."""
+    with timed("inference"):
+        if not tta:
+            return await model.engine.submit(image)
+        # The views are cv2 warps, built on the decode pool like decoding itself
+        loop = asyncio.get_running_loop()
+        views = await loop.run_in_executor(decode_pool, make_tta_views, image)
+        with TTA_INFERENCE_SECONDS.time(str(len(views))):
+            # The views are queued together, so they normally share one model call
+            outputs = await asyncio.gather(*(model.engine.submit(view) for view in views))
+            return aggregate(np.stack(outputs), config.TTA_AGGREGATION)
+
+
+@app.post("/predict/", dependencies=[Depends(require_model)])
+async def create_upload_file(file: UploadFile = File(...), tta: bool = False):
     # Ensure the file is an image
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail=f"File '{file.filename}' is not an image.")
 
+    with timed("read"):
+        contents = await file.read()
+
     try:
-        # Read the image file using the utility function
-        image_data = await read_image_file(await file.read())
+        # The request stays on the model version it was routed to, even across a reload
+        async with models.use(contents) as model:
+            # A repeated upload is answered without decoding or running the model
+            cache_key = cache_key_for(contents, model, tta)
+            predictions = await prediction_cache.aget(cache_key)
+            if predictions is None:
+                # Decode off the event loop so other requests keep flowing
+                image_data = await run_in_threadpool(read_image_file, contents)
 
-        # Make prediction
-        predictions = model.predict(image_data)
+                # Queue the image for the next batch and wait for its own prediction
+                predictions = await run_model(model, image_data, tta)
+                await prediction_cache.aput(cache_key, predictions)
 
         # Convert one-hot encoded prediction to label
-        predicted_index = np.argmax(predictions, axis=1)[0]
+        predicted_index = int(np.argmax(predictions))
         predicted_label = labels[predicted_index]
 
-        return {"filename": file.filename, "prediction": predicted_label}
+        response = {
+            "filename": file.filename,
+            "prediction": predicted_label,
+            "model_version": model.version,
+        }
+        if tta:
+            response["tta"] = TTA_INFO
+        return json_response(response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while processing the file: {e}")
 
+
+async def read_batch_uploads(files):
+    """Return (filename, bytes) pairs, expanding a single zip/tar upload into its tiles."""
+    if len(files) == 1 and is_archive(files[0].filename):
+        try:
+            contents = await files[0].read()
+            # Inflating the archive is CPU-bound, so it runs off the event loop
+            return await run_in_threadpool(
+                extract_images,
+                files[0].filename,
+                contents,
+                max_members=config.MAX_FILES_PER_REQUEST,
+                max_bytes=config.MAX_ARCHIVE_BYTES,
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+
+    if len(files) > config.MAX_FILES_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config.MAX_FILES_PER_REQUEST} files are accepted per request.",
+        )
+    with timed("read"):
+        return [(file.filename, await file.read()) for file in files]
+
+
+async def predict_upload(filename, contents, semaphore, tta=False):
+    # Decode on the thread pool, then hand the image to the batching engine
+    async with semaphore:
+        if not is_image_name(filename):
+            return {"filename": filename, "error": "Not an image file."}
+        async with models.use(contents) as model:
+            cache_key = cache_key_for(contents, model, tta)
+            predictions = await prediction_cache.aget(cache_key)
+            if predictions is None:
+                loop = asyncio.get_running_loop()
+                try:
+                    image_data = await loop.run_in_executor(decode_pool, read_image_file, contents)
+                except HTTPException as e:
+                    return {"filename": filename, "error": e.detail}
+                predictions = await run_model(model, image_data, tta)
+                await prediction_cache.aput(cache_key, predictions)
+    return {**format_prediction(filename, predictions), "model_version": model.version}
+
+
+@app.post("/predict/batch", dependencies=[Depends(require_model)])
+async def predict_batch(
+    files: List[UploadFile] = File(...), stream: bool = False, tta: bool = False
+):
+    uploads = await read_batch_uploads(files)
+
+    # Bound the number of decoded images held in memory at any one time
+    semaphore = asyncio.Semaphore(2 * config.MAX_BATCH_SIZE)
+    tasks = [
+        asyncio.ensure_future(predict_upload(filename, contents, semaphore, tta))
+        for filename, contents in uploads
+    ]
+
+    if stream:
+        # Emit one JSON line per file as soon as its prediction completes
+        async def results_as_ndjson():
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                with timed("serialize"):
+                    line = json.dumps(result) + "\n"
+                yield line
+
+        return StreamingResponse(results_as_ndjson(), media_type="application/x-ndjson")
+
+    try:
+        results = await asyncio.gather(*tasks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while processing the batch: {e}")
+    return json_response({"results": results, **({"tta": TTA_INFO} if tta else {})})
+
+
+async def predict_image(model, image, tta=False):
+    # Same cache and batching path as uploads, keyed by the validated pixels
+    cache_key = cache_key_for(image, model, tta)
+    predictions = await prediction_cache.aget(cache_key)
+    if predictions is None:
+        predictions = await run_model(model, image, tta)
+        await prediction_cache.aput(cache_key, predictions)
+    return predictions
+
+
+@app.post("/predict/tensor", dependencies=[Depends(require_model)])
+async def predict_tensor(
+    request: Request,
+    x_tensor_shape: Optional[str] = Header(None),
+    x_tensor_dtype: str = Header("float32"),
+    tta: bool = False,
+):
+    """Classify already-decoded RGB tiles without re-encoding them as images.
+
+    The body is a raw uint8/float32 buffer described by the X-Tensor-Shape and
+    X-Tensor-Dtype headers, a .npy file (application/x-npy), or a JSON object
+    with base64 ``data``, ``shape`` and ``dtype`` (application/json). Tiles must
+    already be resized to the model's input size.
+    """
+    with timed("read"):
+        contents = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        with timed("decode"):
+            images = await run_in_threadpool(
+                parse_tensor_upload,
+                contents,
+                content_type,
+                x_tensor_shape,
+                x_tensor_dtype,
+                max_images=config.MAX_FILES_PER_REQUEST,
+            )
+    except TooManyImages as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tensor: {e}")
+
+    async with models.use(contents) as model:
+        predictions = await asyncio.gather(*(predict_image(model, image, tta) for image in images))
+    return json_response(
+        {
+            "results": [
+                {"index": i, **prediction_fields(p)} for i, p in enumerate(predictions)
+            ],
+            "model_version": model.version,
+            **({"tta": TTA_INFO} if tta else {}),
+        }
+    )
+
+
+@app.post("/predict/scene", dependencies=[Depends(require_model)])
+async def predict_scene(
+    file: UploadFile = File(...),
+    # Small tiles multiply model calls and large cells the raster's size, so both are bounded
+    tile_size: int = Query(config.IMAGE_SIZE[0], ge=32, le=4096),
+    stride: Optional[int] = Query(None, ge=1),
+    overlap: Optional[int] = Query(None, ge=0),
+    raster: bool = False,
+    cell_size: int = Query(8, ge=1, le=64),
+    tta: bool = False,
+):
+    loop = asyncio.get_running_loop()
+
+    async def predict_tiles(engine, batch):
+        return await asyncio.gather(*(engine.submit(tile) for tile in batch))
+
+    # Tiles go through the shared batching engine, interleaved with other requests
+    def predict_fn(batch):
+        future = asyncio.run_coroutine_threadsafe(predict_tiles(model.engine, batch), loop)
+        return np.stack(future.result())
+
+    # Each tile's views join the same engine batches as the tiles
+    tta_seconds = [0.0]
+    tta_fn = tta_predict_fn(predict_fn, config.TTA_VIEWS, config.TTA_AGGREGATION, tta_augmenter)
+
+    def timed_tta_fn(batch):
+        start = time.perf_counter()
+        try:
+            return tta_fn(batch)
+        finally:
+            tta_seconds[0] += time.perf_counter() - start
+
+    # Spool the scene to disk so it is read through windowed or memory-mapped I/O
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix) as scene_file:
+        size = 0
+        while chunk := await file.read(config.SCENE_UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > config.SCENE_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Scenes are limited to {config.SCENE_MAX_BYTES} bytes.",
+                )
+            await run_in_threadpool(scene_file.write, chunk)
+        await run_in_threadpool(scene_file.flush)
+
+        try:
+            async with models.use() as model:
+                report = await run_in_threadpool(
+                    run_scene,
+                    scene_file.name,
+                    timed_tta_fn if tta else predict_fn,
+                    config.CLASS_NAMES,
+                    tile_size=tile_size,
+                    stride=stride,
+                    overlap=overlap,
+                    batch_size=config.MAX_BATCH_SIZE,
+                    stretch=config.SCENE_STRETCH,
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid scene: {e}")
+
+    report["filename"] = file.filename
+    report["model_version"] = model.version
+    if tta:
+        # Building, predicting and combining every tile's views
+        report["tta"] = {**TTA_INFO, "inference_ms": round(1000 * tta_seconds[0], 1)}
+    if raster:
+        png = await run_in_threadpool(
+            lambda: encode_png(render_class_map(report["class_map"], report["classes"], cell_size))
+        )
+        report["raster_png"] = base64.b64encode(png).decode()
+    return report
+
+
+def search_index(embedding, k, n_probe, index_as=None):
+    with similarity_lock:
+        neighbours = similarity_index.search(embedding, k=k, n_probe=n_probe)
+        indexed = index_as is not None and similarity_index.add(embedding[None], [index_as]) > 0
+        return neighbours, indexed, len(similarity_index)
+
+
+@app.post("/similar")
+async def find_similar(
+    file: UploadFile = File(...),
+    k: int = 10,
+    n_probe: int = config.SIMILARITY_N_PROBE,
+    index_as: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Return the ``k`` archived tiles whose embeddings are closest to the upload's.
+
+    ``n_probe`` trades recall for speed: more inverted lists are scanned per
+    query. With ``index_as``, the tile is appended to the index under that key
+    once searched, so newly classified tiles become searchable; this writes
+    to the index and needs the admin token. A key already indexed is not added again.
+    """
+    if not config.EMBEDDING_MODEL_PATH:
+        raise HTTPException(
+            status_code=404, detail="Similarity search is disabled (EDGE_EMBEDDING_MODEL_PATH is not set)."
+        )
+    if embedding_engine is None or similarity_index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The embedding model or similarity index is not loaded.",
+            headers={"Retry-After": "1"},
+        )
+    if k < 1 or n_probe < 1:
+        raise HTTPException(status_code=400, detail="k and n_probe must be positive.")
+    if index_as is not None:
+        require_admin(x_admin_token)
+
+    with timed("read"):
+        contents = await file.read()
+    image_data = await run_in_threadpool(read_image_file, contents)
+    with timed("embed"):
+        embedding = await embedding_engine.submit(image_data)
+    with timed("search"):
+        neighbours, indexed, index_size = await run_in_threadpool(
+            search_index, embedding, k, n_probe, index_as
+        )
+    return {
+        "filename": file.filename,
+        "neighbours": [{"key": key, "similarity": score} for key, score in neighbours],
+        "indexed": indexed,
+        "index_size": index_size,
+    }
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_model(
+    version: Optional[str] = None,
+    candidate_version: Optional[str] = None,
+    candidate_weight: float = 0.0,
+):
+    if not 0.0 <= candidate_weight <= 1.0:
+        raise HTTPException(status_code=400, detail="candidate_weight must be between 0 and 1.")
+
+    version = version or registry.latest()
+    available = registry.versions()
+    for requested in (version, candidate_version):
+        if requested is not None and requested not in available:
+            raise HTTPException(status_code=404, detail=f"Unknown model version '{requested}'.")
+
+    # The new model is loaded and warmed up while the current one keeps serving
+    try:
+        return await models.load(version, candidate_version, candidate_weight)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load model version: {e}")
+
+
 @app.get("/health")
 def health_check():
+    return {
+        "status": "ok",
+        "ready": models.active is not None,
+        "models": models.status(),
+        "cache": prediction_cache.stats(),
+    }
+
+
+@app.get("/health/live")
+def liveness():
+    # The process is up and serving HTTP, whether or not a model is loaded yet
     return {"status": "ok"}
 
+
+@app.get("/health/ready")
+def readiness():
+    if models.active is not None:
+        return {"status": "ready", "models": models.status()}
+    if startup_error is not None:
+        return JSONResponse({"status": "failed", "error": startup_error}, status_code=503)
+    return JSONResponse({"status": "loading"}, status_code=503)
+
+
+@app.get("/metrics")
+def read_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (EDGE_METRICS=0).")
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Edge Prediction API!"}
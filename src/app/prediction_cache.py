@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """Bounded LRU cache of model outputs keyed by upload contents and model version.
+
+    Entries live in memory for at most ``ttl_seconds``, and the least recently
+    used ones are evicted beyond ``max_entries``. With ``disk_dir``, outputs
+    are also written there as small ``.npy`` files. Other workers and later
+    processes sharing the directory can then reuse them, and ``prune_disk``
+    keeps it within the TTL and ``disk_max_bytes``. The model version is
+    part of every key, so a new model never sees an old model's outputs.
+    ``invalidate`` also drops the in-memory entries at once. The cache is meant
+    to be used from the event loop only and is not thread-safe; there, use
+    ``aget`` and ``aput``, which run the disk tier on the default executor.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600.0, disk_dir=None, disk_max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(contents, model_version):
+        """Return a fast content hash of the upload, salted with the model version."""
+        digest = hashlib.blake2b(str(model_version).encode(), digest_size=16)
+        digest.update(contents)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".npy")
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, predictions = entry
+            if time.monotonic() - stored_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return predictions
+            del self._entries[key]
+        return None
+
+    def _disk_result(self, key, predictions):
+        if predictions is not None:
+            self._store(key, predictions)
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+        return predictions
+
+    def get(self, key):
+        """Return the cached predictions for ``key``, or None on a miss."""
+        if not self.enabled:
+            return None
+        predictions = self._get_memory(key)
+        if predictions is not None:
+            return predictions
+        return self._disk_result(key, self._read_disk(key) if self.disk_dir else None)
+
+    async def aget(self, key):
+        """``get`` for the event loop: memory hits return at once, disk reads run on a thread."""
+        if not self.enabled:
+            return None
+        predictions = self._get_memory(key)
+        if predictions is not None:
+            return predictions
+        if self.disk_dir:
+            predictions = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+        return self._disk_result(key, predictions)
+
+    def _put_memory(self, key, predictions):
+        predictions = np.array(predictions, copy=True)
+        predictions.setflags(write=False)
+        self._store(key, predictions)
+        return predictions
+
+    def put(self, key, predictions):
+        if not self.enabled:
+            return
+        predictions = self._put_memory(key, predictions)
+        if self.disk_dir:
+            self._write_disk(key, predictions)
+
+    async def aput(self, key, predictions):
+        """``put`` for the event loop; the disk write runs on a thread and is not waited for."""
+        if not self.enabled:
+            return
+        predictions = self._put_memory(key, predictions)
+        if self.disk_dir:
+            asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, predictions)
+
+    def _store(self, key, predictions):
+        self._entries[key] = (time.monotonic(), predictions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                return None
+            predictions = np.load(path)
+        except (OSError, ValueError):
+            return None
+        predictions.setflags(write=False)
+        return predictions
+
+    def _write_disk(self, key, predictions):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.save(tmp_path, predictions)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best effort; the in-memory entry is already stored
+            pass
+
+    def invalidate(self):
+        """Drop every in-memory entry, e.g. after the model was reloaded."""
+        self._entries.clear()
+
+    def prune_disk(self):
+        """Remove expired on-disk entries, then the oldest beyond ``disk_max_bytes``.
+
+        Returns how many files were removed.
+        """
+        if not self.disk_dir:
+            return 0
+        files = []
+        for root, _, filenames in os.walk(self.disk_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        deadline = time.time() - self.ttl
+        total_bytes = sum(size for _, size, _ in files)
+        # Oldest first: expired files go, then older ones while over the size cap
+        for mtime, size, path in sorted(files):
+            over_size = self.disk_max_bytes is not None and total_bytes > self.disk_max_bytes
+            if mtime >= deadline and not over_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            total_bytes -= size
+        return removed
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
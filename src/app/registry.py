@@ -0,0 +1,216 @@
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+
+from src.app.backends import MODEL_EXTENSIONS, model_version
+
+logger = logging.getLogger(__name__)
+
+MODEL_BASENAME = "best_model"
+
+
+class ModelRegistry:
+    """Local directory of model versions, one sub-directory per version.
+
+    ``<root>/<version>/`` holds the files written by the training pipeline
+    (``best_model.h5``, ``best_model.tflite``, ...). Versions sort by name, so
+    the default timestamp names make the newest version the latest.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        with os.scandir(self.root) as entries:
+            return sorted(
+                entry.name for entry in entries if entry.is_dir() and not entry.name.startswith(".")
+            )
+
+    def latest(self):
+        versions = self.versions()
+        if not versions:
+            raise FileNotFoundError(f"No model versions found in {self.root}.")
+        return versions[-1]
+
+    def model_path(self, version, backend):
+        """Return the model file of ``version`` for a backend (keras, tflite or onnx)."""
+        extension = MODEL_EXTENSIONS[backend]
+        version_dir = os.path.join(self.root, version)
+        preferred = os.path.join(version_dir, MODEL_BASENAME + extension)
+        if os.path.exists(preferred):
+            return preferred
+        candidates = sorted(glob.glob(os.path.join(version_dir, "*" + extension)))
+        if not candidates:
+            raise FileNotFoundError(f"Version '{version}' has no {backend} model in {version_dir}.")
+        return candidates[0]
+
+    def publish(self, model_paths, version=None):
+        """Copy model files into a new version directory and return its name.
+
+        The files are staged in a hidden directory and renamed into place, so
+        servers polling the registry never see a partially written version.
+        """
+        version = version or time.strftime("%Y%m%d-%H%M%S")
+        os.makedirs(self.root, exist_ok=True)
+        staging_dir = os.path.join(self.root, f".{version}.{os.getpid()}.tmp")
+        os.makedirs(staging_dir)
+        for path in model_paths:
+            shutil.copy2(path, staging_dir)
+        os.rename(staging_dir, os.path.join(self.root, version))
+        return version
+
+
+class SingleFileRegistry:
+    """A single model file seen as a registry whose version changes with the file."""
+
+    def __init__(self, model_path):
+        self.path = model_path
+
+    def versions(self):
+        return [model_version(self.path)]
+
+    def latest(self):
+        return model_version(self.path)
+
+    def model_path(self, version, backend):
+        return self.path
+
+
+def open_registry(registry_dir=None, model_path=None):
+    """Return the registry at ``registry_dir``, or a single-file registry for ``model_path``."""
+    if registry_dir:
+        return ModelRegistry(registry_dir)
+    return SingleFileRegistry(model_path)
+
+
+class ServedModel:
+    """One loaded model version with its own batching engine."""
+
+    def __init__(self, version, backend, engine):
+        self.version = version
+        self.backend = backend
+        self.engine = engine
+        self.users = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class ModelServer:
+    """Serve an active model version, and optionally a candidate, with hot swaps.
+
+    ``load`` builds the new backend with ``load_fn(version)`` off the event
+    loop, warms it with ``warmup_batches`` and starts an engine from
+    ``make_engine(predict_fn)``. Only then does it swap the new model in.
+    Requests hold the model they were routed to through ``use``. A replaced
+    model keeps serving those requests and is stopped once the last one
+    finishes. With a candidate, ``candidate_weight`` of the traffic goes to it.
+    The split is decided by a hash of the routing key, so the same upload
+    always reaches the same version.
+    """
+
+    def __init__(self, load_fn, make_engine, warmup_batches=(), on_swap=None):
+        self.load_fn = load_fn
+        self.make_engine = make_engine
+        self.warmup_batches = list(warmup_batches)
+        self.on_swap = on_swap
+        self.active = None
+        self.candidate = None
+        self.candidate_weight = 0.0
+        self._lock = None
+        self._retiring = set()
+
+    def _warm_up(self, version):
+        backend = self.load_fn(version)
+        for batch in self.warmup_batches:
+            backend.predict(batch)
+        return backend
+
+    async def _start(self, version):
+        backend = await asyncio.get_running_loop().run_in_executor(None, self._warm_up, version)
+        engine = self.make_engine(backend.predict)
+        await engine.start()
+        return ServedModel(version, backend, engine)
+
+    async def load(self, version, candidate_version=None, candidate_weight=0.0):
+        """Warm up and swap in ``version`` (and an optional A/B candidate)."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            replaced = []
+            if self.active is None or self.active.version != version:
+                served = await self._start(version)
+                replaced.append(self.active)
+                self.active = served
+                logger.info(f"Serving model version {version}")
+
+            if candidate_version is None or candidate_weight <= 0:
+                replaced.append(self.candidate)
+                self.candidate, self.candidate_weight = None, 0.0
+            else:
+                if self.candidate is None or self.candidate.version != candidate_version:
+                    served = await self._start(candidate_version)
+                    replaced.append(self.candidate)
+                    self.candidate = served
+                self.candidate_weight = candidate_weight
+
+            for served in replaced:
+                if served is not None and served not in (self.active, self.candidate):
+                    self._retire(served)
+            if self.on_swap is not None and any(replaced):
+                self.on_swap()
+        return self.status()
+
+    def _retire(self, served):
+        task = asyncio.ensure_future(self._stop_when_idle(served))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    @staticmethod
+    async def _stop_when_idle(served):
+        await served.idle.wait()
+        await served.engine.stop()
+        logger.info(f"Stopped model version {served.version}")
+
+    def route(self, key=None):
+        """Pick the model for a request; ``key`` (e.g. the upload bytes) decides the A/B split."""
+        if self.candidate is None or key is None:
+            return self.active
+        bucket = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") / 2**64
+        return self.candidate if bucket < self.candidate_weight else self.active
+
+    @asynccontextmanager
+    async def use(self, key=None):
+        """Hold the routed model for the duration of a request."""
+        served = self.route(key)
+        if served is None:
+            raise RuntimeError("No model is loaded.")
+        served.users += 1
+        served.idle.clear()
+        try:
+            yield served
+        finally:
+            served.users -= 1
+            if served.users == 0:
+                served.idle.set()
+
+    async def stop(self):
+        for served in (self.active, self.candidate):
+            if served is not None:
+                await served.engine.stop()
+        for task in list(self._retiring):
+            task.cancel()
+        self.active = self.candidate = None
+
+    def status(self):
+        return {
+            "active": self.active.version if self.active is not None else None,
+            "candidate": self.candidate.version if self.candidate is not None else None,
+            "candidate_weight": self.candidate_weight,
+        }
@@ -0,0 +1,305 @@
+import argparse
+import json
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from src.data.decode import IMAGE_SIZE, normalize_into, resize
+
+logger = logging.getLogger(__name__)
+
+# RGB colour of each class in rendered class maps
+CLASS_COLOURS = {
+    "cloudy": (255, 255, 255),
+    "desert": (237, 201, 175),
+    "green_area": (34, 139, 34),
+    "water": (30, 144, 255),
+}
+UNKNOWN_COLOUR = (0, 0, 0)
+
+# Side of the decimated overview that percentile stretch limits are computed on
+STRETCH_SAMPLE_SIZE = 1024
+
+
+def dtype_limits(dtype):
+    """Value range mapped to 0-255 for a band dtype: the full integer range, or [0, 1] for floats."""
+    if np.issubdtype(dtype, np.integer):
+        # Negative values of signed bands (usually nodata) clip to black
+        return 0.0, float(np.iinfo(dtype).max)
+    return 0.0, 1.0
+
+
+def stretch_limits(sample, percentiles):
+    """Per-band (low, high) values at the given percentiles of a (height, width, bands) sample."""
+    low, high = np.percentile(sample.reshape(-1, sample.shape[-1]), percentiles, axis=0)
+    return low.astype(np.float32), high.astype(np.float32)
+
+
+def to_uint8(window, low, high):
+    """Linearly map each band from [low, high] to 0-255, e.g. 16-bit satellite bands to RGB."""
+    if window.dtype == np.uint8 and np.all(low == 0) and np.all(high == 255):
+        return window
+    scale = 255.0 / np.maximum(np.asarray(high, dtype=np.float32) - low, 1e-6)
+    return np.clip((window.astype(np.float32) - low) * scale, 0, 255).astype(np.uint8)
+
+
+class ArrayScene:
+    """Scene held in a (height, width, channels) RGB array.
+
+    The array may be a ``np.memmap``; windows are then read from disk on
+    demand and the scene never has to fit in memory. Bands other than uint8
+    are rescaled by their dtype range, or by a per-band percentile
+    ``stretch`` such as ``(2, 98)`` computed once over the whole scene.
+    """
+
+    def __init__(self, array, stretch=None):
+        if array.ndim != 3 or array.shape[2] < 3:
+            raise ValueError(f"Expected a (height, width, 3) scene array, got shape {array.shape}.")
+        self.array = array
+        self.height, self.width = array.shape[:2]
+        if stretch is not None:
+            step = max(1, max(self.height, self.width) // STRETCH_SAMPLE_SIZE)
+            self.limits = stretch_limits(array[::step, ::step, :3], stretch)
+        else:
+            self.limits = dtype_limits(array.dtype)
+
+    def read(self, x, y, width, height):
+        return np.ascontiguousarray(to_uint8(self.array[y : y + height, x : x + width, :3], *self.limits))
+
+    def close(self):
+        pass
+
+
+class RasterioScene:
+    """GeoTIFF (or any GDAL raster) scene read window by window with rasterio.
+
+    Bands are rescaled to uint8 like ``ArrayScene``; the percentile
+    ``stretch`` is computed on a decimated read of the whole raster.
+    """
+
+    def __init__(self, path, stretch=None):
+        import rasterio
+        from rasterio.windows import Window
+
+        self._window = Window
+        self.dataset = rasterio.open(path)
+        self.bands = [1, 2, 3] if self.dataset.count >= 3 else [1, 1, 1]
+        self.width, self.height = self.dataset.width, self.dataset.height
+        if stretch is not None:
+            step = max(1, max(self.height, self.width) // STRETCH_SAMPLE_SIZE)
+            overview = self.dataset.read(
+                self.bands, out_shape=(3, max(1, self.height // step), max(1, self.width // step))
+            )
+            self.limits = stretch_limits(np.moveaxis(overview, 0, -1), stretch)
+        else:
+            self.limits = dtype_limits(np.dtype(self.dataset.dtypes[0]))
+
+    def read(self, x, y, width, height):
+        window = self.dataset.read(self.bands, window=self._window(x, y, width, height))
+        return np.ascontiguousarray(to_uint8(np.moveaxis(window, 0, -1), *self.limits))
+
+    def close(self):
+        self.dataset.close()
+
+
+def open_scene(path, stretch=None):
+    """Open a scene for windowed reads: ``.npy`` is memory-mapped, GeoTIFF uses rasterio.
+
+    Other formats (and GeoTIFF without rasterio installed) are decoded whole with cv2.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return ArrayScene(np.load(path, mmap_mode="r"), stretch)
+    if extension in (".tif", ".tiff"):
+        try:
+            return RasterioScene(path, stretch)
+        except ImportError:
+            logger.warning("rasterio is not installed; decoding the whole scene into memory")
+
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read scene '{os.path.basename(path)}'.")
+    return ArrayScene(image[..., ::-1], stretch)
+
+
+def resolve_stride(tile_size, stride=None, overlap=None):
+    """Return the tile stride, given either directly or as the overlap between tiles."""
+    if stride is not None and overlap is not None:
+        raise ValueError("Give either a stride or an overlap, not both.")
+    if overlap is not None:
+        stride = tile_size - overlap
+    stride = stride or tile_size
+    if tile_size <= 0 or not 0 < stride <= tile_size:
+        raise ValueError(
+            "Tile size must be positive and the stride between 1 and the tile size "
+            "(overlap below the tile size)."
+        )
+    return stride
+
+
+def tile_origins(size, tile_size, stride):
+    """Return tile offsets along one axis; the last tile is moved flush with the edge."""
+    if tile_size <= 0 or stride <= 0:
+        raise ValueError("Tile size and stride must be positive.")
+    if size <= tile_size:
+        return [0]
+    origins = list(range(0, size - tile_size + 1, stride))
+    if origins[-1] != size - tile_size:
+        origins.append(size - tile_size)
+    return origins
+
+
+def _pad(window, height, width):
+    # Only scenes smaller than one tile need padding
+    if window.shape[0] == height and window.shape[1] == width:
+        return window
+    return np.pad(
+        window, ((0, height - window.shape[0]), (0, width - window.shape[1]), (0, 0)), mode="edge"
+    )
+
+
+def classify_scene(
+    scene, predict_fn, tile_size=IMAGE_SIZE[0], stride=None, batch_size=32, target_size=IMAGE_SIZE
+):
+    """Classify every ``tile_size`` square tile of a scene, stepping by ``stride`` pixels.
+
+    The scene is read one strip of tiles at a time, and tiles are resized to
+    the model input, normalised into a reused batch buffer and passed to
+    ``predict_fn`` ``batch_size`` at a time. Returns the class probabilities
+    as a (rows, cols, classes) array with the x and y tile origins.
+    """
+    stride = resolve_stride(tile_size, stride)
+    xs = tile_origins(scene.width, tile_size, stride)
+    ys = tile_origins(scene.height, tile_size, stride)
+    batch = np.empty((batch_size, target_size[1], target_size[0], 3), dtype=np.float32)
+    probabilities = None
+    pending = []
+
+    def flush():
+        nonlocal probabilities
+        predictions = np.asarray(predict_fn(batch[: len(pending)]), dtype=np.float32)
+        if probabilities is None:
+            probabilities = np.empty((len(ys), len(xs), predictions.shape[-1]), dtype=np.float32)
+        rows, cols = zip(*pending)
+        probabilities[rows, cols] = predictions
+        pending.clear()
+
+    for row, y in enumerate(ys):
+        strip = scene.read(0, y, scene.width, min(tile_size, scene.height - y))
+        strip = _pad(strip, tile_size, max(scene.width, tile_size))
+        for col, x in enumerate(xs):
+            tile = strip[:, x : x + tile_size]
+            normalize_into(resize(tile, target_size), out=batch[len(pending)])
+            pending.append((row, col))
+            if len(pending) == batch_size:
+                flush()
+    if pending:
+        flush()
+
+    return probabilities, xs, ys
+
+
+def scene_report(scene, probabilities, xs, ys, tile_size, stride, class_names):
+    """Summarise tile probabilities as a JSON-serialisable class map."""
+    class_map = probabilities.argmax(axis=-1)
+    counts = np.bincount(class_map.ravel(), minlength=len(class_names))
+    return {
+        "width": scene.width,
+        "height": scene.height,
+        "tile_size": tile_size,
+        "stride": stride,
+        "rows": len(ys),
+        "cols": len(xs),
+        "tile_x": xs,
+        "tile_y": ys,
+        "classes": list(class_names),
+        "class_map": class_map.tolist(),
+        "confidence": np.round(probabilities.max(axis=-1), 4).tolist(),
+        "class_fractions": {
+            name: float(count) / class_map.size for name, count in zip(class_names, counts)
+        },
+    }
+
+
+def render_class_map(class_map, class_names, cell_size=8):
+    """Colour-code a (rows, cols) class map as an RGB uint8 raster, ``cell_size`` pixels per tile."""
+    palette = np.array(
+        [CLASS_COLOURS.get(name, UNKNOWN_COLOUR) for name in class_names], dtype=np.uint8
+    )
+    raster = palette[np.asarray(class_map)]
+    return np.repeat(np.repeat(raster, cell_size, axis=0), cell_size, axis=1)
+
+
+def encode_png(raster):
+    ok, encoded = cv2.imencode(".png", np.ascontiguousarray(raster[..., ::-1]))
+    if not ok:
+        raise ValueError("Could not encode the class map raster.")
+    return encoded.tobytes()
+
+
+def run_scene(
+    path,
+    predict_fn,
+    class_names,
+    tile_size=IMAGE_SIZE[0],
+    stride=None,
+    overlap=None,
+    batch_size=32,
+    stretch=None,
+):
+    """Open, tile and classify the scene at ``path`` and return its ``scene_report``."""
+    stride = resolve_stride(tile_size, stride, overlap)
+    scene = open_scene(path, stretch)
+    try:
+        probabilities, xs, ys = classify_scene(scene, predict_fn, tile_size, stride, batch_size)
+        return scene_report(scene, probabilities, xs, ys, tile_size, stride, class_names)
+    finally:
+        scene.close()
+
+
+if __name__ == "__main__":
+    from src.app import config
+    from src.app.backends import load_backend
+    from src.app.tta import TTA_AGGREGATIONS, tta_predict_fn
+
+    parser = argparse.ArgumentParser(description="Classify a large scene tile by tile.")
+    parser.add_argument("scene", help="Scene image: .npy (memory-mapped), GeoTIFF or any cv2-readable image")
+    parser.add_argument("--output", default=None, help="Path of the JSON class map (printed if omitted)")
+    parser.add_argument("--raster", default=None, help="Path of a colour-coded PNG class map to write")
+    parser.add_argument("--cell_size", type=int, default=8, help="Raster pixels per tile")
+    parser.add_argument("--tile_size", type=int, default=config.IMAGE_SIZE[0], help="Tile side in scene pixels")
+    parser.add_argument("--stride", type=int, default=None, help="Step between tiles (defaults to the tile size)")
+    parser.add_argument("--overlap", type=int, default=None, help="Overlap between neighbouring tiles, instead of --stride")
+    parser.add_argument("--batch_size", type=int, default=config.MAX_BATCH_SIZE, help="Tiles per model call")
+    parser.add_argument("--backend", default=config.BACKEND, help="Inference backend: keras, tflite or onnx")
+    parser.add_argument("--model_path", default=config.MODEL_PATH, help="Model file for the backend")
+    parser.add_argument("--stretch", type=float, nargs=2, default=config.SCENE_STRETCH, metavar=("LOW", "HIGH"), help="Per-band percentile stretch of non-uint8 scenes, e.g. 2 98 (default: the dtype range)")
+    parser.add_argument("--tta_views", type=int, default=1, help="Test-time augmentation views per tile (1 disables TTA)")
+    parser.add_argument("--tta_aggregation", default=config.TTA_AGGREGATION, choices=TTA_AGGREGATIONS, help="How the views' outputs are combined")
+    args = parser.parse_args()
+
+    backend = load_backend(args.backend, args.model_path, num_threads=config.NUM_THREADS)
+    predict_fn = backend.predict
+    if args.tta_views > 1:
+        predict_fn = tta_predict_fn(predict_fn, args.tta_views, args.tta_aggregation)
+    report = run_scene(
+        args.scene,
+        predict_fn,
+        config.CLASS_NAMES,
+        tile_size=args.tile_size,
+        stride=args.stride,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        stretch=args.stretch,
+    )
+
+    if args.raster:
+        with open(args.raster, "wb") as f:
+            f.write(encode_png(render_class_map(report["class_map"], report["classes"], args.cell_size)))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f)
+    else:
+        print(json.dumps(report))
@@ -0,0 +1,180 @@
+import argparse
+import logging
+import mmap
+import os
+import signal
+import socket
+import time
+
+from src.app import config
+from src.app.registry import open_registry
+
+logger = logging.getLogger(__name__)
+
+# Per-worker thread budget, read by TensorFlow, OpenMP and the inference backends
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "EDGE_NUM_THREADS"]
+INTEROP_ENV_VAR = "TF_NUM_INTEROP_THREADS"
+RESTART_DELAY_SECONDS = 1.0
+
+
+def served_model_files():
+    """Return the model files the workers will load (active and candidate versions)."""
+    registry = open_registry(config.REGISTRY_DIR, config.MODEL_PATH)
+    try:
+        versions = [config.MODEL_VERSION or registry.latest(), config.CANDIDATE_VERSION]
+        return [registry.model_path(version, config.BACKEND) for version in versions if version]
+    except OSError as e:
+        # Nothing published yet: the workers keep retrying until a version appears
+        logger.warning(f"Skipping the page-cache warm-up: {e}")
+        return []
+
+
+def preload_model_files(paths):
+    """Map model files read-only and have the kernel read them into the page cache.
+
+    Forked workers then find the files already cached. Backends that map
+    their model file (TFLite does) share those physical pages instead of
+    each reading a private copy. The returned maps keep the files mapped for
+    as long as the caller holds them.
+    """
+    maps = []
+    for path in paths:
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            continue
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_WILLNEED"):
+            mapped.madvise(mmap.MADV_WILLNEED)
+        maps.append(mapped)
+    return maps
+
+
+def cpu_sets(n_workers, threads_per_worker):
+    """Split the CPUs available to this process into one set per worker."""
+    cpus = sorted(os.sched_getaffinity(0))
+    return [
+        {cpus[(index * threads_per_worker + offset) % len(cpus)] for offset in range(threads_per_worker)}
+        for index in range(n_workers)
+    ]
+
+
+def _run_worker(sock, threads, interop_threads, cpus, log_level):
+    # Runs in the forked child, before TensorFlow or the model are imported
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ[INTEROP_ENV_VAR] = str(interop_threads)
+    config.NUM_THREADS = threads
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config("src.app.main:app", log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve(
+    host="0.0.0.0",
+    port=8000,
+    workers=None,
+    threads_per_worker=None,
+    interop_threads=1,
+    pin_cpus=False,
+    log_level="info",
+):
+    """Run the API in ``workers`` forked processes sharing one listening socket.
+
+    The parent binds the socket and pre-reads the model files, then forks the
+    workers. It never imports TensorFlow, because its runtime is not
+    fork-safe. Each worker gets ``threads_per_worker`` intra-op threads (all
+    cores split evenly by default) and ``interop_threads`` inter-op threads.
+    With ``pin_cpus``, each worker is bound to its own set of cores. The
+    kernel spreads incoming connections across the workers, and a worker
+    that dies is restarted.
+
+    Only backends that map their model file (TFLite) share its pages between
+    workers. The Keras and ONNX Runtime backends read the weights into each
+    worker's own memory, so their footprint grows with ``workers``.
+    """
+    workers = workers or os.cpu_count() or 1
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    worker_cpus = cpu_sets(workers, threads) if pin_cpus else [None] * workers
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    model_maps = preload_model_files(served_model_files())
+    logger.info(f"Pre-read {len(model_maps)} model file(s); starting {workers} worker(s) on {host}:{port}")
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                _run_worker(sock, threads, interop_threads, worker_cpus[index], log_level)
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}; restarting it")
+            time.sleep(RESTART_DELAY_SECONDS)
+            spawn(index)
+
+    sock.close()
+    for mapped in model_maps:
+        mapped.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the prediction API from several worker processes.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to the number of cores)")
+    parser.add_argument("--threads_per_worker", type=int, default=None, help="Intra-op threads per worker (defaults to cores / workers)")
+    parser.add_argument("--interop_threads", type=int, default=1, help="Inter-op threads per worker")
+    parser.add_argument("--pin_cpus", action="store_true", help="Bind each worker to its own set of cores")
+    parser.add_argument("--log_level", default="info", help="Uvicorn log level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        interop_threads=args.interop_threads,
+        pin_cpus=args.pin_cpus,
+        log_level=args.log_level,
+    )
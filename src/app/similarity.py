@@ -0,0 +1,402 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from src.data.decode import IMAGE_SIZE, load_image
+from src.data.index import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_METADATA_NAME = "index.json"
+SEGMENTS_DIR = "segments"
+# Embeddings that a new index's centroids are trained on; later ones are streamed to disk
+MAX_TRAINING_VECTORS = 50_000
+# Rows that compaction copies at a time
+MERGE_CHUNK_ROWS = 65536
+
+
+def normalize(vectors):
+    """L2-normalise rows so that a dot product is the cosine similarity."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_n_lists(count):
+    # About 4 * sqrt(n) inverted lists keeps both the centroid scan and each list small
+    return int(np.clip(4 * np.sqrt(count), 1, min(count, 4096)))
+
+
+def kmeans(vectors, n_clusters, iterations=20, seed=0):
+    """Spherical k-means: centroids of unit vectors, compared by dot product."""
+    vectors = normalize(vectors)
+    n_clusters = min(n_clusters, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)]
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # An empty cluster restarts from a random vector
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids, chunk_size=65536):
+    """Index of the most similar centroid of each (normalised) vector."""
+    lists = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        lists[start : start + chunk_size] = np.argmax(vectors[start : start + chunk_size] @ centroids.T, axis=1)
+    return lists
+
+
+class Segment:
+    """An immutable batch of indexed vectors, memory-mapped and sorted by inverted list.
+
+    The rows of list ``i`` are ``offsets[i]:offsets[i + 1]``, so a search only
+    reads the lists it probes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(path, "keys.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    @staticmethod
+    def _new_path(segments_dir):
+        name = f"segment-{time.time_ns():x}-{os.getpid()}"
+        # Written under a temporary name and renamed, so readers never see half a segment
+        temporary_path = os.path.join(segments_dir, "." + name)
+        os.makedirs(temporary_path)
+        return temporary_path, os.path.join(segments_dir, name)
+
+    @staticmethod
+    def write(segments_dir, vectors, keys, lists, n_lists):
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=n_lists))])
+        temporary_path, path = Segment._new_path(segments_dir)
+        np.save(os.path.join(temporary_path, "vectors.npy"), vectors[order].astype(np.float16))
+        np.save(os.path.join(temporary_path, "keys.npy"), np.asarray(keys, dtype=str)[order])
+        np.save(os.path.join(temporary_path, "offsets.npy"), offsets.astype(np.int64))
+        os.rename(temporary_path, path)
+        return path
+
+    @staticmethod
+    def merge(segments_dir, segments, chunk_rows=MERGE_CHUNK_ROWS):
+        """Write the rows of several segments as one, copying a few inverted lists at a time."""
+        offsets = np.concatenate([[0], np.cumsum(sum(np.diff(segment.offsets) for segment in segments))])
+        n_lists, n_rows = len(offsets) - 1, int(offsets[-1])
+        key_dtype = max((segment.keys.dtype for segment in segments), key=lambda dtype: dtype.itemsize)
+        temporary_path, path = Segment._new_path(segments_dir)
+        vectors = open_memmap(
+            os.path.join(temporary_path, "vectors.npy"),
+            mode="w+",
+            dtype=np.float16,
+            shape=(n_rows, segments[0].vectors.shape[1]),
+        )
+        keys = open_memmap(os.path.join(temporary_path, "keys.npy"), mode="w+", dtype=key_dtype, shape=(n_rows,))
+
+        start = 0
+        while start < n_lists:
+            # Whole lists up to about chunk_rows rows (at least one list)
+            end = int(np.searchsorted(offsets, offsets[start] + chunk_rows, side="right")) - 1
+            end = min(max(end, start + 1), n_lists)
+            parts, part_keys, part_lists = [], [], []
+            for segment in segments:
+                first, last = segment.offsets[start], segment.offsets[end]
+                parts.append(segment.vectors[first:last])
+                part_keys.append(segment.keys[first:last])
+                part_lists.append(np.repeat(np.arange(start, end), np.diff(segment.offsets[start : end + 1])))
+            # A stable sort by list keeps each list's rows in segment order
+            order = np.argsort(np.concatenate(part_lists), kind="stable")
+            vectors[offsets[start] : offsets[end]] = np.concatenate(parts)[order]
+            keys[offsets[start] : offsets[end]] = np.concatenate(part_keys)[order]
+            start = end
+
+        vectors.flush()
+        keys.flush()
+        del vectors, keys
+        np.save(os.path.join(temporary_path, "offsets.npy"), offsets.astype(np.int64))
+        os.rename(temporary_path, path)
+        return path
+
+    def rows(self, lists):
+        """Row indices of the given inverted lists."""
+        ranges = [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+
+class EmbeddingIndex:
+    """Approximate nearest-neighbour index of tile embeddings stored on disk.
+
+    Vectors are normalised and stored as float16 in an inverted-file (IVF)
+    layout: k-means centroids split the space into lists, and a query scores
+    only the rows of its ``n_probe`` closest lists. Appends are buffered and
+    written as new immutable segments, so the index grows without rebuilds,
+    and several processes can append to it concurrently. Keys already in the
+    index (as seen by this process) are not added again. ``compact`` merges
+    segments once many small ones have accumulated.
+    """
+
+    def __init__(self, directory, flush_size=1024):
+        self.directory = directory
+        self.flush_size = flush_size
+        with open(os.path.join(directory, INDEX_METADATA_NAME)) as f:
+            self.metadata = json.load(f)
+        self.centroids = np.load(os.path.join(directory, "centroids.npy"))
+        self.segments_dir = os.path.join(directory, SEGMENTS_DIR)
+        self._segments = {}
+        self._segments_mtime = None
+        self._keys = set()
+        self._pending_vectors = []
+        self._pending_keys = []
+
+    @classmethod
+    def create(cls, directory, training_vectors, n_lists=None, seed=0, **kwargs):
+        """Train the inverted-list centroids on a sample of vectors and create an empty index."""
+        training_vectors = np.asarray(training_vectors, dtype=np.float32)
+        if len(training_vectors) > MAX_TRAINING_VECTORS:
+            sample = np.random.default_rng(seed).choice(len(training_vectors), MAX_TRAINING_VECTORS, replace=False)
+            training_vectors = training_vectors[sample]
+        # k-means needs at least one training vector per list
+        n_lists = min(n_lists or default_n_lists(len(training_vectors)), len(training_vectors))
+        os.makedirs(os.path.join(directory, SEGMENTS_DIR), exist_ok=True)
+        np.save(os.path.join(directory, "centroids.npy"), kmeans(training_vectors, n_lists, seed=seed))
+        metadata = {"version": INDEX_VERSION, "dim": training_vectors.shape[1], "n_lists": n_lists}
+        with open(os.path.join(directory, INDEX_METADATA_NAME), "w") as f:
+            json.dump(metadata, f)
+        return cls(directory, **kwargs)
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, INDEX_METADATA_NAME))
+
+    def segments(self):
+        """The index's segments, re-listed only when another process has added or merged some."""
+        mtime = os.stat(self.segments_dir).st_mtime_ns
+        if mtime != self._segments_mtime:
+            paths = sorted(glob.glob(os.path.join(self.segments_dir, "segment-*")))
+            segments = {}
+            for path in paths:
+                segments[path] = self._segments.get(path)
+                if segments[path] is None:
+                    segments[path] = Segment(path)
+                    # Compaction only regroups existing keys, so the set only grows
+                    self._keys.update(segments[path].keys.tolist())
+            self._segments = segments
+            self._segments_mtime = mtime
+        return list(self._segments.values())
+
+    def __len__(self):
+        return sum(len(segment.keys) for segment in self.segments()) + len(self._pending_keys)
+
+    def keys(self):
+        self.segments()
+        return set(self._keys)
+
+    def __contains__(self, key):
+        self.segments()
+        return key in self._keys
+
+    def add(self, vectors, keys):
+        """Append vectors with their keys (e.g. tile paths); they are searchable straight away.
+
+        Keys already in the index, or repeated within ``keys``, are skipped.
+        Returns the number of vectors added.
+        """
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.metadata["dim"]:
+            raise ValueError(f"Expected {self.metadata['dim']}-dimensional vectors, got {vectors.shape[1]}.")
+        if len(vectors) != len(keys):
+            raise ValueError("Every vector needs exactly one key.")
+        self.segments()
+        new = []
+        for i, key in enumerate(keys):
+            if key not in self._keys:
+                self._keys.add(key)
+                new.append(i)
+        if not new:
+            return 0
+        self._pending_vectors.append(vectors[new])
+        self._pending_keys.extend(keys[i] for i in new)
+        if len(self._pending_keys) >= self.flush_size:
+            self.flush()
+        return len(new)
+
+    def flush(self):
+        """Write buffered appends as a new segment."""
+        if not self._pending_keys:
+            return None
+        vectors = np.concatenate(self._pending_vectors)
+        path = Segment.write(
+            self.segments_dir,
+            vectors,
+            self._pending_keys,
+            assign_lists(vectors, self.centroids),
+            self.metadata["n_lists"],
+        )
+        self._pending_vectors, self._pending_keys = [], []
+        return path
+
+    def compact(self):
+        """Merge all current segments into one."""
+        self.flush()
+        segments = self.segments()
+        if len(segments) <= 1:
+            return
+        # Every segment is already sorted by the same lists, so rows are only regrouped
+        Segment.merge(self.segments_dir, segments)
+        # Readers that still map the old segments keep working until they re-list
+        for segment in segments:
+            shutil.rmtree(segment.path)
+
+    def search(self, query, k=10, n_probe=8):
+        """Return the ``k`` most similar (key, cosine similarity) pairs to a query vector."""
+        query = normalize(query)[0]
+        probe = np.argsort(-(self.centroids @ query))[:n_probe]
+        scores, keys = [], []
+        for segment in self.segments():
+            rows = segment.rows(probe)
+            if len(rows):
+                segment_scores = segment.vectors[rows].astype(np.float32) @ query
+                top = _top_k(segment_scores, k)
+                scores.append(segment_scores[top])
+                keys.append(segment.keys[rows[top]])
+        if self._pending_keys:
+            pending_scores = np.concatenate(self._pending_vectors) @ query
+            scores.append(pending_scores)
+            keys.append(np.asarray(self._pending_keys))
+        if not scores:
+            return []
+        scores, keys = np.concatenate(scores), np.concatenate(keys)
+        top = _top_k(scores, k)
+        return [(str(keys[i]), float(scores[i])) for i in top]
+
+
+def _top_k(scores, k):
+    # argpartition finds the top k in linear time; only those k are sorted
+    if len(scores) > k:
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+def list_tiles(root):
+    """Paths of all images under ``root``, in any folder layout."""
+    paths = []
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    paths.append(entry.path)
+    return sorted(paths)
+
+
+def extract_embeddings(predict_fn, image_paths, batch_size=64):
+    """Yield (paths, embeddings) batches, decoding each batch into one preallocated array."""
+    batch = np.empty((batch_size, *IMAGE_SIZE[::-1], 3), dtype=np.float32)
+    for start in range(0, len(image_paths), batch_size):
+        paths, decoded = [], 0
+        for path in image_paths[start : start + batch_size]:
+            try:
+                load_image(path, out=batch[decoded])
+            except ValueError:
+                logger.warning(f"Could not decode {path}. Skipping.")
+                continue
+            paths.append(path)
+            decoded += 1
+        if decoded:
+            yield paths, np.asarray(predict_fn(batch[:decoded]))
+
+
+def index_tiles(
+    index_dir,
+    image_paths,
+    predict_fn,
+    batch_size=64,
+    n_lists=None,
+    training_size=MAX_TRAINING_VECTORS,
+    seed=0,
+):
+    """Embed the tiles not yet in the index and append them, creating the index if needed.
+
+    Embeddings are streamed to disk batch by batch, so memory stays bounded
+    however many tiles there are. A new index first trains its centroids on
+    the embeddings of up to ``training_size`` tiles, drawn in random order so
+    that they sample the whole archive rather than its first folders.
+    """
+    index = EmbeddingIndex(index_dir) if EmbeddingIndex.exists(index_dir) else None
+    if index is not None:
+        known = index.keys()
+        image_paths = [path for path in image_paths if path not in known]
+    else:
+        image_paths = [image_paths[i] for i in np.random.default_rng(seed).permutation(len(image_paths))]
+
+    added = 0
+    sample_keys, sample_vectors = [], []
+    for paths, embeddings in extract_embeddings(predict_fn, image_paths, batch_size):
+        if index is None:
+            sample_keys.extend(paths)
+            sample_vectors.append(embeddings)
+            if len(sample_keys) < training_size:
+                continue
+            index = EmbeddingIndex.create(index_dir, np.concatenate(sample_vectors), n_lists=n_lists, seed=seed)
+            paths, embeddings = sample_keys, np.concatenate(sample_vectors)
+            sample_keys, sample_vectors = [], []
+        added += index.add(embeddings, paths)
+
+    if index is None:
+        # Fewer tiles than training_size: train on all of them
+        if not sample_keys:
+            raise ValueError("No decodable tiles to build the index from.")
+        vectors = np.concatenate(sample_vectors)
+        index = EmbeddingIndex.create(index_dir, vectors, n_lists=n_lists, seed=seed)
+        added += index.add(vectors, sample_keys)
+    index.flush()
+    return index, added
+
+
+if __name__ == "__main__":
+    from src.app import config
+    from src.app.backends import load_backend
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build or extend the tile similarity index.")
+    parser.add_argument("tile_dir", help="Directory of tiles to index (searched recursively)")
+    parser.add_argument("--index_dir", default=config.SIMILARITY_INDEX_DIR, help="Index directory (created on first run)")
+    parser.add_argument("--backend", default=config.EMBEDDING_BACKEND, help="Inference backend: keras, tflite or onnx")
+    parser.add_argument("--model_path", default=config.EMBEDDING_MODEL_PATH, required=config.EMBEDDING_MODEL_PATH is None, help="Embedding model exported by the pipeline (best_model.embedding.*)")
+    parser.add_argument("--batch_size", type=int, default=64, help="Tiles per model call")
+    parser.add_argument("--n_lists", type=int, default=None, help="Inverted lists of a new index (about 4 * sqrt(training tiles) by default)")
+    parser.add_argument("--training_size", type=int, default=MAX_TRAINING_VECTORS, help="Tiles a new index's centroids are trained on")
+    parser.add_argument("--compact", action="store_true", help="Merge the index's segments after appending")
+    args = parser.parse_args()
+
+    backend = load_backend(args.backend, args.model_path, num_threads=config.NUM_THREADS)
+    index, added = index_tiles(
+        args.index_dir,
+        list_tiles(args.tile_dir),
+        backend.predict,
+        args.batch_size,
+        args.n_lists,
+        args.training_size,
+    )
+    if args.compact:
+        index.compact()
+    print(f"Indexed {added} new tiles; {len(index)} tiles in {args.index_dir}")
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+from src.data.augmentation import INFERENCE_VIEWS, ImageAugmenter, augment_image_for_inference
+
+# How the softmax outputs of the views of one image are combined
+TTA_AGGREGATIONS = ["mean", "geometric_mean", "max", "vote"]
+MAX_VIEWS = len(INFERENCE_VIEWS)
+
+
+def make_tta_augmenter(angle=15, shift=25):
+    """Augmenter for inference views; the largest angle and shift match training augmentation."""
+    # Reflected borders, like BatchAugmenter, rather than black corners
+    return ImageAugmenter(angle=angle, x_shift=shift, y_shift=shift, border_mode=cv2.BORDER_REFLECT_101)
+
+
+def aggregate(probabilities, aggregation="mean"):
+    """Combine (..., views, classes) softmax outputs into (..., classes) probabilities."""
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    if aggregation == "mean":
+        return probabilities.mean(axis=-2)
+    if aggregation == "geometric_mean":
+        combined = np.exp(np.log(np.clip(probabilities, 1e-7, 1.0)).mean(axis=-2))
+    elif aggregation == "max":
+        combined = probabilities.max(axis=-2)
+    elif aggregation == "vote":
+        # Share of the views that picked each class
+        votes = probabilities.argmax(axis=-1)
+        combined = (votes[..., None] == np.arange(probabilities.shape[-1])).astype(np.float32)
+        combined = combined.mean(axis=-2)
+    else:
+        raise ValueError(f"Unknown aggregation '{aggregation}' (expected one of {TTA_AGGREGATIONS}).")
+    return combined / combined.sum(axis=-1, keepdims=True)
+
+
+def tta_batch(images, n_views, augmenter=None):
+    """Return the (len(images) * n_views, ...) batch of every image's views, image by image."""
+    augmenter = augmenter or make_tta_augmenter()
+    return np.concatenate([augment_image_for_inference(image, augmenter, n_views) for image in images])
+
+
+def tta_predict_fn(predict_fn, n_views, aggregation="mean", augmenter=None):
+    """Wrap a batch ``predict_fn`` so each image is predicted from ``n_views`` views.
+
+    All views of a batch go through ``predict_fn`` in a single call, so TTA
+    costs one larger forward pass rather than ``n_views`` sequential ones.
+    """
+    augmenter = augmenter or make_tta_augmenter()
+
+    def predict(batch):
+        outputs = np.asarray(predict_fn(tta_batch(batch, n_views, augmenter)))
+        return aggregate(outputs.reshape(len(batch), n_views, -1), aggregation)
+
+    return predict
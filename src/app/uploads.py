@@ -0,0 +1,60 @@
+import io
+import os
+import tarfile
+import zipfile
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def is_archive(filename):
+    """Return True if the uploaded filename looks like a zip or tar archive."""
+    return (filename or "").lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_image_name(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not os.path.basename(name).startswith(".")
+
+
+def extract_images(filename, contents, max_members=None, max_bytes=None):
+    """Return (member name, bytes) for every image in an archive, refusing ones over the limits."""
+    buffer = io.BytesIO(contents)
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(buffer) as archive:
+            infos = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir() and is_image_name(info.filename)
+            ]
+            _check_member_count(infos, max_members)
+            # Reads stop at each member's declared size, so the declared sizes are a real bound
+            _check_total_size(sum(info.file_size for info in infos), max_bytes)
+            return [(info.filename, archive.read(info)) for info in infos]
+
+    # A compressed tar has no central directory, so the limits are checked member
+    # by member as the stream is read; every member counts towards the size
+    images, total_bytes = [], 0
+    with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            total_bytes += member.size
+            _check_total_size(total_bytes, max_bytes)
+            if is_image_name(member.name):
+                images.append((member.name, archive.extractfile(member).read()))
+                _check_member_count(images, max_members)
+    return images
+
+
+def _check_member_count(members, max_members):
+    if max_members is not None and len(members) > max_members:
+        raise ValueError(
+            f"Archive holds {len(members)} images, more than the limit of {max_members}."
+        )
+
+
+def _check_total_size(total_bytes, max_bytes):
+    if max_bytes is not None and total_bytes > max_bytes:
+        raise ValueError(
+            f"Archive images add up to {total_bytes} bytes uncompressed, more than the limit of {max_bytes}."
+        )
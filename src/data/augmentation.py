@@ -8,17 +8,18 @@ from src.data.preprocessing import get_image_paths_from_directory
 
 
 class ImageAugmenter:
-    def __init__(self, angle=0, x_shift=0, y_shift=0):
+    def __init__(self, angle=0, x_shift=0, y_shift=0, border_mode=cv2.BORDER_CONSTANT):
         self.angle = angle
         self.x_shift = x_shift
         self.y_shift = y_shift
+        self.border_mode = border_mode
 
     def rotate_image(self, image, angle=None):
         if angle is None:
             angle = random.uniform(-self.angle, self.angle)
         rows, cols, _ = image.shape
         M = cv2.getRotationMatrix2D((cols / 2, rows / 2), angle, 1)
-        return cv2.warpAffine(image, M, (cols, rows))
+        return cv2.warpAffine(image, M, (cols, rows), borderMode=self.border_mode)
 
     def translate_image(self, image, x_shift=None, y_shift=None):
         if x_shift is None:
@@ -27,7 +28,60 @@ class ImageAugmenter:
             y_shift = random.uniform(-self.y_shift, self.y_shift)
         rows, cols, _ = image.shape
         M = np.float32([[1, 0, x_shift], [0, 1, y_shift]])
-        return cv2.warpAffine(image, M, (cols, rows))
+        return cv2.warpAffine(image, M, (cols, rows), borderMode=self.border_mode)
+
+    def flip_image(self, image, horizontal=True):
+        return np.ascontiguousarray(image[:, ::-1] if horizontal else image[::-1])
+
+
+class BatchAugmenter:
+    """Random rotation, translation and scaling applied to whole mini-batches.
+
+    The affine matrices of a batch are drawn in one vectorised step from a
+    seeded generator, then each image is warped in place into a preallocated
+    output batch. Augmentation happens in memory inside the training input
+    pipeline, so no augmented copies are written to disk.
+    """
+
+    def __init__(self, angle=0, x_shift=0, y_shift=0, scale=0.0, seed=None):
+        self.angle = angle
+        self.x_shift = x_shift
+        self.y_shift = y_shift
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+
+    def affine_matrices(self, n, rows, cols):
+        """Draw n random 2x3 affine matrices about the image centre."""
+        theta = np.deg2rad(self.rng.uniform(-self.angle, self.angle, n))
+        scale = self.rng.uniform(1 - self.scale, 1 + self.scale, n)
+        x_shift = self.rng.uniform(-self.x_shift, self.x_shift, n)
+        y_shift = self.rng.uniform(-self.y_shift, self.y_shift, n)
+
+        # Same layout as cv2.getRotationMatrix2D, plus a translation
+        alpha = scale * np.cos(theta)
+        beta = scale * np.sin(theta)
+        cx, cy = cols / 2, rows / 2
+        matrices = np.empty((n, 2, 3), dtype=np.float64)
+        matrices[:, 0, 0] = alpha
+        matrices[:, 0, 1] = beta
+        matrices[:, 0, 2] = (1 - alpha) * cx - beta * cy + x_shift
+        matrices[:, 1, 0] = -beta
+        matrices[:, 1, 1] = alpha
+        matrices[:, 1, 2] = beta * cx + (1 - alpha) * cy + y_shift
+        return matrices
+
+    def augment_batch(self, images, out=None):
+        """Return a randomly transformed copy of a (batch, rows, cols, channels) array."""
+        images = np.ascontiguousarray(images)
+        if out is None:
+            out = np.empty_like(images)
+        _, rows, cols, _ = images.shape
+        for image, matrix, target in zip(images, self.affine_matrices(len(images), rows, cols), out):
+            # Reflecting the border avoids black corners the model could learn from
+            cv2.warpAffine(
+                image, matrix, (cols, rows), dst=target, borderMode=cv2.BORDER_REFLECT_101
+            )
+        return out
 
 
 # For pre-deployment data preparation
@@ -63,9 +117,37 @@ def augment_and_save_images(input_directory_path, output_directory_path, augment
         )
 
 
+# Views used for test-time augmentation, in order; the original image always comes first
+INFERENCE_VIEWS = [
+    ("original", lambda augmenter, image: image),
+    ("flip_horizontal", lambda augmenter, image: augmenter.flip_image(image, horizontal=True)),
+    ("flip_vertical", lambda augmenter, image: augmenter.flip_image(image, horizontal=False)),
+    ("rotate_90", lambda augmenter, image: np.ascontiguousarray(np.rot90(image))),
+    ("rotate_cw", lambda augmenter, image: augmenter.rotate_image(image, -augmenter.angle)),
+    ("rotate_ccw", lambda augmenter, image: augmenter.rotate_image(image, augmenter.angle)),
+    (
+        "translate_forward",
+        lambda augmenter, image: augmenter.translate_image(image, augmenter.x_shift, augmenter.y_shift),
+    ),
+    (
+        "translate_back",
+        lambda augmenter, image: augmenter.translate_image(image, -augmenter.x_shift, -augmenter.y_shift),
+    ),
+]
+
+
 # For run-time augmentation in the inference pipeline
-def augment_image_for_inference(image, augmenter):
-    return augmenter.rotate_image(image)
+def augment_image_for_inference(image, augmenter, n_views=len(INFERENCE_VIEWS)):
+    """Stack the first ``n_views`` deterministic views of an image into one batch.
+
+    The views are always the same for a given augmenter, so repeated
+    predictions (and cached ones) agree. Rotations and shifts use the
+    augmenter's largest angle and shift.
+    """
+    if not 1 <= n_views <= len(INFERENCE_VIEWS):
+        raise ValueError(f"n_views must be between 1 and {len(INFERENCE_VIEWS)}.")
+    # Square inputs keep their shape under rot90, so every view stacks
+    return np.stack([view(augmenter, image) for _, view in INFERENCE_VIEWS[:n_views]])
 
 
 if __name__ == "__main__":
@@ -74,8 +156,11 @@ if __name__ == "__main__":
         os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     )
     RAW_DATA_DIR = os.path.join(BASE_DIR, "raw_data")
+    AUGMENTED_DATA_DIR = os.path.join(BASE_DIR, "augmented_data")
     augmenter = ImageAugmenter(angle=15, x_shift=25, y_shift=25)
     for class_dir in os.listdir(RAW_DATA_DIR):
         class_path = os.path.join(RAW_DATA_DIR, class_dir)
         if os.path.isdir(class_path):
-            augment_and_save_images(class_path, augmenter)
+            output_class_path = os.path.join(AUGMENTED_DATA_DIR, class_dir)
+            os.makedirs(output_class_path, exist_ok=True)
+            augment_and_save_images(class_path, output_class_path, augmenter)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.data.decode import IMAGE_SIZE, decode_image, normalize_into
+
+# Bump when the decode/resize logic changes so stale caches are rebuilt
+CACHE_VERSION = 1
+
+
+def file_key(path):
+    """Identify the current contents of a file by its path, mtime and size."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def params_digest(target_size):
+    params = {"version": CACHE_VERSION, "target_size": list(target_size)}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _decode_rgb_into(path, out, target_size):
+    # Stored as RGB uint8 (see normalize_into)
+    np.copyto(out, decode_image(np.fromfile(path, dtype=np.uint8), target_size)[..., ::-1])
+
+
+class TensorCache:
+    """Memory-mapped RGB uint8 cache of resized images, rows keyed by source path, mtime and size."""
+
+    def __init__(self, store_dir, image_paths, labels):
+        self.store_dir = store_dir
+        self.images = np.load(os.path.join(store_dir, "images.npy"), mmap_mode="r")
+        self.labels = labels
+        self._rows = {path: row for row, path in enumerate(image_paths)}
+
+    def __len__(self):
+        return len(self.images)
+
+    def rows(self, image_paths):
+        """Return the cache rows holding the given image paths."""
+        return np.array([self._rows[path] for path in image_paths], dtype=np.int64)
+
+    def read_batch(self, rows):
+        """Return the given rows as normalised float32 RGB images."""
+        return normalize_into(self.images[np.asarray(rows)])
+
+    @classmethod
+    def open(cls, image_paths, labels, cache_dir, target_size=IMAGE_SIZE, workers=None):
+        """Open the cache for these files, (re)building any stale rows first."""
+        store_dir = os.path.join(cache_dir, params_digest(target_size))
+        os.makedirs(store_dir, exist_ok=True)
+        keys = [file_key(path) for path in image_paths]
+
+        keys_path = os.path.join(store_dir, "keys.json")
+        previous_keys = []
+        if os.path.exists(keys_path):
+            with open(keys_path) as f:
+                previous_keys = json.load(f)
+
+        if previous_keys != keys:
+            cls._rebuild(store_dir, image_paths, keys, previous_keys, target_size, workers)
+
+        return cls(store_dir, list(image_paths), np.asarray(labels))
+
+    @staticmethod
+    def _rebuild(store_dir, image_paths, keys, previous_keys, target_size, workers):
+        images_path = os.path.join(store_dir, "images.npy")
+        tmp_path = os.path.join(store_dir, f"images.{os.getpid()}.tmp.npy")
+
+        previous = None
+        previous_rows = {}
+        if previous_keys and os.path.exists(images_path):
+            previous = np.load(images_path, mmap_mode="r")
+            previous_rows = {key: row for row, key in enumerate(previous_keys)}
+
+        shape = (len(keys), target_size[1], target_size[0], 3)
+        images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=shape)
+
+        # Copy unchanged rows and decode the rest in parallel (cv2 releases the GIL)
+        to_decode = []
+        for row, key in enumerate(keys):
+            if key in previous_rows:
+                images[row] = previous[previous_rows[key]]
+            else:
+                to_decode.append(row)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(
+                pool.map(
+                    lambda row: _decode_rgb_into(image_paths[row], images[row], target_size),
+                    to_decode,
+                )
+            )
+
+        images.flush()
+        del images, previous
+
+        # keys.json is removed first and written last, so an interrupted build
+        # can never pair old keys with new rows
+        keys_path = os.path.join(store_dir, "keys.json")
+        if os.path.exists(keys_path):
+            os.remove(keys_path)
+        os.replace(tmp_path, images_path)
+
+        tmp_keys_path = os.path.join(store_dir, f"keys.{os.getpid()}.tmp.json")
+        with open(tmp_keys_path, "w") as f:
+            json.dump(keys, f)
+        os.replace(tmp_keys_path, keys_path)
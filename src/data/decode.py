@@ -0,0 +1,102 @@
+import struct
+
+import cv2
+import numpy as np
+
+# Shared by training (src/model/data_preparation.py), offline preprocessing
+# (src/data/preprocessing.py) and serving (src/app/main.py) so that all of them
+# produce bit-identical model inputs
+IMAGE_SIZE = (224, 224)
+
+# JPEG start-of-frame markers that carry the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+def read_image_size(contents):
+    """Return (width, height) from a JPEG or PNG header, or None if unknown."""
+    data = memoryview(contents)
+    if bytes(data[:8]) == _PNG_SIGNATURE and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height
+    if bytes(data[:2]) != b"\xff\xd8":
+        return None
+
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # Fill byte
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # Markers without a payload
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+        if marker in _JPEG_SOF_MARKERS and offset + 9 <= len(data):
+            height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def _decode_flag(contents, target_size):
+    # Let libjpeg downscale by 2/4/8 during decoding when the source is large enough
+    size = read_image_size(contents)
+    if size is None or bytes(memoryview(contents)[:2]) != b"\xff\xd8":
+        return cv2.IMREAD_COLOR
+    width, height = size
+    for factor, flag in _REDUCED_DECODE_FLAGS:
+        if width // factor >= target_size[0] and height // factor >= target_size[1]:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def resize(image, target_size=IMAGE_SIZE):
+    """Resize an image to the (width, height) target size."""
+    if image.shape[1] == target_size[0] and image.shape[0] == target_size[1]:
+        return image
+    shrinking = image.shape[1] > target_size[0] and image.shape[0] > target_size[1]
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+    return cv2.resize(image, target_size, interpolation=interpolation)
+
+
+def normalize_into(image, out=None):
+    """Scale uint8 pixel values to float32 in [0, 1], writing into ``out`` if given."""
+    # The image cache and shards store RGB uint8 and normalise on read with this,
+    # so they yield the same floats as load_image
+    if out is None:
+        out = np.empty(image.shape, dtype=np.float32)
+    np.divide(image, 255.0, out=out, dtype=np.float32)
+    return out
+
+
+def decode_image(contents, target_size=IMAGE_SIZE):
+    """Decode an encoded image buffer to a resized uint8 array in BGR channel order."""
+    buffer = np.frombuffer(contents, dtype=np.uint8)
+    image = cv2.imdecode(buffer, _decode_flag(contents, target_size))
+    if image is None:
+        raise ValueError("Could not decode image data.")
+    return resize(image, target_size)
+
+
+def preprocess_into(contents, out=None, target_size=IMAGE_SIZE):
+    """Decode, resize and normalise an encoded image into an RGB float32 slot.
+
+    ``out`` may be a view into a preallocated batch (e.g. ``batch[i]``), so
+    the only allocations are cv2's decode and resize buffers.
+    """
+    image = decode_image(contents, target_size)
+    # Reversing the channel axis is a view, so BGR->RGB happens during the divide
+    return normalize_into(image[..., ::-1], out)
+
+
+def load_image(path, out=None, target_size=IMAGE_SIZE):
+    """Read an image file from disk and preprocess it like ``preprocess_into``."""
+    return preprocess_into(np.fromfile(path, dtype=np.uint8), out, target_size)
@@ -0,0 +1,205 @@
+import os
+import zipfile
+
+import numpy as np
+
+from src.data.decode import read_image_size
+
+INDEX_NAME = ".edge_index.npz"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+HEADER_BYTES = 64 * 1024  # Enough to reach the JPEG frame header past typical EXIF blocks
+COLUMNS = ["paths", "label_ids", "sizes", "mtimes", "widths", "heights"]
+
+
+def _read_dimensions(path):
+    with open(path, "rb") as f:
+        size = read_image_size(f.read(HEADER_BYTES))
+        if size is None:
+            f.seek(0)
+            size = read_image_size(f.read())
+    return size or (-1, -1)
+
+
+class DatasetIndex:
+    """Columnar index of a ``<root>/<class>/<image>`` dataset.
+
+    One row per image with its path, label id (position of the class folder in
+    ``classes``), size, mtime and pixel dimensions, held as NumPy columns and
+    persisted as a single ``.npz`` file. Rebuilding is incremental: a class
+    folder whose mtime is unchanged is reused without being listed, and files
+    with unchanged size and mtime keep their dimensions without being opened.
+    Files edited in place do not change their folder's mtime; use
+    ``full_refresh`` to pick those up.
+    """
+
+    def __init__(self, root, classes, class_mtimes, **columns):
+        self.root = root
+        self.classes = list(classes)
+        self.class_mtimes = np.asarray(class_mtimes, dtype=np.int64)
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.paths)
+
+    @classmethod
+    def build(cls, root, previous=None, full_refresh=False):
+        """Scan ``root`` with ``os.scandir``, reusing what is still valid in ``previous``."""
+        with os.scandir(root) as entries:
+            class_entries = sorted(
+                (entry for entry in entries if entry.is_dir() and not entry.name.startswith(".")),
+                key=lambda entry: entry.name,
+            )
+
+        previous_classes = {}
+        known_files = {}
+        if previous is not None:
+            for label_id, name in enumerate(previous.classes):
+                previous_classes[name] = (label_id, int(previous.class_mtimes[label_id]))
+            known_files = {
+                path: (size, mtime, width, height)
+                for path, size, mtime, width, height in zip(
+                    previous.paths.tolist(),
+                    previous.sizes.tolist(),
+                    previous.mtimes.tolist(),
+                    previous.widths.tolist(),
+                    previous.heights.tolist(),
+                )
+            }
+
+        rows = {name: [] for name in COLUMNS}
+        class_mtimes = []
+        for label_id, class_entry in enumerate(class_entries):
+            mtime = class_entry.stat().st_mtime_ns
+            class_mtimes.append(mtime)
+            old = previous_classes.get(class_entry.name)
+
+            if old is not None and old[1] == mtime and not full_refresh:
+                # Folder contents unchanged since the last scan: copy its rows
+                mask = previous.label_ids == old[0]
+                for name in COLUMNS:
+                    if name != "label_ids":
+                        rows[name].extend(getattr(previous, name)[mask].tolist())
+                rows["label_ids"].extend([label_id] * int(mask.sum()))
+                continue
+
+            for path, size, file_mtime, width, height in cls._scan_class(class_entry.path, known_files):
+                rows["paths"].append(path)
+                rows["label_ids"].append(label_id)
+                rows["sizes"].append(size)
+                rows["mtimes"].append(file_mtime)
+                rows["widths"].append(width)
+                rows["heights"].append(height)
+
+        return cls(
+            root,
+            [entry.name for entry in class_entries],
+            class_mtimes,
+            paths=np.array(rows["paths"], dtype=str),
+            label_ids=np.array(rows["label_ids"], dtype=np.int16),
+            sizes=np.array(rows["sizes"], dtype=np.int64),
+            mtimes=np.array(rows["mtimes"], dtype=np.int64),
+            widths=np.array(rows["widths"], dtype=np.int32),
+            heights=np.array(rows["heights"], dtype=np.int32),
+        )
+
+    @staticmethod
+    def _scan_class(class_path, known_files):
+        with os.scandir(class_path) as entries:
+            image_entries = sorted(
+                (
+                    entry
+                    for entry in entries
+                    if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+                ),
+                key=lambda entry: entry.name,
+            )
+
+        for entry in image_entries:
+            stat = entry.stat()
+            old = known_files.get(entry.path)
+            if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                width, height = old[2], old[3]
+            else:
+                width, height = _read_dimensions(entry.path)
+            yield entry.path, stat.st_size, stat.st_mtime_ns, width, height
+
+    def save(self, path):
+        # Per-process temporary name, so parallel workers never write the same file
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            root=np.array(self.root),
+            classes=np.array(self.classes, dtype=str),
+            class_mtimes=self.class_mtimes,
+            **{name: getattr(self, name) for name in COLUMNS},
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                str(data["root"]),
+                data["classes"].tolist(),
+                data["class_mtimes"],
+                **{name: data[name] for name in COLUMNS},
+            )
+
+    def query(self, classes=None):
+        """Return (paths, label ids) of images, with ids relative to ``classes``."""
+        if classes is None:
+            return self.paths, self.label_ids.astype(int)
+        remap = np.array([classes.index(c) if c in classes else -1 for c in self.classes], dtype=int)
+        labels = remap[self.label_ids] if len(self) else np.empty(0, dtype=int)
+        keep = labels >= 0
+        return self.paths[keep], labels[keep]
+
+    def to_records(self):
+        """Return a list of {"image_path", "label"} dicts, one per image."""
+        return [
+            {"image_path": path, "label": self.classes[label_id]}
+            for path, label_id in zip(self.paths.tolist(), self.label_ids.tolist())
+        ]
+
+    def to_dataframe(self):
+        # pandas is only needed here, so listing the dataset does not import it
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "image_path": self.paths,
+                "label": np.array(self.classes, dtype=object)[self.label_ids]
+                if len(self)
+                else np.empty(0, dtype=object),
+                "size": self.sizes,
+                "mtime_ns": self.mtimes,
+                "width": self.widths,
+                "height": self.heights,
+            }
+        )
+
+
+def load_index(root, index_path=None, full_refresh=False):
+    """Index the images of ``root``, reusing and updating the index saved at ``index_path``.
+
+    Without ``index_path`` the index is built in memory only; nothing is
+    written into the dataset directory. An unreadable or unwritable index file
+    is ignored, so the listing still works.
+    """
+    previous = None
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            previous = DatasetIndex.load(index_path)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            previous = None
+        if previous is not None and previous.root != root:
+            previous = None
+
+    index = DatasetIndex.build(root, previous=previous, full_refresh=full_refresh)
+    if index_path is not None:
+        try:
+            index.save(index_path)
+        except OSError:
+            pass
+    return index
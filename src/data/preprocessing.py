@@ -1,93 +1,188 @@
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import cv2
-import numpy as np
-import pandas as pd
+
+from src.data.decode import normalize_into, resize
+from src.data.index import IMAGE_EXTENSIONS, load_index
 
 # Given this script is located at "src/data/preprocessing.py"
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 RAW_DATA_DIR = os.path.join(BASE_DIR, "raw_data")
+PROCESSED_DATA_DIR = os.path.join(BASE_DIR, "processed_data")
+MANIFEST_NAME = "manifest.json"
 
 
 def list_files_from_directory(directory_path):
     """Return a list of files from the given directory."""
-    return [
-        os.path.join(directory_path, f)
-        for f in os.listdir(directory_path)
-        if os.path.isfile(os.path.join(directory_path, f))
-    ]
+    with os.scandir(directory_path) as entries:
+        return [entry.path for entry in entries if entry.is_file()]
 
 
 def get_data_from_directory(data_path):
     """Generate data list from a directory containing subdirectories of images."""
-    data_list = []
-
-    for folder in os.listdir(data_path):
-        folder_path = os.path.join(data_path, folder)
-
-        if os.path.isdir(folder_path):
-            for image_path in list_files_from_directory(folder_path):
-                label = folder
-                data_list.append({"image_path": image_path, "label": label})
-
-    return data_list
+    return load_index(data_path).to_records()
 
 
 def generate_dataframe_from_directory(data_path=RAW_DATA_DIR):
     """Generate a DataFrame from a directory containing subdirectories of images."""
-    data_list = get_data_from_directory(data_path)
-    return pd.DataFrame(data_list)
+    return load_index(data_path).to_dataframe()
 
 
 def get_image_paths_from_directory(directory_path):
     """Return a list of image paths from the given directory."""
-    image_extensions = [".jpg", ".jpeg", ".png"]
-    return [
-        os.path.join(directory_path, f)
-        for f in os.listdir(directory_path)
-        if f.endswith(tuple(image_extensions))
-    ]
+    with os.scandir(directory_path) as entries:
+        return [
+            entry.path
+            for entry in entries
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+        ]
 
 
 def generate_data_list(data_directory=RAW_DATA_DIR):
     """Generate a list of image paths and their associated labels."""
-    data_list = []
-    for folder in os.listdir(data_directory):
-        folder_path = os.path.join(data_directory, folder)
-        if os.path.isdir(folder_path):
-            for image_path in get_image_paths_from_directory(folder_path):
-                label = folder
-                data_list.append({"image_path": image_path, "label": label})
-    return data_list
+    return load_index(data_directory).to_records()
 
 
 def resize_image(image, target_size=(224, 224)):
     """Resize a single image to the target size."""
-    return cv2.resize(image, target_size)
+    return resize(image, target_size)
 
 
 def normalize_image(image):
     """Normalise a single image pixel values to the [0, 1] range."""
-    return image.astype(np.float32) / 255.0
-
-
-def process_images_in_directory(directory_path, target_size=(224, 224)):
-    """Resize and normalise images in the given directory and its sub-directories."""
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            if file.lower().endswith((".png", ".jpg", ".jpeg")):
-                image_path = os.path.join(root, file)
-                img = cv2.imread(image_path)
-                if img is not None:
-                    resized_img = resize_image(img, target_size)
-                    normalized_img = normalize_image(resized_img)
-                    cv2.imwrite(image_path, normalized_img * 255)
+    return normalize_into(image)
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _process_image(source_path, output_path, target_size, previous_sha1):
+    # Runs in a worker process; returns (sha1, status)
+    sha1 = hash_file(source_path)
+    if sha1 == previous_sha1 and os.path.exists(output_path):
+        return sha1, "unchanged"  # Only the mtime changed
+    img = cv2.imread(source_path)
+    if img is None:
+        return sha1, "failed"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    cv2.imwrite(output_path, resize_image(img, target_size))
+    return sha1, "processed"
+
+
+def load_manifest(output_directory):
+    manifest_path = os.path.join(output_directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {"params": None, "files": {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(output_directory, manifest):
+    manifest_path = os.path.join(output_directory, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def process_images_in_directory(
+    input_directory, output_directory=PROCESSED_DATA_DIR, target_size=(224, 224), workers=None
+):
+    """Resize images from the input tree into a mirrored tree under the output directory.
+
+    Source images are never modified. A manifest in the output directory records
+    each source's size, mtime, SHA-1 and the preprocessing parameters, so a rerun
+    only processes new or changed files and removes outputs whose source is gone.
+    Work is spread over a process pool. Returns a dict of counts and throughput.
+    """
+    start_time = time.perf_counter()
+    os.makedirs(output_directory, exist_ok=True)
+    params = {"target_size": list(target_size)}
+    manifest = load_manifest(output_directory)
+    previous = manifest["files"] if manifest["params"] == params else {}
+
+    files = {}
+    pending = []
+    for root, _, filenames in os.walk(input_directory):
+        for file in filenames:
+            if not file.lower().endswith((".png", ".jpg", ".jpeg")):
+                continue
+            source_path = os.path.join(root, file)
+            relative_path = os.path.relpath(source_path, input_directory)
+            stat = os.stat(source_path)
+            entry = previous.get(relative_path)
+            output_path = os.path.join(output_directory, relative_path)
+
+            # Unchanged size and mtime: trust the manifest without reading the file
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and os.path.exists(output_path)
+            ):
+                files[relative_path] = entry
+                continue
+            pending.append((relative_path, source_path, output_path, stat, entry))
+
+    counts = {"processed": 0, "unchanged": len(files), "failed": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            _process_image,
+            [item[1] for item in pending],
+            [item[2] for item in pending],
+            [target_size] * len(pending),
+            [item[4]["sha1"] if item[4] else None for item in pending],
+            chunksize=max(1, len(pending) // (4 * (os.cpu_count() or 1))),
+        )
+        for (relative_path, _, _, stat, entry), (sha1, status) in zip(pending, results):
+            counts[status] += 1
+            if status == "failed":
+                # Keep the last good output; the changed stat makes the next run retry it
+                if entry is not None:
+                    files[relative_path] = entry
+            else:
+                files[relative_path] = {
+                    "sha1": sha1,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+
+    # Drop outputs whose source image no longer exists
+    removed = 0
+    for relative_path in set(previous) - set(files):
+        output_path = os.path.join(output_directory, relative_path)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        removed += 1
+
+    save_manifest(output_directory, {"params": params, "files": files})
+
+    seconds = time.perf_counter() - start_time
+    counts["removed"] = removed
+    counts["seconds"] = seconds
+    counts["images_per_second"] = counts["processed"] / seconds if seconds > 0 else 0.0
+    return counts
 
 
 if __name__ == "__main__":
     data_df = generate_dataframe_from_directory()
 
-    # Process images for resizing and normalisation
-    process_images_in_directory(RAW_DATA_DIR)
+    # Resize new or changed raw images into the processed data directory
+    stats = process_images_in_directory(RAW_DATA_DIR, PROCESSED_DATA_DIR)
 
     print(data_df.head())
+    print(
+        f"Processed {stats['processed']} images ({stats['unchanged']} unchanged, "
+        f"{stats['failed']} failed, {stats['removed']} removed) in {stats['seconds']:.1f}s "
+        f"at {stats['images_per_second']:.1f} images/s"
+    )
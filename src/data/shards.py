@@ -0,0 +1,159 @@
+import argparse
+import fcntl
+import glob
+import hashlib
+import io
+import json
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.data.cache import file_key
+from src.data.decode import IMAGE_SIZE, decode_image, normalize_into, preprocess_into
+from src.data.index import load_index
+
+# Bump when the shard layout or the decode/resize logic changes
+SHARD_VERSION = 1
+SHARD_INDEX_NAME = "shards.json"
+SHARD_PATTERN = "shard-{:05d}.tar"
+SHARD_FORMATS = ["raw", "encoded"]
+DEFAULT_SHARD_SIZE = 1000
+READ_BUFFER_BYTES = 1 << 20
+
+
+def shards_digest(image_paths, labels, image_format, target_size):
+    """Key a shard set by its source files, labels and packing parameters."""
+    params = {"version": SHARD_VERSION, "format": image_format, "target_size": list(target_size)}
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+    for path, label in zip(image_paths, labels):
+        digest.update(f"{file_key(path)}|{int(label)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _encode_sample(path, image_format, target_size):
+    contents = np.fromfile(path, dtype=np.uint8)
+    if image_format == "encoded":
+        return os.path.splitext(path)[1][1:].lower(), contents.tobytes()
+    try:
+        image = decode_image(contents, target_size)
+    except ValueError as e:
+        raise ValueError(f"Could not decode {path}.") from e
+    # Stored as RGB uint8 (see normalize_into)
+    return "rgb", np.ascontiguousarray(image[..., ::-1]).tobytes()
+
+
+def _add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def read_shard_index(shard_dir):
+    """Return the index of a shard directory, or None if it holds no complete shard set."""
+    index_path = os.path.join(shard_dir, SHARD_INDEX_NAME)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def write_shards(
+    image_paths,
+    labels,
+    output_dir,
+    shard_size=DEFAULT_SHARD_SIZE,
+    image_format="raw",
+    target_size=IMAGE_SIZE,
+    workers=None,
+):
+    """Pack images and labels into WebDataset-style tar shards indexed by ``shards.json``."""
+    if image_format not in SHARD_FORMATS:
+        raise ValueError(f"Unknown shard format '{image_format}', expected one of {SHARD_FORMATS}.")
+    image_paths = [str(path) for path in image_paths]
+    labels = np.asarray(labels)
+    digest = shards_digest(image_paths, labels, image_format, target_size)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Parallel study workers wait for the one packing a split instead of
+    # deleting the shards it is writing, then reuse its index
+    with open(os.path.join(output_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = read_shard_index(output_dir)
+        if index is not None and index["digest"] == digest:
+            return index
+
+        # The index is removed first and written last, so readers never see a partial set
+        index_path = os.path.join(output_dir, SHARD_INDEX_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        for stale_path in glob.glob(os.path.join(output_dir, "shard-*.tar")):
+            os.remove(stale_path)
+
+        shards = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(image_paths), shard_size):
+                chunk = image_paths[start : start + shard_size]
+                name = SHARD_PATTERN.format(len(shards))
+                tmp_path = os.path.join(output_dir, f"{name}.{os.getpid()}.tmp")
+
+                # Decode the chunk in parallel (cv2 releases the GIL), write it in order
+                samples = pool.map(lambda path: _encode_sample(path, image_format, target_size), chunk)
+                with tarfile.open(tmp_path, "w") as tar:
+                    for key, ((ext, data), label) in enumerate(zip(samples, labels[start:]), start):
+                        _add_member(tar, f"{key:08d}.{ext}", data)
+                        _add_member(tar, f"{key:08d}.cls", str(int(label)).encode())
+                os.replace(tmp_path, os.path.join(output_dir, name))
+
+                label_counts = np.bincount(labels[start : start + shard_size]).tolist()
+                shards.append({"name": name, "count": len(chunk), "label_counts": label_counts})
+
+        index = {
+            "digest": digest,
+            "format": image_format,
+            "target_size": list(target_size),
+            "count": len(image_paths),
+            "shards": shards,
+        }
+        tmp_index_path = os.path.join(output_dir, f"shards.{os.getpid()}.tmp.json")
+        with open(tmp_index_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_index_path, index_path)
+        return index
+
+
+def shard_paths(shard_dir, index=None):
+    index = index or read_shard_index(shard_dir)
+    if index is None:
+        raise FileNotFoundError(f"No shard index found in {shard_dir}.")
+    return [os.path.join(shard_dir, shard["name"]) for shard in index["shards"]]
+
+
+def iter_shard(path, image_format="raw", target_size=IMAGE_SIZE):
+    """Yield (float32 RGB image, label) pairs from one shard, streaming it front to back."""
+    width, height = target_size
+    image = None
+    with tarfile.open(path, "r|", bufsize=READ_BUFFER_BYTES) as tar:
+        for member in tar:
+            data = tar.extractfile(member).read()
+            # The writer stores every sample's pixels right before its label
+            if member.name.endswith(".cls"):
+                yield image, int(data)
+            elif image_format == "raw":
+                image = normalize_into(np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+            else:
+                image = preprocess_into(data, target_size=target_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack a <class>/<image> dataset into tar shards.")
+    parser.add_argument("data_dir", help="Dataset root with one folder per class")
+    parser.add_argument("output_dir", help="Directory to write the shards and shards.json to")
+    parser.add_argument("--shard_size", type=int, default=DEFAULT_SHARD_SIZE, help="Samples per shard")
+    parser.add_argument("--format", choices=SHARD_FORMATS, default="raw", help="Store resized pixels or the original file bytes")
+    args = parser.parse_args()
+
+    image_paths, labels = load_index(args.data_dir).query()
+    index = write_shards(image_paths, labels, args.output_dir, args.shard_size, args.format)
+    print(f"Wrote {index['count']} images to {len(index['shards'])} shards in {args.output_dir}")
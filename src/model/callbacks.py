@@ -0,0 +1,22 @@
+from keras.callbacks import EarlyStopping
+
+
+class BestEpochStopping(EarlyStopping):
+    """Early stopping on ``val_accuracy`` that always ends on the best epoch's weights.
+
+    Keras' ``restore_best_weights`` only restores them when training is
+    actually stopped early; a fit that runs all its epochs keeps the last
+    epoch's weights. The best weights are restored at the end of every fit
+    instead, so the model matches the ``max(history["val_accuracy"])`` that
+    trials and checkpoints record for it.
+    """
+
+    def __init__(self, patience, monitor="val_accuracy", mode="max", **kwargs):
+        super().__init__(
+            monitor=monitor, mode=mode, patience=patience, restore_best_weights=True, **kwargs
+        )
+
+    def on_train_end(self, logs=None):
+        super().on_train_end(logs)
+        if self.best_weights is not None:
+            self.model.set_weights(self.best_weights)
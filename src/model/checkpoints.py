@@ -0,0 +1,81 @@
+import fcntl
+import json
+import os
+
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+
+
+class BestCheckpoint:
+    """Weights of the most accurate trial of a study so far, shared by all its workers.
+
+    Trials offer their trained model; its weights are kept only when its
+    ``val_accuracy`` beats the stored one, so a single set of weights exists
+    at any time. The metadata file (trial number, params, accuracy) names the
+    weights file it describes and is replaced atomically, so a crash never
+    leaves metadata pointing at another trial's weights. A lock file
+    serialises parallel workers offering at the same time.
+    """
+
+    def __init__(self, path_prefix):
+        self.path_prefix = path_prefix
+        self.metadata_path = path_prefix + ".json"
+        self.lock_path = path_prefix + ".lock"
+
+    def metadata(self):
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def offer(self, model, val_accuracy, trial_number, params, head_only=False):
+        """Store ``model``'s weights if it is the best trial so far; return whether it was."""
+        os.makedirs(os.path.dirname(self.path_prefix) or ".", exist_ok=True)
+        with open(self.lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            previous = self.metadata()
+            if previous is not None and previous["val_accuracy"] >= val_accuracy:
+                return False
+
+            weights_path = f"{self.path_prefix}-trial{trial_number}.weights.h5"
+            model.save_weights(weights_path)
+            metadata = {
+                "trial": trial_number,
+                "params": params,
+                "val_accuracy": float(val_accuracy),
+                "head_only": head_only,
+                "weights": os.path.basename(weights_path),
+            }
+            temporary_path = self.metadata_path + ".tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(metadata, f)
+            os.replace(temporary_path, self.metadata_path)
+
+            # Only the best trial's weights are kept
+            if previous is not None and previous["weights"] != metadata["weights"]:
+                try:
+                    os.remove(self._weights_path(previous))
+                except FileNotFoundError:
+                    pass
+            return True
+
+    def _weights_path(self, metadata):
+        return os.path.join(os.path.dirname(self.path_prefix), metadata["weights"])
+
+    def matches(self, trial_number, params):
+        """Whether the stored weights are those of this trial (and its weights file exists)."""
+        metadata = self.metadata()
+        return (
+            metadata is not None
+            and metadata["trial"] == trial_number
+            and metadata["params"] == params
+            and os.path.exists(self._weights_path(metadata))
+        )
+
+    def restore(self, edge_model):
+        """Load the stored weights into a freshly built ``EdgeModel`` of the same params."""
+        metadata = self.metadata()
+        # A head-only trial trained just the head, which shares its weights with the full model
+        target = edge_model.get_head() if metadata["head_only"] else edge_model.get_model()
+        target.load_weights(self._weights_path(metadata))
+        return metadata
@@ -1,49 +1,179 @@
 import os
 
 import numpy as np
-from keras.preprocessing.image import img_to_array, load_img
-from keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
 
+from src.data.cache import TensorCache
+from src.data.decode import IMAGE_SIZE, load_image
+from src.data.index import INDEX_NAME, load_index
+from src.data.shards import (DEFAULT_SHARD_SIZE, iter_shard, read_shard_index,
+                             shard_paths, write_shards)
+
 # Constants
-IMAGE_SIZE = (224, 224)
 RAW_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "raw_data")
 CLASSES = ["cloudy", "desert", "green_area", "water"]
 
 
-def load_data():
-    images = []
-    labels = []
+def index_path_for(cache_dir):
+    """Where the dataset index is kept: next to the decoded-image cache, if there is one."""
+    return os.path.join(cache_dir, INDEX_NAME) if cache_dir else None
+
+
+def list_image_files(data_dir=RAW_DATA_DIR, index_path=None):
+    """Return arrays of image paths and integer labels for every class folder.
+
+    With ``index_path``, files come from the persisted dataset index, so
+    repeated calls only stat class folders instead of listing every image.
+    """
+    return load_index(data_dir, index_path).query(CLASSES)
+
 
-    # Load images and labels
-    for index, class_name in enumerate(CLASSES):
-        class_dir = os.path.join(RAW_DATA_DIR, class_name)
-        for image_name in os.listdir(class_dir):
-            image_path = os.path.join(class_dir, image_name)
-            image = load_img(image_path, target_size=IMAGE_SIZE)
-            image = img_to_array(image)
-            images.append(image)
-            labels.append(index)  # Encode labels as integers
+def load_data(data_dir=RAW_DATA_DIR, index_path=None):
+    """Split the dataset into training and validation sets of file paths.
 
-    # Convert to numpy arrays and normalize pixel values
-    images = np.array(images, dtype="float32") / 255.0
-    labels = np.array(labels, dtype="int")
+    The stratified split is computed on paths and labels only, so no pixels
+    are loaded here; use ``make_dataset`` to stream the images of a split.
+    """
+    image_paths, labels = list_image_files(data_dir, index_path)
 
     # Split into training and validation sets
-    train_images, val_images, train_labels, val_labels = train_test_split(
-        images, labels, test_size=0.2, random_state=42, stratify=labels
+    train_paths, val_paths, train_labels, val_labels = train_test_split(
+        image_paths, labels, test_size=0.2, random_state=42, stratify=labels
+    )
+
+    return (train_paths, train_labels), (val_paths, val_labels)
+
+
+def _read_image(path):
+    # Same decode and normalisation as the prediction API
+    return load_image(path.decode())
+
+
+def _load_example(path, label):
+    import tensorflow as tf
+
+    image = tf.numpy_function(_read_image, [path], tf.float32)
+    image.set_shape((*IMAGE_SIZE[::-1], 3))
+    return image, tf.one_hot(label, len(CLASSES))
+
+
+def open_cache(cache_dir, data_dir=RAW_DATA_DIR):
+    """Open (building or refreshing if needed) the decoded-image cache for the dataset."""
+    image_paths, labels = list_image_files(data_dir, index_path_for(cache_dir))
+    return TensorCache.open(image_paths, labels, cache_dir, target_size=IMAGE_SIZE)
+
+
+def _augment(dataset, augmenter):
+    # Runs sequentially so the seeded augmenter draws the same transforms every run;
+    # prefetching still overlaps it with training
+    import tensorflow as tf
+
+    def augment_batch(images, batch_labels):
+        augmented = tf.numpy_function(augmenter.augment_batch, [images], tf.float32)
+        augmented.set_shape(images.shape)
+        return augmented, batch_labels
+
+    return dataset.map(augment_batch)
+
+
+def make_dataset(
+    image_paths, labels, batch_size, shuffle=False, cache=None, augmenter=None, seed=42
+):
+    """Build a streaming ``tf.data`` pipeline over one split.
+
+    Without a cache, images are decoded in parallel from disk and prefetched
+    while the model trains, so the full split is never held in memory. With a
+    ``TensorCache`` (see ``open_cache``), whole batches are gathered from its
+    memory-mapped array instead, skipping decoding entirely. An optional
+    ``BatchAugmenter`` transforms each batch in memory before it is prefetched.
+    """
+    # TensorFlow loads with the first dataset, not with load_data's path handling
+    import tensorflow as tf
+
+    if cache is not None:
+        dataset = tf.data.Dataset.from_tensor_slices((cache.rows(image_paths), labels))
+        if shuffle:
+            dataset = dataset.shuffle(len(image_paths), seed=seed, reshuffle_each_iteration=True)
+
+        def load_batch(rows, batch_labels):
+            images = tf.numpy_function(cache.read_batch, [rows], tf.float32)
+            images.set_shape((None, *IMAGE_SIZE[::-1], 3))
+            return images, tf.one_hot(batch_labels, len(CLASSES))
+
+        dataset = dataset.batch(batch_size).map(load_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    else:
+        dataset = tf.data.Dataset.from_tensor_slices((image_paths, labels))
+        if shuffle:
+            dataset = dataset.shuffle(len(image_paths), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.map(_load_example, num_parallel_calls=tf.data.AUTOTUNE)
+        dataset = dataset.batch(batch_size)
+
+    if augmenter is not None:
+        dataset = _augment(dataset, augmenter)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def write_split_shards(
+    shard_dir, data_dir=RAW_DATA_DIR, shard_size=DEFAULT_SHARD_SIZE, index_path=None
+):
+    """Pack the train and validation splits into ``<shard_dir>/train`` and ``<shard_dir>/val``.
+
+    Splits whose source files are unchanged since the last call are not repacked.
+    """
+    train_data, val_data = load_data(data_dir, index_path)
+    for name, (image_paths, labels) in [("train", train_data), ("val", val_data)]:
+        write_shards(image_paths, labels, os.path.join(shard_dir, name), shard_size=shard_size)
+
+
+def make_shard_dataset(
+    shard_dir, batch_size, shuffle=False, augmenter=None, seed=42, shuffle_buffer=1000, cycle_length=4
+):
+    """Build a ``tf.data`` pipeline that streams one split from tar shards.
+
+    Shards are read front to back, ``cycle_length`` at a time in parallel, so
+    storage sees a few large sequential reads instead of one open per image.
+    With ``shuffle``, the shard order is shuffled and samples are mixed
+    through a ``shuffle_buffer``-sized buffer.
+    """
+    import tensorflow as tf
+
+    index = read_shard_index(shard_dir)
+    paths = shard_paths(shard_dir, index)
+    image_format = index["format"]
+    target_size = tuple(index["target_size"])
+    signature = (
+        tf.TensorSpec((*target_size[::-1], 3), tf.float32),
+        tf.TensorSpec((), tf.int64),
     )
 
-    # One-hot encode the labels
-    train_labels = to_categorical(train_labels, num_classes=len(CLASSES))
-    val_labels = to_categorical(val_labels, num_classes=len(CLASSES))
+    def read_shard(path):
+        return tf.data.Dataset.from_generator(
+            lambda path: iter_shard(path.decode(), image_format, target_size),
+            output_signature=signature,
+            args=(path,),
+        )
+
+    dataset = tf.data.Dataset.from_tensor_slices(paths)
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(
+        read_shard,
+        cycle_length=max(1, min(cycle_length, len(paths))),
+        num_parallel_calls=tf.data.AUTOTUNE,
+    )
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(lambda image, label: (image, tf.one_hot(label, len(CLASSES))))
+    dataset = dataset.batch(batch_size)
 
-    return (train_images, train_labels), (val_images, val_labels)
+    if augmenter is not None:
+        dataset = _augment(dataset, augmenter)
+    return dataset.prefetch(tf.data.AUTOTUNE)
 
 
 if __name__ == "__main__":
-    (train_images, train_labels), (val_images, val_labels) = load_data()
-    print(f"Training data shape: {train_images.shape}")
-    print(f"Training labels shape: {train_labels.shape}")
-    print(f"Validation data shape: {val_images.shape}")
-    print(f"Validation labels shape: {val_labels.shape}")
+    (train_paths, train_labels), (val_paths, val_labels) = load_data()
+    print(f"Training images: {len(train_paths)}")
+    print(f"Training class counts: {np.bincount(train_labels, minlength=len(CLASSES))}")
+    print(f"Validation images: {len(val_paths)}")
+    print(f"Validation class counts: {np.bincount(val_labels, minlength=len(CLASSES))}")
@@ -0,0 +1,54 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ["tflite", "onnx"]
+
+
+def export_tflite(model, output_path):
+    """Convert a Keras model to a float32 TFLite flatbuffer."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def export_onnx(model, output_path, opset=13):
+    """Convert a Keras model to ONNX with a dynamic batch dimension."""
+    import tensorflow as tf
+    import tf2onnx
+
+    input_signature = (
+        tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),
+    )
+    tf2onnx.convert.from_keras(
+        model, input_signature=input_signature, opset=opset, output_path=output_path
+    )
+    return output_path
+
+
+def export_model(model, keras_path, formats=EXPORT_FORMATS):
+    """Write the requested edge formats next to the saved Keras model.
+
+    Returns a dict mapping each successfully exported format to its path.
+    ONNX export needs the optional ``tf2onnx`` package and is skipped with a
+    warning when it is not installed.
+    """
+    exporters = {"tflite": export_tflite, "onnx": export_onnx}
+    stem = os.path.splitext(keras_path)[0]
+    exported = {}
+
+    for fmt in formats:
+        output_path = f"{stem}.{fmt}"
+        try:
+            exported[fmt] = exporters[fmt](model, output_path)
+        except ImportError as e:
+            logger.warning(f"Skipping {fmt} export: {e}")
+            continue
+        size_mb = os.path.getsize(output_path) / 1e6
+        logger.info(f"Exported {fmt} model to {output_path} ({size_mb:.2f} MB)")
+
+    return exported
@@ -0,0 +1,85 @@
+import fcntl
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+from model.data_preparation import make_dataset
+from model.model import BACKBONE_INPUT_SCALING, EdgeModel
+from model.search import DEFAULT_ARCHITECTURE
+from src.data.cache import file_key
+from src.data.decode import IMAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_BATCH_SIZE = 64
+
+
+def features_digest(image_paths, architecture=DEFAULT_ARCHITECTURE):
+    """Key extracted features by the source files' contents, backbone, input size and scaling."""
+    key = f"{architecture['backbone']}|{IMAGE_SIZE}|{BACKBONE_INPUT_SCALING[architecture['backbone']]}"
+    if architecture != DEFAULT_ARCHITECTURE:
+        # Keep the key of features already extracted with the default backbone
+        key += f"|{architecture['alpha']}|{architecture['image_size']}"
+    digest = hashlib.sha1(key.encode())
+    for path in image_paths:
+        digest.update(file_key(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def extract_features(backbone, image_paths, labels, cache=None):
+    """Run the frozen backbone once over a split and return its pooled embeddings."""
+    dataset = make_dataset(
+        image_paths, labels, batch_size=EXTRACTION_BATCH_SIZE, cache=cache
+    ).map(lambda images, _: images)
+    return backbone.predict(dataset).astype(np.float32)
+
+
+def load_features(train_data, val_data, feature_dir, cache=None, architecture=DEFAULT_ARCHITECTURE):
+    """Return pooled backbone features for both splits, extracting them if needed.
+
+    Because the backbone is frozen, its pooled output for an image never
+    changes between trials. Each split's embeddings are computed once and
+    stored as ``.npy`` files under ``feature_dir``, keyed by the split's file
+    contents and the backbone ``architecture``. Hyperparameter trials then
+    only train the small head on these vectors.
+    """
+    os.makedirs(feature_dir, exist_ok=True)
+    backbone = None
+    features = []
+
+    for name, (image_paths, labels) in [("train", train_data), ("val", val_data)]:
+        path = os.path.join(feature_dir, f"{name}-{features_digest(image_paths, architecture)}.npy")
+        # Parallel study workers wait for the one extracting a split instead of
+        # repeating it, and the file only appears once it is complete
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(path):
+                embeddings = np.load(path)
+            else:
+                if backbone is None:
+                    backbone = EdgeModel.create_backbone(**architecture)
+                logger.info(f"Extracting backbone features for {len(image_paths)} {name} images")
+                embeddings = extract_features(backbone, image_paths, labels, cache=cache)
+                tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, embeddings)
+                os.replace(tmp_path, path)
+        features.append((embeddings, np.asarray(labels)))
+
+    return tuple(features)
+
+
+def fit_head(head, features, batch_size, epochs, callbacks=None):
+    """Train a classification head on precomputed (train, val) embeddings."""
+    (train_x, train_y), (val_x, val_y) = features
+    one_hot = np.eye(EdgeModel.NUM_CLASSES, dtype="float32")
+    return head.fit(
+        train_x,
+        one_hot[train_y],
+        validation_data=(val_x, one_hot[val_y]),
+        batch_size=batch_size,
+        epochs=epochs,
+        shuffle=True,
+        callbacks=callbacks,
+    )
@@ -1,29 +1,102 @@
-from keras.applications import MobileNetV3Small
-from keras.layers import Dense, Dropout, GlobalAveragePooling2D
+from keras.applications import MobileNetV2, MobileNetV3Large, MobileNetV3Small
+from keras.layers import Dense, Dropout, GlobalAveragePooling2D, Input, Rescaling, Resizing
 from keras.models import Model
 from keras.optimizers import Adam
 
+from model.search import DEFAULT_ARCHITECTURE
+
+BACKBONE_CLASSES = {
+    "mobilenet_v3_small": MobileNetV3Small,
+    "mobilenet_v3_large": MobileNetV3Large,
+    "mobilenet_v2": MobileNetV2,
+}
+
+# (scale, offset) taking the pipeline's [0, 1] RGB input (decode.normalize_into)
+# to the range each backbone was trained on: MobileNetV3 rescales 0-255 input
+# itself, MobileNetV2 expects [-1, 1]
+BACKBONE_INPUT_SCALING = {
+    "mobilenet_v3_small": (255.0, 0.0),
+    "mobilenet_v3_large": (255.0, 0.0),
+    "mobilenet_v2": (2.0, -1.0),
+}
+
 
 class EdgeModel:
     NUM_CLASSES = 4
+    INPUT_SHAPE = (224, 224, 3)
 
-    def __init__(self, learning_rate, dropout_rate, dense_neurons):
+    def __init__(
+        self,
+        learning_rate,
+        dropout_rate,
+        dense_neurons,
+        head_only=False,
+        backbone=DEFAULT_ARCHITECTURE["backbone"],
+        alpha=DEFAULT_ARCHITECTURE["alpha"],
+        image_size=DEFAULT_ARCHITECTURE["image_size"],
+        feature_dim=None,
+    ):
         self.learning_rate = learning_rate
         self.dropout_rate = dropout_rate
         self.dense_neurons = dense_neurons
+        # With head_only, the model takes pooled backbone features instead of images
+        if head_only:
+            if feature_dim is None:
+                raise ValueError("A head-only model needs the feature_dim of its backbone.")
+            self.backbone = None
+        else:
+            self.backbone = EdgeModel.create_backbone(backbone, alpha, image_size)
+        # Channels of the backbone's last feature map (576 for MobileNetV3Small)
+        self.feature_dim = feature_dim or self.backbone.output_shape[-1]
+        self.head = self._create_head()
         self.model = self._create_model()
 
-    def _create_model(self):
-        base_model = MobileNetV3Small(
-            input_shape=(224, 224, 3), include_top=False, weights="imagenet"
+    @staticmethod
+    def create_backbone(
+        backbone=DEFAULT_ARCHITECTURE["backbone"],
+        alpha=DEFAULT_ARCHITECTURE["alpha"],
+        image_size=DEFAULT_ARCHITECTURE["image_size"],
+    ):
+        """Frozen ImageNet backbone mapping images to pooled feature vectors.
+
+        Inputs are always ``INPUT_SHAPE``; a smaller ``image_size`` is reached
+        with a resize layer inside the model, so the data pipeline, caches and
+        serving stay unchanged while the backbone runs at the lower resolution.
+        Inputs are rescaled to the backbone's own range (``BACKBONE_INPUT_SCALING``),
+        so architectures are compared on equally well-formed inputs.
+        """
+        base_model = BACKBONE_CLASSES[backbone](
+            input_shape=(image_size, image_size, 3),
+            alpha=alpha,
+            include_top=False,
+            weights="imagenet",
         )
         base_model.trainable = False
-        x = GlobalAveragePooling2D()(base_model.output)
-        x = Dropout(self.dropout_rate)(x)
+        inputs = Input(shape=EdgeModel.INPUT_SHAPE)
+        scale, offset = BACKBONE_INPUT_SCALING[backbone]
+        x = Rescaling(scale, offset=offset)(inputs)
+        if image_size != EdgeModel.INPUT_SHAPE[0]:
+            x = Resizing(image_size, image_size)(x)
+        x = GlobalAveragePooling2D()(base_model(x, training=False))
+        return Model(inputs=inputs, outputs=x, name="backbone")
+
+    def _create_head(self):
+        features = Input(shape=(self.feature_dim,))
+        x = Dropout(self.dropout_rate)(features)
         x = Dense(self.dense_neurons, activation="relu")(x)
         predictions = Dense(EdgeModel.NUM_CLASSES, activation="softmax")(x)
-        model = Model(inputs=base_model.input, outputs=predictions)
+        return Model(inputs=features, outputs=predictions, name="head")
+
+    def _create_model(self):
+        if self.backbone is None:
+            model = self.head
+        else:
+            model = Model(
+                inputs=self.backbone.input, outputs=self.head(self.backbone.output)
+            )
+        return self._compile(model)
 
+    def _compile(self, model):
         model.compile(
             optimizer=Adam(learning_rate=self.learning_rate),
             loss="categorical_crossentropy",
@@ -34,6 +107,12 @@ class EdgeModel:
     def get_model(self):
         return self.model
 
+    def get_head(self):
+        """Return the compiled head; it shares its weights with the full model."""
+        if self.head is not self.model:
+            self._compile(self.head)
+        return self.head
+
 
 if __name__ == "__main__":
     edge_model = EdgeModel(learning_rate=0.001, dropout_rate=0.3, dense_neurons=128)
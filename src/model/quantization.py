@@ -0,0 +1,144 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.app.backends import TFLiteBackend
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ["int8", "float16"]
+
+
+def representative_dataset(dataset, num_samples=200):
+    """Return a calibration generator over the first batches of a batch-size-1 dataset."""
+
+    def generator():
+        for images, _ in dataset.take(num_samples):
+            yield [images]
+
+    return generator
+
+
+def convert_model(model, mode=None, calibration_dataset=None, num_samples=200):
+    """Convert a Keras model to TFLite, optionally quantised.
+
+    ``mode`` is None for a float32 model, "float16" for float16 weights, or
+    "int8" for full-integer quantisation (int8 weights, activations, inputs
+    and outputs) calibrated on ``calibration_dataset``.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if calibration_dataset is None:
+            raise ValueError("INT8 quantisation needs a calibration dataset.")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(
+            calibration_dataset, num_samples=num_samples
+        )
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif mode is not None:
+        raise ValueError(f"Unknown quantisation mode '{mode}'.")
+    return converter.convert()
+
+
+def evaluate_tflite(model_content, val_dataset, latency_samples=50):
+    """Return (accuracy, mean single-image latency in ms) of a TFLite model."""
+    backend = TFLiteBackend(model_content=model_content)
+
+    correct = 0
+    total = 0
+    latency_images = None
+    for images, labels in val_dataset.as_numpy_iterator():
+        predictions = backend.predict(images)
+        correct += int(np.sum(np.argmax(predictions, axis=1) == np.argmax(labels, axis=1)))
+        total += len(images)
+        if latency_images is None:
+            latency_images = images
+    accuracy = correct / total
+
+    # Latency is measured at batch size 1, as seen by a single edge request
+    backend.predict(latency_images[:1])  # Warm-up
+    n = min(latency_samples, len(latency_images))
+    start_time = time.perf_counter()
+    for i in range(n):
+        backend.predict(latency_images[i : i + 1])
+    latency_ms = (time.perf_counter() - start_time) * 1000 / n
+
+    return accuracy, latency_ms
+
+
+def quantize_and_publish(
+    model,
+    calibration_dataset,
+    val_dataset,
+    keras_path,
+    modes=QUANTIZATION_MODES,
+    max_accuracy_drop=0.01,
+):
+    """Quantise the model and write each variant that passes the accuracy gate.
+
+    ``calibration_dataset`` yields single training images for INT8
+    calibration. Every variant is compared with the float32 TFLite model on
+    ``val_dataset``, and variants losing more than ``max_accuracy_drop``
+    accuracy are not written. Size, latency and accuracy deltas are logged to
+    the active MLflow run. Returns a dict mapping each published mode to its path.
+    """
+    import mlflow
+
+    baseline = convert_model(model)
+    base_accuracy, base_latency = evaluate_tflite(baseline, val_dataset)
+    mlflow.log_metrics(
+        {
+            "tflite_float32_accuracy": base_accuracy,
+            "tflite_float32_latency_ms": base_latency,
+            "tflite_float32_size_mb": len(baseline) / 1e6,
+        }
+    )
+
+    stem = os.path.splitext(keras_path)[0]
+    published = {}
+    for mode in modes:
+        quantized = convert_model(model, mode, calibration_dataset=calibration_dataset)
+        accuracy, latency = evaluate_tflite(quantized, val_dataset)
+        accuracy_drop = base_accuracy - accuracy
+
+        mlflow.log_metrics(
+            {
+                f"tflite_{mode}_accuracy": accuracy,
+                f"tflite_{mode}_accuracy_drop": accuracy_drop,
+                f"tflite_{mode}_latency_ms": latency,
+                f"tflite_{mode}_speedup": base_latency / latency if latency else 0.0,
+                f"tflite_{mode}_size_mb": len(quantized) / 1e6,
+                f"tflite_{mode}_size_ratio": len(quantized) / len(baseline),
+            }
+        )
+        logger.info(
+            f"{mode}: accuracy {accuracy:.4f} (drop {accuracy_drop:+.4f}), "
+            f"latency {latency:.2f} ms vs {base_latency:.2f} ms, "
+            f"size {len(quantized) / 1e6:.2f} MB vs {len(baseline) / 1e6:.2f} MB"
+        )
+
+        if accuracy_drop > max_accuracy_drop:
+            logger.warning(
+                f"Not publishing {mode} model: accuracy drop {accuracy_drop:.4f} "
+                f"exceeds the allowed {max_accuracy_drop:.4f}."
+            )
+            mlflow.set_tag(f"tflite_{mode}_published", "false")
+            continue
+
+        output_path = f"{stem}.{mode}.tflite"
+        with open(output_path, "wb") as f:
+            f.write(quantized)
+        mlflow.log_artifact(output_path, artifact_path="edge_models")
+        mlflow.set_tag(f"tflite_{mode}_published", "true")
+        published[mode] = output_path
+
+    return published
@@ -1,18 +1,130 @@
-from pydantic import BaseModel, conlist, validator
-
-# Define the schema for the entire image
-class ImageSchema(BaseModel):
-    # Each image is a list of lists of lists of floats (224 rows of 224 pixels, each with 3 float values)
-    image: conlist(conlist(conlist(float, min_items=3, max_items=3), min_items=224, max_items=224), min_items=224, max_items=224)
-
-    # Add a custom validation to check the range of the pixel values (0-1 for normalized or 0-255 for standard RGB)
-    @validator('image', each_item=True)
-    def check_pixel_values(cls, pixel_row):
-        for pixel in pixel_row:
-            if not all(0 <= channel <= 1 for channel in pixel):  # Adjust the range if not using normalized values
-                raise ValueError(f'Pixel values must be between 0 and 1. Got: {pixel}')
-        return pixel_row
-
-# Define the schema for the array of images
-class ImagesSchema(BaseModel):
-    images: conlist(ImageSchema, min_items=1)
+import base64
+import io
+import json
+from typing import List
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.data.decode import IMAGE_SIZE, normalize_into
+
+# Element types accepted for tensor uploads; uint8 pixels are scaled to [0, 1]
+TENSOR_DTYPES = {"uint8": np.uint8, "float32": np.float32}
+NPY_CONTENT_TYPES = {"application/x-npy", "application/npy"}
+
+
+class TooManyImages(ValueError):
+    """A tensor upload declares more images than a request may hold."""
+
+
+def check_image_count(shape, max_images):
+    """Reject a declared (N, H, W, 3) or (H, W, 3) shape holding more than ``max_images`` images."""
+    count = shape[0] if len(shape) == 4 else 1
+    if max_images is not None and count > max_images:
+        raise TooManyImages(f"At most {max_images} images are accepted per request, got {count}.")
+
+
+def parse_shape(text):
+    """Parse a shape header such as ``"8,224,224,3"`` (or ``"8x224x224x3"``)."""
+    try:
+        return tuple(int(dim) for dim in text.replace("x", ",").split(","))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid tensor shape '{text}'.")
+
+
+def decode_tensor(buffer, shape, dtype="float32"):
+    """Wrap a raw little-endian buffer as an array of ``shape``, without copying it."""
+    if dtype not in TENSOR_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}' (expected one of {sorted(TENSOR_DTYPES)}).")
+    dtype = np.dtype(TENSOR_DTYPES[dtype]).newbyteorder("<")
+    shape = tuple(shape)
+    if not shape or any(dim <= 0 for dim in shape):
+        raise ValueError(f"Invalid tensor shape {shape}.")
+    expected = int(np.prod(shape)) * dtype.itemsize
+    if len(buffer) != expected:
+        raise ValueError(f"Expected {expected} bytes for shape {shape} and dtype {dtype.name}, got {len(buffer)}.")
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+def load_npy(contents, max_images=None):
+    """Read a ``.npy`` payload; pickled object arrays are refused."""
+    buffer = io.BytesIO(contents)
+    try:
+        # The header alone gives the shape, so oversized batches are not read
+        version = np.lib.format.read_magic(buffer)
+        if version == (1, 0):
+            shape = np.lib.format.read_array_header_1_0(buffer)[0]
+        else:
+            shape = np.lib.format.read_array_header_2_0(buffer)[0]
+        check_image_count(shape, max_images)
+        buffer.seek(0)
+        return np.load(buffer, allow_pickle=False)
+    except (EOFError, OSError) as e:
+        # Empty or truncated bodies are bad input like any other malformed tensor
+        raise ValueError(f"Invalid .npy payload: {e}") from e
+
+
+def validate_images(array, image_size=IMAGE_SIZE):
+    """Check a tensor of RGB images and return it as a float32 (N, H, W, 3) batch in [0, 1].
+
+    A single (H, W, 3) image is given a batch axis. uint8 pixels are scaled by
+    1/255; float32 pixels must already be finite and within [0, 1]. The checks
+    are whole-array reductions, so validating a batch costs a few passes over
+    memory rather than a Python call per pixel.
+    """
+    if array.ndim == 3:
+        array = array[np.newaxis]
+    width, height = image_size
+    if array.ndim != 4 or array.shape[1:] != (height, width, 3):
+        raise ValueError(f"Expected images of shape (N, {height}, {width}, 3), got {array.shape}.")
+
+    if array.dtype == np.uint8:
+        return normalize_into(array)
+    if array.dtype.kind != "f" or array.dtype.itemsize != 4:
+        raise ValueError(f"Unsupported dtype '{array.dtype}' (expected uint8 or float32).")
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    # min/max propagate NaN, so one comparison each also rejects non-finite values
+    low, high = array.min(), array.max()
+    if not (low >= 0.0 and high <= 1.0):
+        raise ValueError(f"Pixel values must be finite and between 0 and 1. Got range [{low}, {high}].")
+    return array
+
+
+class TensorSchema(BaseModel):
+    """JSON tensor payload: base64-encoded little-endian pixels plus their shape and dtype."""
+
+    data: str
+    shape: List[int]
+    dtype: str = "float32"
+
+    def to_array(self, max_images=None):
+        check_image_count(self.shape, max_images)
+        try:
+            buffer = base64.b64decode(self.data, validate=True)
+        except ValueError:
+            raise ValueError("Tensor data is not valid base64.")
+        return decode_tensor(buffer, self.shape, self.dtype)
+
+
+def parse_tensor_upload(contents, content_type, shape=None, dtype="float32", max_images=None):
+    """Return the validated image batch of a tensor request body.
+
+    ``application/x-npy`` bodies are ``.npy`` files. ``application/json`` bodies
+    follow ``TensorSchema``. Any other body is a raw buffer described by
+    ``shape`` and ``dtype`` (sent as headers). A declared shape holding more
+    than ``max_images`` images raises ``TooManyImages`` before any pixels are read.
+    """
+    if content_type in NPY_CONTENT_TYPES:
+        array = load_npy(contents, max_images)
+    elif content_type == "application/json":
+        payload = json.loads(contents)
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with 'data', 'shape' and 'dtype'.")
+        array = TensorSchema(**payload).to_array(max_images)
+    else:
+        if shape is None:
+            raise ValueError("Raw tensors need a shape, e.g. 'X-Tensor-Shape: 1,224,224,3'.")
+        shape = parse_shape(shape)
+        check_image_count(shape, max_images)
+        array = decode_tensor(contents, shape, dtype)
+    return validate_images(array)
@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+
+# Architecture of EdgeModel unless a trial searches it. Every variant takes the
+# same 224x224 input (src/data/decode.py); image_size is the resolution the
+# backbone runs at after the model's own resize layer.
+DEFAULT_ARCHITECTURE = {"backbone": "mobilenet_v3_small", "alpha": 1.0, "image_size": 224}
+
+# Searched with --search_architecture; these alphas and sizes all have ImageNet weights
+BACKBONES = ["mobilenet_v3_small", "mobilenet_v3_large", "mobilenet_v2"]
+ALPHAS = [0.75, 1.0]
+IMAGE_SIZES = [128, 160, 192, 224]
+
+# Objectives of an architecture search, in the order the objective returns them
+OBJECTIVES = ["val_accuracy", "latency_ms", "size_mb"]
+DIRECTIONS = ["maximize", "minimize", "minimize"]
+
+
+def suggest_architecture(trial):
+    return {
+        "backbone": trial.suggest_categorical("backbone", BACKBONES),
+        "alpha": trial.suggest_categorical("alpha", ALPHAS),
+        "image_size": trial.suggest_categorical("image_size", IMAGE_SIZES),
+    }
+
+
+def architecture_from_params(params):
+    """The architecture of a trial's params, defaulting what it did not search."""
+    return {key: params.get(key, default) for key, default in DEFAULT_ARCHITECTURE.items()}
+
+
+def measure_latency(model, runs=20, warmup=3):
+    """Median single-image CPU latency of a Keras model, in milliseconds."""
+    import tensorflow as tf
+
+    image = np.zeros((1, *model.input_shape[1:]), dtype=np.float32)
+    # Pinned to the CPU, like the edge devices, even on a GPU training host
+    with tf.device("/CPU:0"):
+        for _ in range(warmup):
+            model.predict_on_batch(image)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(image)
+            samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1000)
+
+
+def model_size_mb(model):
+    """Size of the model's float32 weights, which dominates its exported file size."""
+    return sum(int(np.prod(weight.shape)) * 4 for weight in model.weights) / 2**20
+
+
+def trial_points(study):
+    """Objective values of a study's completed trials, one dict per trial."""
+    from optuna.trial import TrialState
+
+    return [
+        {"number": trial.number, "params": trial.params, **dict(zip(OBJECTIVES, trial.values))}
+        for trial in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    ]
+
+
+def pareto_front(points):
+    """Return the points no other point beats on accuracy, latency and size at once.
+
+    A point is dominated when another is at least as accurate, fast and small,
+    and strictly better on one of them. The front is sorted by latency.
+    """
+    if not points:
+        return []
+    # Negate accuracy so that lower is better on every column
+    values = np.array([[-p["val_accuracy"], p["latency_ms"], p["size_mb"]] for p in points])
+    no_worse = (values[:, None, :] <= values[None, :, :]).all(axis=2)
+    better = (values[:, None, :] < values[None, :, :]).any(axis=2)
+    dominated = (no_worse & better).any(axis=0)
+    front = [point for point, is_dominated in zip(points, dominated) if not is_dominated]
+    return sorted(front, key=lambda p: (p["latency_ms"], -p["val_accuracy"]))
+
+
+def select_trial(points, max_latency_ms=None, min_accuracy=None):
+    """Pick the trial to deploy, or None when no trial meets the constraints.
+
+    Trials slower than ``max_latency_ms`` are ruled out. With ``min_accuracy``,
+    the fastest trial reaching it is chosen; without one, the most accurate
+    trial within the latency budget is chosen.
+    """
+    candidates = [
+        p for p in points
+        if (max_latency_ms is None or p["latency_ms"] <= max_latency_ms)
+        and (min_accuracy is None or p["val_accuracy"] >= min_accuracy)
+    ]
+    if not candidates:
+        return None
+    if min_accuracy is not None:
+        return min(candidates, key=lambda p: (p["latency_ms"], -p["val_accuracy"], p["size_mb"]))
+    return max(candidates, key=lambda p: (p["val_accuracy"], -p["latency_ms"], -p["size_mb"]))
+
+
+def format_front(front):
+    lines = [f"{'trial':>5} {'accuracy':>9} {'latency_ms':>11} {'size_mb':>8}  architecture"]
+    for p in front:
+        architecture = architecture_from_params(p["params"])
+        lines.append(
+            f"{p['number']:>5} {p['val_accuracy']:>9.4f} {p['latency_ms']:>11.2f} {p['size_mb']:>8.2f}  "
+            f"{architecture['backbone']} alpha={architecture['alpha']} size={architecture['image_size']}"
+        )
+    return "\n".join(lines)
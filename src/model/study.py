@@ -0,0 +1,135 @@
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STUDY_NAME = "edge"
+DEFAULT_STORAGE = "optuna_journal.log"
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"]
+
+
+def create_storage(storage):
+    """Return an Optuna storage for a database URL or a journal file path.
+
+    URLs such as ``sqlite:///optuna.db`` are passed to Optuna as they are.
+    Anything else is treated as the path of an append-only journal file,
+    which is safe to share between worker processes on one host.
+    """
+    if storage is None or "://" in storage:
+        return storage
+    from optuna.storages import JournalFileStorage, JournalStorage
+
+    return JournalStorage(JournalFileStorage(storage))
+
+
+def load_study(study_name=DEFAULT_STUDY_NAME, storage=DEFAULT_STORAGE, directions=None):
+    """Create the study, or resume it if it already exists in the storage.
+
+    Pruners are not persisted, so every worker builds the same median pruner;
+    it reads the intermediate values of all workers from the shared storage.
+    With ``directions``, the study optimises several objectives at once. Optuna
+    cannot prune such trials, and a study's directions cannot change once created.
+    """
+    import optuna
+
+    return optuna.create_study(
+        study_name=study_name,
+        storage=create_storage(storage),
+        directions=directions or ["maximize"],
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=2),
+        load_if_exists=True,
+    )
+
+
+def finished_trials(study):
+    from optuna.trial import TrialState
+
+    return len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+
+
+def _set_thread_budget(threads):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+
+def _worker(objective, study_name, storage, n_trials, threads, callbacks, directions):
+    # The thread variables are already in the environment; TensorFlow reads them on import
+    import tensorflow as tf
+    from optuna.study import MaxTrialsCallback
+    from optuna.trial import TrialState
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    study = load_study(study_name, storage, directions)
+    study.optimize(
+        objective,
+        n_trials=n_trials,
+        callbacks=[MaxTrialsCallback(n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))]
+        + list(callbacks or []),
+    )
+
+
+def run_study(
+    objective,
+    n_trials,
+    study_name=DEFAULT_STUDY_NAME,
+    storage=DEFAULT_STORAGE,
+    n_workers=1,
+    threads_per_worker=None,
+    callbacks=None,
+    directions=None,
+):
+    """Run a persistent study until it holds ``n_trials`` finished trials.
+
+    Trials already in the storage count towards ``n_trials``, so a crashed or
+    interrupted run resumes where it stopped. With ``n_workers > 1``, that many
+    spawned processes pull trials from the shared storage. Each worker gets
+    ``threads_per_worker`` threads (all cores split evenly by default). The
+    objective must be picklable in that case.
+    """
+    study = load_study(study_name, storage, directions)
+    remaining = n_trials - finished_trials(study)
+    if remaining <= 0:
+        logger.info(f"Study '{study_name}' already has {n_trials} finished trials.")
+        return study
+    logger.info(f"Running {remaining} trials of study '{study_name}' on {n_workers} worker(s)")
+
+    if n_workers <= 1:
+        study.optimize(objective, n_trials=remaining, callbacks=callbacks)
+        return study
+
+    if storage is None:
+        raise ValueError("Parallel workers need a persistent storage to share the study.")
+
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // n_workers)
+    previous_env = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    _set_thread_budget(threads)
+
+    # Spawned (not forked) workers so each gets a clean TensorFlow runtime
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=_worker,
+            args=(objective, study_name, storage, n_trials, threads, callbacks, directions),
+        )
+        for _ in range(n_workers)
+    ]
+    try:
+        for worker in workers:
+            worker.start()
+    finally:
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    for worker in workers:
+        worker.join()
+    failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} study worker(s) exited with errors: {failed}")
+
+    return load_study(study_name, storage, directions)
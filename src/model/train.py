@@ -1,27 +1,201 @@
 import argparse
+import os
 
-import mlflow
-import optuna
-from optuna.integration import KerasPruningCallback
+# TensorFlow, Keras, MLflow and Optuna are imported by the functions that use
+# them, so parsing arguments (and --help) does not wait for them to load
+from model.checkpoints import DEFAULT_CHECKPOINT_DIR, BestCheckpoint
+from model.search import (DEFAULT_ARCHITECTURE, DIRECTIONS, architecture_from_params,
+                          format_front, measure_latency, model_size_mb, pareto_front,
+                          select_trial, suggest_architecture, trial_points)
+from model.study import DEFAULT_STORAGE, DEFAULT_STUDY_NAME, run_study
 
-from model.data_preparation import load_data
-from model.model import EdgeModel
+AUGMENTATION_SEED = 42
+# Epochs without a val_accuracy improvement before a fit stops
+DEFAULT_PATIENCE = 5
 
 
-def objective(trial):
-    # Load data
-    train_data, val_data = load_data()
+def make_augmenter(seed=AUGMENTATION_SEED):
+    """Training-time augmentation: small rotations, shifts and zooms of each batch."""
+    from src.data.augmentation import BatchAugmenter
+
+    return BatchAugmenter(angle=15, x_shift=25, y_shift=25, scale=0.1, seed=seed)
+
+
+def objective(
+    trial,
+    cache=None,
+    features=None,
+    augment=False,
+    shard_dir=None,
+    architecture=None,
+    checkpoint=None,
+    patience=DEFAULT_PATIENCE,
+    index_path=None,
+):
+    """Validation accuracy of a trial; with a searched ``architecture``, also its latency and size."""
+    from model.data_preparation import load_data
+
+    # Load the train/validation split (file paths only, images are streamed)
+    train_data, val_data = load_data(index_path=index_path)
 
     # Pass the trial to train_model using Optuna to suggest parameters
-    val_accuracy = train_model(train_data, val_data, trial)
+    history = train_model(
+        train_data,
+        val_data,
+        trial,
+        cache=cache,
+        features=features,
+        augment=augment,
+        shard_dir=shard_dir,
+        architecture=architecture,
+        checkpoint=checkpoint,
+        patience=patience,
+    )
 
     # Return the validation accuracy to be maximised
-    return val_accuracy
+    val_accuracy = max(history.history["val_accuracy"])
+    if architecture is None:
+        return val_accuracy
+    return val_accuracy, trial.user_attrs["latency_ms"], trial.user_attrs["size_mb"]
+
+
+class StudyObjective:
+    """Picklable objective that opens the shared caches once per process.
+
+    Parallel study workers receive a pickled copy; the decoded-image cache and
+    backbone features are (re)opened lazily in each process, and memory-mapped
+    data is never pickled. With ``search_architecture``, each trial also picks
+    a backbone, width and resolution, and features are extracted once per
+    architecture. With ``checkpoint_path``, the weights of the best trial so
+    far are kept there (see ``BestCheckpoint``).
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        feature_dir=None,
+        augment=False,
+        shard_dir=None,
+        search_architecture=False,
+        checkpoint_path=None,
+        patience=DEFAULT_PATIENCE,
+    ):
+        if augment and feature_dir:
+            raise ValueError("Augmentation cannot be used with cached backbone features.")
+        self.cache_dir = cache_dir
+        self.feature_dir = feature_dir
+        self.augment = augment
+        self.shard_dir = shard_dir
+        self.search_architecture = search_architecture
+        self.checkpoint_path = checkpoint_path
+        self.patience = patience
+        self.checkpoint = BestCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.cache = None
+        self.index_path = None
+        self.features = None
+        self._features = {}
+        self._loaded = False
+
+    def load(self):
+        if not self._loaded:
+            from model.data_preparation import index_path_for, open_cache, write_split_shards
+
+            # The dataset index is saved next to the decoded-image cache, not in the dataset
+            self.index_path = index_path_for(self.cache_dir)
+            self.cache = open_cache(self.cache_dir) if self.cache_dir else None
+            if self.shard_dir:
+                write_split_shards(self.shard_dir, index_path=self.index_path)
+            if self.feature_dir and not self.search_architecture:
+                self.features = self.features_for(DEFAULT_ARCHITECTURE)
+            self._loaded = True
+        return self
+
+    def features_for(self, architecture):
+        """Backbone features of both splits for an architecture, or None without --feature_dir."""
+        if not self.feature_dir:
+            return None
+        key = tuple(sorted(architecture.items()))
+        if key not in self._features:
+            from model.data_preparation import load_data
+            from model.features import load_features
+
+            train_data, val_data = load_data(index_path=self.index_path)
+            self._features[key] = load_features(
+                train_data, val_data, self.feature_dir, cache=self.cache, architecture=architecture
+            )
+        return self._features[key]
+
+    def __call__(self, trial):
+        self.load()
+        architecture = suggest_architecture(trial) if self.search_architecture else None
+        return objective(
+            trial,
+            cache=self.cache,
+            features=self.features_for(architecture) if architecture else self.features,
+            augment=self.augment,
+            shard_dir=self.shard_dir,
+            architecture=architecture,
+            checkpoint=self.checkpoint,
+            patience=self.patience,
+            index_path=self.index_path,
+        )
+
+    def __getstate__(self):
+        return {
+            "cache_dir": self.cache_dir,
+            "feature_dir": self.feature_dir,
+            "augment": self.augment,
+            "shard_dir": self.shard_dir,
+            "search_architecture": self.search_architecture,
+            "checkpoint_path": self.checkpoint_path,
+            "patience": self.patience,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
 
 
-def train_model(train_data, val_data, trial_or_params):
+def train_model(
+    train_data,
+    val_data,
+    trial_or_params,
+    cache=None,
+    features=None,
+    augment=False,
+    shard_dir=None,
+    architecture=None,
+    checkpoint=None,
+    patience=DEFAULT_PATIENCE,
+):
+    """Train the model for one trial (or for a dict of known params).
+
+    When ``features`` holds precomputed backbone embeddings for both splits
+    (see ``model.features.load_features``), only the classification head is
+    built and trained on them, which is equivalent because the backbone is
+    frozen. With ``augment``, training batches are randomly transformed in
+    memory by a seeded ``BatchAugmenter``. With ``shard_dir`` (see
+    ``write_split_shards``), both splits are streamed from tar shards instead
+    of individual files. A trial given an ``architecture`` builds that
+    backbone, and its CPU latency and model size are stored as the trial's
+    ``latency_ms`` and ``size_mb`` user attributes.
+
+    Training stops after ``patience`` epochs without a ``val_accuracy``
+    improvement and keeps the best epoch's weights. Only params and metrics
+    are logged to MLflow; the model itself is kept by offering it to
+    ``checkpoint``, which retains it only if it is the best trial so far.
+    """
+    import mlflow
+    from model.callbacks import BestEpochStopping
+    from optuna.integration import KerasPruningCallback
+
+    from model.data_preparation import make_dataset, make_shard_dataset
+    from model.features import fit_head
+    from model.model import EdgeModel
+
     # Check if we are retraining with known parameters or using Optuna's trial to suggest them
+    search = architecture is not None and not isinstance(trial_or_params, dict)
     if isinstance(trial_or_params, dict):
+        architecture = architecture_from_params(trial_or_params)
         # Retraining with provided params
         learning_rate = trial_or_params["learning_rate"]
         dropout_rate = trial_or_params["dropout_rate"]
@@ -37,9 +211,17 @@ def train_model(train_data, val_data, trial_or_params):
         dense_neurons = trial_or_params.suggest_int("dense_neurons", 64, 256)
         batch_size = trial_or_params.suggest_categorical("batch_size", [16, 32, 64])
         epochs = trial_or_params.suggest_int("epochs", 5, 50)
+        architecture = architecture or DEFAULT_ARCHITECTURE
 
     # Initialise the model with either suggested parameters or the best-known parameters
-    edge_model = EdgeModel(learning_rate, dropout_rate, dense_neurons)
+    edge_model = EdgeModel(
+        learning_rate,
+        dropout_rate,
+        dense_neurons,
+        head_only=features is not None,
+        feature_dim=features[0][0].shape[1] if features is not None else None,
+        **architecture,
+    )
     model = edge_model.get_model()
 
     with mlflow.start_run():
@@ -51,36 +233,148 @@ def train_model(train_data, val_data, trial_or_params):
                 "dense_neurons": dense_neurons,
                 "batch_size": batch_size,
                 "epochs": epochs,
+                **architecture,
             }
         )
 
+        # Multi-objective trials cannot be pruned
+        callbacks = [BestEpochStopping(patience)]
+        if not isinstance(trial_or_params, dict) and not search:
+            callbacks.append(KerasPruningCallback(trial_or_params, "val_accuracy"))
+
         # Train the model
-        history = model.fit(
-            train_data[0],
-            train_data[1],
-            validation_data=val_data,
-            shuffle=True,
-            batch_size=batch_size,
-            epochs=epochs,
-            callbacks=[KerasPruningCallback(trial_or_params, "val_accuracy")]
-            if not isinstance(trial_or_params, dict)
-            else [],
-        )
+        augmenter = make_augmenter() if augment else None
+        if features is not None:
+            # Only the head is trained, on cached embeddings held in memory
+            history = fit_head(model, features, batch_size, epochs, callbacks=callbacks)
+        elif shard_dir is not None:
+            # Stream both splits sequentially from their shards
+            history = model.fit(
+                make_shard_dataset(
+                    os.path.join(shard_dir, "train"),
+                    batch_size=batch_size,
+                    shuffle=True,
+                    augmenter=augmenter,
+                ),
+                validation_data=make_shard_dataset(
+                    os.path.join(shard_dir, "val"), batch_size=batch_size
+                ),
+                epochs=epochs,
+                callbacks=callbacks,
+            )
+        else:
+            # Stream both splits, from the shared decoded-image cache when one is open
+            train_dataset = make_dataset(
+                *train_data,
+                batch_size=batch_size,
+                shuffle=True,
+                cache=cache,
+                augmenter=augmenter,
+            )
+            history = model.fit(
+                train_dataset,
+                validation_data=make_dataset(*val_data, batch_size=batch_size, cache=cache),
+                epochs=epochs,
+                callbacks=callbacks,
+            )
 
-        # Log metrics and save the model
+        # Log metrics; the weights are only written when they beat every earlier trial
         val_accuracy = max(history.history["val_accuracy"])
-        mlflow.log_metric("val_accuracy", val_accuracy)
-        mlflow.keras.log_model(model, "model")
+        mlflow.log_metrics(
+            {"val_accuracy": val_accuracy, "epochs_trained": len(history.history["val_accuracy"])}
+        )
+        if checkpoint is not None and not isinstance(trial_or_params, dict):
+            if checkpoint.offer(
+                model,
+                val_accuracy,
+                trial_or_params.number,
+                trial_or_params.params,
+                head_only=features is not None,
+            ):
+                mlflow.set_tag("best_checkpoint", "true")
+
+        if search:
+            # Time the deployed model: a head-only trial's weights lack the backbone
+            deployed = model if features is None else EdgeModel(
+                learning_rate, dropout_rate, dense_neurons, **architecture
+            ).get_model()
+            latency_ms, size_mb = measure_latency(deployed), model_size_mb(deployed)
+            trial_or_params.set_user_attr("latency_ms", latency_ms)
+            trial_or_params.set_user_attr("size_mb", size_mb)
+            mlflow.log_metrics({"latency_ms": latency_ms, "size_mb": size_mb})
 
     return history
 
 
+def select_best_trial(study, search_architecture=False, max_latency_ms=None, min_accuracy=None):
+    """Return the trial to deploy as a dict, and the Pareto front of an architecture search.
+
+    A single-objective study's best trial is used as is. After an architecture
+    search, the trial is picked from all completed ones with ``select_trial``:
+    the fastest reaching ``min_accuracy``, or the most accurate one, within
+    ``max_latency_ms``.
+    """
+    if not search_architecture:
+        best_trial = study.best_trial
+        selected = {"number": best_trial.number, "params": best_trial.params, "val_accuracy": best_trial.value}
+        return selected, []
+
+    points = trial_points(study)
+    selected = select_trial(points, max_latency_ms, min_accuracy)
+    if selected is None:
+        # The study is kept, so re-running with looser limits skips straight to selection
+        raise RuntimeError(
+            f"No trial is within {max_latency_ms} ms with accuracy >= {min_accuracy}; "
+            "relax --latency_budget_ms or --min_accuracy."
+        )
+    return selected, pareto_front(points)
+
+
+def add_study_arguments(parser):
+    """Register the persistent, parallel study options shared with pipeline.py."""
+    parser.add_argument('--study_name', default=DEFAULT_STUDY_NAME, help='Name of the Optuna study to create or resume')
+    parser.add_argument('--storage', default=DEFAULT_STORAGE, help='Study storage: a database URL (e.g. sqlite:///optuna.db) or a journal file path')
+    parser.add_argument('--n_workers', type=int, default=1, help='Number of worker processes running trials in parallel')
+    parser.add_argument('--threads_per_worker', type=int, default=None, help='CPU threads per worker (defaults to cores / workers)')
+    parser.add_argument('--cache_dir', default=None, help='Directory of the persistent decoded-image cache shared by all trials')
+    parser.add_argument('--feature_dir', default=None, help='Directory for cached backbone features; when set, trials only train the head')
+    parser.add_argument('--augment', action='store_true', help='Randomly rotate, shift and scale training batches in memory')
+    parser.add_argument('--shard_dir', default=None, help='Directory of tar shards to stream the train/val splits from (packed on first use)')
+    parser.add_argument('--checkpoint_dir', default=DEFAULT_CHECKPOINT_DIR, help='Directory keeping the weights of each study\'s best trial so far')
+    parser.add_argument('--patience', type=int, default=DEFAULT_PATIENCE, help='Epochs without a val_accuracy improvement before training stops early')
+    parser.add_argument('--search_architecture', action='store_true', help='Also search backbone, width and resolution, optimising accuracy, CPU latency and size (use a new --study_name)')
+    parser.add_argument('--latency_budget_ms', type=float, default=None, help='With --search_architecture, only deploy models at most this slow per image')
+    parser.add_argument('--min_accuracy', type=float, default=None, help='With --search_architecture, deploy the fastest model reaching this validation accuracy')
+
+
 if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Train an Edge Model.")
     parser.add_argument('--n_trials', type=int, default=100, help='Number of trials for optimisation')
+    add_study_arguments(parser)
     args = parser.parse_args()
 
-    # Start Optuna optimisation
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=100)
+    # Start (or resume) Optuna optimisation
+    study = run_study(
+        StudyObjective(
+            args.cache_dir,
+            args.feature_dir,
+            args.augment,
+            args.shard_dir,
+            args.search_architecture,
+            checkpoint_path=os.path.join(args.checkpoint_dir, args.study_name),
+            patience=args.patience,
+        ).load(),
+        n_trials=args.n_trials,
+        study_name=args.study_name,
+        storage=args.storage,
+        n_workers=args.n_workers,
+        threads_per_worker=args.threads_per_worker,
+        directions=DIRECTIONS if args.search_architecture else None,
+    )
+    selected, front = select_best_trial(
+        study, args.search_architecture, args.latency_budget_ms, args.min_accuracy
+    )
+    if front:
+        print(f"Pareto front:\n{format_front(front)}")
+    print(f"Best trial: {selected['number']} ({selected['val_accuracy']})")
@@ -1,62 +1,143 @@
 import argparse
+import os
 
-import mlflow.tensorflow
-import optuna
-from optuna.integration.mlflow import MLflowCallback
 import logging
 
 # Set up basic logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from model.data_preparation import load_data
-from model.model import EdgeModel
-from model.train import objective
+from model.export import EXPORT_FORMATS, export_model
+from model.quantization import QUANTIZATION_MODES, quantize_and_publish
+from model.search import DIRECTIONS, OBJECTIVES, architecture_from_params, format_front
+from model.study import run_study
+from model.train import StudyObjective, add_study_arguments, make_augmenter, select_best_trial
+from src.app.metrics import stage_totals, timed
+from src.app.registry import ModelRegistry
 
 
 def main(args):
-    # Load data
-    train_data, val_data = load_data()
+    # The heavy frameworks load here rather than at import, so --help is instant
+    import mlflow.tensorflow
+    from optuna.integration.mlflow import MLflowCallback
+
+    from model.callbacks import BestEpochStopping
+    from model.data_preparation import index_path_for, load_data, make_dataset, make_shard_dataset
+    from model.features import fit_head
+    from model.model import EdgeModel
+
+    # Load the train/validation split (file paths only, images are streamed)
+    train_data, val_data = load_data(index_path=index_path_for(args.cache_dir))
+
+    # Decode the dataset once and, with --feature_dir, run the frozen backbone
+    # once so that trials only train the small head; every trial and the final
+    # fit then reuse the same caches
+    with timed("prepare_caches"):
+        study_objective = StudyObjective(
+            args.cache_dir,
+            args.feature_dir,
+            args.augment,
+            args.shard_dir,
+            args.search_architecture,
+            checkpoint_path=os.path.join(args.checkpoint_dir, args.study_name),
+            patience=args.patience,
+        ).load()
+    cache = study_objective.cache
+
+    # With --shard_dir, splits are streamed from the tar shards packed above
+    def split_dataset(name, data, batch_size, shuffle=False, augmenter=None):
+        if args.shard_dir:
+            return make_shard_dataset(
+                os.path.join(args.shard_dir, name),
+                batch_size=batch_size,
+                shuffle=shuffle,
+                augmenter=augmenter,
+            )
+        return make_dataset(
+            *data, batch_size=batch_size, shuffle=shuffle, cache=cache, augmenter=augmenter
+        )
 
     # Set up MLflow callback for Optuna
     mlflow_callback = MLflowCallback(
-        tracking_uri=mlflow.get_tracking_uri(), metric_name="val_accuracy"
+        tracking_uri=mlflow.get_tracking_uri(),
+        metric_name=OBJECTIVES if args.search_architecture else "val_accuracy",
     )
 
-    # Create a study object and specify that we aim to maximise the objective function
-    study = optuna.create_study(direction="maximize")
-    study.optimize(
-        lambda trial: objective(trial),
-        n_trials=args.n_trials,
-        callbacks=[mlflow_callback],
+    # Create (or resume) the persistent study and maximise the objective function,
+    # optionally across several worker processes
+    with timed("study"):
+        study = run_study(
+            study_objective,
+            n_trials=args.n_trials,
+            study_name=args.study_name,
+            storage=args.storage,
+            n_workers=args.n_workers,
+            threads_per_worker=args.threads_per_worker,
+            callbacks=[mlflow_callback],
+            directions=DIRECTIONS if args.search_architecture else None,
+        )
+
+    # Retrieve the best parameters; after an architecture search, the trial
+    # that best fits the latency budget and accuracy floor
+    best_trial, front = select_best_trial(
+        study, args.search_architecture, args.latency_budget_ms, args.min_accuracy
     )
-
-    # Retrieve the best parameters
-    best_trial = study.best_trial
-    logger.info(f"Best trial: {best_trial.number}")
-    logger.info(f"Value: {best_trial.value}")
+    if front:
+        logger.info(f"Pareto front of accuracy, latency and size:\n{format_front(front)}")
+        mlflow.log_dict({"pareto_front": front, "selected": best_trial}, "pareto_front.json")
+    logger.info(f"Best trial: {best_trial['number']}")
+    logger.info(f"Value: {best_trial['val_accuracy']}")
     logger.info("Params: ")
-    for key, value in best_trial.params.items():
+    for key, value in best_trial["params"].items():
         logger.info(f"    {key}: {value}")
 
-    # Retrain the model with the best parameters
-    best_params = best_trial.params
+    # Rebuild the model with the best parameters
+    best_params = best_trial["params"]
+    architecture = architecture_from_params(best_params)
+    features = study_objective.features_for(architecture)
     edge_model = EdgeModel(
         learning_rate=best_params["learning_rate"],
         dropout_rate=best_params["dropout_rate"],
         dense_neurons=best_params["dense_neurons"],
+        **architecture,
     )
     final_model = edge_model.get_model()
 
-    # Fit the model with the training data
-    final_model.fit(
-        train_data[0],
-        train_data[1],
-        validation_data=val_data,
-        shuffle=True,
-        batch_size=best_params["batch_size"],
-        epochs=best_params["epochs"],
-    )
+    checkpoint = study_objective.checkpoint
+    if not args.retrain and checkpoint.matches(best_trial["number"], best_params):
+        # The best trial's weights were kept while the study ran, so there is nothing to retrain
+        checkpoint.restore(edge_model)
+        logger.info(f"Promoted the checkpoint of trial {best_trial['number']}")
+        mlflow.set_tag("promoted_trial", best_trial["number"])
+    else:
+        # Fit the model with the training data; needed with --retrain, or when the
+        # selected trial is not the most accurate one (after an architecture search)
+        early_stopping = BestEpochStopping(args.patience)
+        with timed("final_fit"):
+            if features is not None:
+                # The head shares its weights with final_model, so this trains the full model
+                fit_head(
+                    edge_model.get_head(),
+                    features,
+                    batch_size=best_params["batch_size"],
+                    epochs=best_params["epochs"],
+                    callbacks=[early_stopping],
+                )
+            else:
+                train_dataset = split_dataset(
+                    "train",
+                    train_data,
+                    batch_size=best_params["batch_size"],
+                    shuffle=True,
+                    augmenter=make_augmenter() if args.augment else None,
+                )
+                val_dataset = split_dataset("val", val_data, batch_size=best_params["batch_size"])
+                final_model.fit(
+                    train_dataset,
+                    validation_data=val_dataset,
+                    epochs=best_params["epochs"],
+                    callbacks=[early_stopping],
+                )
 
     # Save the model in MLflow
     mlflow.tensorflow.log_model(final_model, "model")
@@ -64,6 +145,51 @@ def main(args):
     # Optional -- Save the model locally as well
     final_model.save("best_model.h5")
 
+    # Export lightweight edge formats next to the .h5 and track them in MLflow
+    with timed("export"):
+        exported = export_model(final_model, "best_model.h5", formats=args.export_formats)
+    for path in exported.values():
+        mlflow.log_artifact(path, artifact_path="edge_models")
+
+    # The backbone alone maps tiles to the pooled feature vectors indexed for
+    # similarity search (src/app/similarity.py). It is kept out of the registry,
+    # whose versions hold classifiers only.
+    if edge_model.backbone is not None:
+        edge_model.backbone.save("best_model.embedding.h5")
+        with timed("export"):
+            embedding_exported = export_model(
+                edge_model.backbone, "best_model.embedding.h5", formats=args.export_formats
+            )
+        for path in ["best_model.embedding.h5", *embedding_exported.values()]:
+            mlflow.log_artifact(path, artifact_path="embedding_models")
+
+    # Quantise for CPU-only edge boxes, publishing only variants that keep accuracy
+    quantized = {}
+    if args.quantize:
+        with timed("quantize"):
+            quantized = quantize_and_publish(
+                final_model,
+                split_dataset("train", train_data, batch_size=1, shuffle=True),
+                split_dataset("val", val_data, batch_size=32),
+                "best_model.h5",
+                modes=args.quantize,
+                max_accuracy_drop=args.max_accuracy_drop,
+            )
+
+    # Publish the model files as a new registry version; serving instances
+    # polling the registry warm it up and swap it in without a restart
+    if args.registry_dir:
+        version = ModelRegistry(args.registry_dir).publish(
+            ["best_model.h5", *exported.values(), *quantized.values()]
+        )
+        logger.info(f"Published model version {version} to {args.registry_dir}")
+        mlflow.set_tag("registry_version", version)
+
+    # Track where the pipeline spent its time
+    mlflow.log_metrics(
+        {f"{stage}_seconds": total for stage, (_, total) in stage_totals().items()}
+    )
+
     # Load saved model
     # loaded_model = load_model("best_model.h5")
 
@@ -78,6 +204,37 @@ if __name__ == "__main__":
         default=100,
         help="Number of trials for hyperparameter optimisation.",
     )
+    add_study_arguments(parser)
+    parser.add_argument(
+        "--export_formats",
+        nargs="*",
+        choices=EXPORT_FORMATS,
+        default=EXPORT_FORMATS,
+        help="Edge formats to export after training (pass none to skip export).",
+    )
+    parser.add_argument(
+        "--quantize",
+        nargs="*",
+        choices=QUANTIZATION_MODES,
+        default=[],
+        help="Post-training quantisation modes to calibrate, evaluate and publish.",
+    )
+    parser.add_argument(
+        "--max_accuracy_drop",
+        type=float,
+        default=0.01,
+        help="Largest validation accuracy loss allowed for a quantised model to be published.",
+    )
+    parser.add_argument(
+        "--retrain",
+        action="store_true",
+        help="Retrain the final model from scratch instead of promoting the best trial's checkpoint.",
+    )
+    parser.add_argument(
+        "--registry_dir",
+        default=None,
+        help="Model registry directory to publish the trained model to as a new version.",
+    )
     args = parser.parse_args()
 
     main(args)
@@ -3,8 +3,11 @@ import os
 import shutil
 import sys
 
+import numpy as np
+
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from src.data.augmentation import ImageAugmenter, augment_and_save_images
+from src.data.augmentation import (BatchAugmenter, ImageAugmenter,
+                                   augment_and_save_images)
 
 
 def cleanup_augmented_images(directory_path):
@@ -66,5 +69,22 @@ def test_augmentation():
     print("All assertions passed. Image augmentation is working as expected.")
 
 
+def test_batch_augmentation():
+    rng = np.random.default_rng(0)
+    batch = rng.random((8, 64, 64, 3), dtype=np.float32)
+
+    augmented = BatchAugmenter(angle=15, x_shift=5, y_shift=5, scale=0.1, seed=7).augment_batch(batch)
+    assert augmented.shape == batch.shape and augmented.dtype == batch.dtype
+    assert not np.array_equal(augmented, batch), "Batch was not augmented"
+
+    # The same seed reproduces the same transforms
+    repeated = BatchAugmenter(angle=15, x_shift=5, y_shift=5, scale=0.1, seed=7).augment_batch(batch)
+    assert np.array_equal(augmented, repeated), "Augmentation is not reproducible"
+
+    # Without any range configured the batch passes through unchanged
+    assert np.allclose(BatchAugmenter().augment_batch(batch), batch)
+
+
 if __name__ == "__main__":
     test_augmentation()
+    test_batch_augmentation()
@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+
+from src.app.batching import BatchingEngine
+
+
+class RecordingModel:
+    # Stand-in for the Keras model: returns each image's mean and records batch sizes
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(len(batch))
+        return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)
+
+
+async def run_requests(engine, images):
+    await engine.start()
+    try:
+        return await asyncio.gather(*(engine.submit(image) for image in images))
+    finally:
+        await engine.stop()
+
+
+# Test 1: Concurrent requests are grouped and every caller gets its own result
+def test_concurrent_requests_are_batched():
+    model = RecordingModel()
+    engine = BatchingEngine(model.predict, max_batch_size=8, max_wait_ms=50)
+    images = [np.full((4, 4, 3), i, dtype=np.float32) for i in range(20)]
+
+    results = asyncio.run(run_requests(engine, images))
+
+    assert [float(r[0]) for r in results] == list(range(20))
+    assert model.batch_sizes == [8, 8, 4], f"Unexpected batches: {model.batch_sizes}"
+
+
+# Test 2: A lone request is flushed once the wait time expires
+def test_partial_batch_flushes_after_max_wait():
+    model = RecordingModel()
+    engine = BatchingEngine(model.predict, max_batch_size=64, max_wait_ms=1)
+
+    results = asyncio.run(run_requests(engine, [np.ones((4, 4, 3), np.float32)]))
+
+    assert len(results) == 1
+    assert model.batch_sizes == [1]
+
+
+# Test 3: Inference errors are propagated to every caller of the batch
+def test_errors_are_propagated():
+    def failing_predict(batch):
+        raise ValueError("boom")
+
+    engine = BatchingEngine(failing_predict, max_batch_size=4, max_wait_ms=1)
+
+    async def run():
+        await engine.start()
+        try:
+            return await asyncio.gather(
+                *(engine.submit(np.zeros((2, 2, 3))) for _ in range(3)),
+                return_exceptions=True,
+            )
+        finally:
+            await engine.stop()
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
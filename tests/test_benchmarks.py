@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.common import compare, summarize
+
+
+# Test 1: Summaries report percentiles in milliseconds and throughput per second
+def test_summarize():
+    summary = summarize([0.1, 0.1, 0.2, 0.2], items=10)
+
+    assert summary["p50_ms"] == pytest.approx(150.0)
+    assert summary["items_per_second"] == pytest.approx(40 / 0.6)
+    assert summary["p99_ms"] <= 200.0
+
+
+# Test 2: Slower latency or lower throughput beyond the threshold is a regression
+def test_compare():
+    baseline = {
+        "decode": {"p50_ms": 10.0, "items_per_second": 100.0},
+        "shards": {"p50_ms": 10.0, "items_per_second": 100.0},
+        "tf_data": {"skipped": "No module named 'tensorflow'"},
+    }
+    current = {
+        "decode": {"p50_ms": 12.0, "items_per_second": 80.0},
+        "shards": {"p50_ms": 10.5, "items_per_second": 95.0},
+        "tf_data": {"p50_ms": 50.0, "items_per_second": 1.0},
+        "new": {"p50_ms": 1.0},
+    }
+
+    regressions = compare(baseline, current, threshold=0.1)
+
+    assert {(r["benchmark"], r["metric"]) for r in regressions} == {
+        ("decode", "p50_ms"),
+        ("decode", "items_per_second"),
+    }
@@ -0,0 +1,61 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.data.cache import TensorCache
+from src.data.decode import load_image
+
+
+def write_images(directory, count, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"tile_{i}.png")
+        cv2.imwrite(path, rng.integers(0, 256, size=(64, 80, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+# Test 1: Cached batches are bit-identical to decoding the files directly
+def test_cache_matches_direct_decode(tmp_path):
+    paths = write_images(str(tmp_path), 4)
+    cache = TensorCache.open(paths, [0, 1, 2, 3], str(tmp_path / "cache"))
+
+    batch = cache.read_batch(cache.rows([paths[2], paths[0]]))
+
+    assert batch.dtype == np.float32
+    assert np.array_equal(batch[0], load_image(paths[2]))
+    assert np.array_equal(batch[1], load_image(paths[0]))
+
+
+# Test 2: Reopening an unchanged cache reuses the stored array
+def test_cache_is_reused(tmp_path):
+    paths = write_images(str(tmp_path), 3)
+    cache_dir = str(tmp_path / "cache")
+    cache = TensorCache.open(paths, [0, 0, 1], cache_dir)
+    images_path = os.path.join(cache.store_dir, "images.npy")
+    mtime = os.stat(images_path).st_mtime_ns
+
+    TensorCache.open(paths, [0, 0, 1], cache_dir)
+
+    assert os.stat(images_path).st_mtime_ns == mtime, "Unchanged cache should not be rewritten"
+
+
+# Test 3: Modified and new source files invalidate only their own rows
+def test_cache_invalidates_changed_files(tmp_path):
+    paths = write_images(str(tmp_path), 3)
+    cache_dir = str(tmp_path / "cache")
+    TensorCache.open(paths, [0, 0, 1], cache_dir)
+
+    # Overwrite one file with different pixels and a different mtime, and add another
+    cv2.imwrite(paths[1], np.zeros((64, 80, 3), dtype=np.uint8))
+    os.utime(paths[1], ns=(1, 1))
+    os.makedirs(tmp_path / "new")
+    paths += write_images(str(tmp_path / "new"), 1, seed=1)
+
+    cache = TensorCache.open(paths, [0, 0, 1, 1], cache_dir)
+
+    assert len(cache) == 4
+    for path in paths:
+        assert np.array_equal(cache.read_batch(cache.rows([path]))[0], load_image(path))
@@ -0,0 +1,54 @@
+from src.model.checkpoints import BestCheckpoint
+
+
+class FakeModel:
+    """Writes its name as its 'weights' and reads them back."""
+
+    def __init__(self, name):
+        self.name = name
+        self.loaded = None
+
+    def save_weights(self, path):
+        with open(path, "w") as f:
+            f.write(self.name)
+
+    def load_weights(self, path):
+        with open(path) as f:
+            self.loaded = f.read()
+
+
+class FakeEdgeModel:
+    def __init__(self):
+        self.model, self.head = FakeModel("model"), FakeModel("head")
+
+    def get_model(self):
+        return self.model
+
+    def get_head(self):
+        return self.head
+
+
+# Test 1: Only a more accurate trial replaces the stored weights, and older weights are deleted
+def test_offer_keeps_only_the_best(tmp_path):
+    checkpoint = BestCheckpoint(str(tmp_path / "edge"))
+
+    assert checkpoint.offer(FakeModel("first"), 0.8, 0, {"lr": 0.1})
+    assert not checkpoint.offer(FakeModel("worse"), 0.7, 1, {"lr": 0.2})
+    assert checkpoint.offer(FakeModel("better"), 0.9, 2, {"lr": 0.3})
+
+    assert checkpoint.metadata()["trial"] == 2
+    assert sorted(p.name for p in tmp_path.glob("*.weights.h5")) == ["edge-trial2.weights.h5"]
+
+
+# Test 2: The checkpoint is promoted only for the trial and params it was saved with
+def test_matches_and_restore(tmp_path):
+    checkpoint = BestCheckpoint(str(tmp_path / "edge"))
+    checkpoint.offer(FakeModel("trained head"), 0.9, 3, {"lr": 0.1}, head_only=True)
+
+    assert checkpoint.matches(3, {"lr": 0.1})
+    assert not checkpoint.matches(4, {"lr": 0.1})
+    assert not BestCheckpoint(str(tmp_path / "other")).matches(3, {"lr": 0.1})
+
+    edge_model = FakeEdgeModel()
+    checkpoint.restore(edge_model)
+    assert edge_model.head.loaded == "trained head" and edge_model.model.loaded is None
@@ -7,7 +7,8 @@ import pandas as pd
 
 from src.data.preprocessing import (generate_data_list,
                                     generate_dataframe_from_directory,
-                                    normalize_image, resize_image)
+                                    normalize_image,
+                                    process_images_in_directory, resize_image)
 
 # Paths to the data directories relative to the test script location
 RAW_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "raw_data")
@@ -107,6 +108,42 @@ def test_normalize_images():
         ), f"Image at {image_path} not normalized correctly"
 
 
+# Test 5: Incremental preprocessing into a separate output directory
+def test_incremental_processing(tmp_path):
+    input_dir = tmp_path / "raw"
+    output_dir = tmp_path / "processed"
+    rng = np.random.default_rng(0)
+    for label in ["desert", "water"]:
+        os.makedirs(input_dir / label)
+        for i in range(3):
+            image = rng.integers(0, 256, size=(300, 400, 3), dtype=np.uint8)
+            cv2.imwrite(str(input_dir / label / f"{label}_{i}.png"), image)
+    source = input_dir / "desert" / "desert_0.png"
+    source_bytes = source.read_bytes()
+
+    stats = process_images_in_directory(str(input_dir), str(output_dir), target_size=(100, 100), workers=2)
+    assert stats["processed"] == 6 and stats["failed"] == 0
+    assert source.read_bytes() == source_bytes, "Source images must not be modified"
+    assert cv2.imread(str(output_dir / "desert" / "desert_0.png")).shape[:2] == (100, 100)
+
+    # A rerun with nothing changed does no work
+    stats = process_images_in_directory(str(input_dir), str(output_dir), target_size=(100, 100), workers=2)
+    assert stats["processed"] == 0 and stats["unchanged"] == 6
+
+    # Only the modified file is reprocessed and deleted sources are cleaned up
+    cv2.imwrite(str(source), np.zeros((300, 400, 3), dtype=np.uint8))
+    os.remove(input_dir / "water" / "water_2.png")
+    stats = process_images_in_directory(str(input_dir), str(output_dir), target_size=(100, 100), workers=2)
+    assert stats["processed"] == 1 and stats["removed"] == 1
+    assert not (output_dir / "water" / "water_2.png").exists()
+
+    # A changed source that no longer decodes keeps its previous output
+    (input_dir / "water" / "water_1.png").write_bytes(b"not an image")
+    stats = process_images_in_directory(str(input_dir), str(output_dir), target_size=(100, 100), workers=2)
+    assert stats["failed"] == 1 and stats["removed"] == 0
+    assert (output_dir / "water" / "water_1.png").exists()
+
+
 if __name__ == "__main__":
     create_backup(TEST_DATA_DIR, BACKUP_DIR)  # Backup once at the start
     try:
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+
+from src.data.decode import (decode_image, load_image, preprocess_into,
+                             read_image_size)
+
+
+def make_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def encode(image, ext):
+    ok, buffer = cv2.imencode(ext, image)
+    assert ok, f"Could not encode test image as {ext}"
+    return buffer.tobytes()
+
+
+# Test 1: Header parsing returns (width, height) without decoding
+def test_read_image_size():
+    image = make_image(300, 200)
+    assert read_image_size(encode(image, ".jpg")) == (300, 200)
+    assert read_image_size(encode(image, ".png")) == (300, 200)
+    assert read_image_size(b"not an image") is None
+
+
+# Test 2: Decoded images are resized to the target size
+def test_decode_image_resizes():
+    for width, height in [(64, 64), (1000, 900)]:
+        decoded = decode_image(encode(make_image(width, height), ".jpg"))
+        assert decoded.shape == (224, 224, 3)
+        assert decoded.dtype == np.uint8
+
+
+# Test 3: Preprocessing writes RGB float32 in [0, 1] into the given batch slot
+def test_preprocess_into_batch_slot():
+    image = make_image(224, 224)
+    contents = encode(image, ".png")
+    batch = np.zeros((2, 224, 224, 3), dtype=np.float32)
+
+    result = preprocess_into(contents, out=batch[1])
+
+    assert np.shares_memory(result, batch)
+    expected = image[..., ::-1].astype(np.float32) / 255.0
+    assert np.array_equal(batch[1], expected), "Preprocessing should be bit-identical"
+    assert not batch[0].any(), "Other slots must be left untouched"
+
+
+# Test 4: Files on disk go through exactly the same path as upload buffers
+def test_load_image_matches_buffer(tmp_path):
+    contents = encode(make_image(500, 400), ".jpg")
+    path = tmp_path / "tile.jpg"
+    path.write_bytes(contents)
+
+    assert np.array_equal(load_image(str(path)), preprocess_into(contents))
+
+
+# Test 5: Undecodable buffers raise a ValueError
+def test_invalid_buffer():
+    try:
+        decode_image(b"\x00" * 32)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected a ValueError for invalid image data.")
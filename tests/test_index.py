@@ -0,0 +1,69 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.data.index import INDEX_NAME, DatasetIndex, load_index
+
+
+def write_dataset(root, counts):
+    for class_name, count in counts.items():
+        os.makedirs(os.path.join(root, class_name), exist_ok=True)
+        for i in range(count):
+            image = np.zeros((30 + i, 40, 3), dtype=np.uint8)
+            cv2.imwrite(os.path.join(root, class_name, f"{i}.png"), image)
+
+
+# Test 1: The index holds one row per image with its label and dimensions
+def test_index_columns(tmp_path):
+    root = str(tmp_path)
+    write_dataset(root, {"desert": 2, "cloudy": 1})
+
+    index = load_index(root)
+
+    assert index.classes == ["cloudy", "desert"]
+    assert len(index) == 3
+    assert index.label_ids.tolist() == [0, 1, 1]
+    assert index.widths.tolist() == [40, 40, 40]
+    assert index.heights.tolist() == [30, 30, 31]
+    # Nothing is written into the dataset unless an index path is given
+    assert not os.path.exists(os.path.join(root, INDEX_NAME))
+
+
+# Test 2: A persisted index picks up new files and reuses unchanged folders
+def test_index_is_incremental(tmp_path):
+    root = str(tmp_path / "data")
+    index_path = str(tmp_path / INDEX_NAME)
+    write_dataset(root, {"cloudy": 1, "water": 1})
+    load_index(root, index_path)
+
+    cv2.imwrite(os.path.join(root, "water", "new.png"), np.zeros((8, 8, 3), dtype=np.uint8))
+    index = load_index(root, index_path)
+
+    assert len(index) == 3
+    assert DatasetIndex.load(index_path).paths.tolist() == index.paths.tolist()
+
+
+# Test 3: Queries map folders onto the caller's class order and skip unknown ones
+def test_index_query_class_order(tmp_path):
+    root = str(tmp_path)
+    write_dataset(root, {"cloudy": 1, "water": 2, "other": 1})
+
+    paths, labels = load_index(root).query(["water", "cloudy"])
+
+    assert len(paths) == 3
+    assert sorted(labels.tolist()) == [0, 0, 1]
+    assert all(os.sep + "other" + os.sep not in path for path in paths)
+
+
+# Test 4: A torn index file (e.g. from an interrupted write) is rebuilt instead of crashing
+def test_torn_index_is_rebuilt(tmp_path):
+    root = str(tmp_path / "data")
+    index_path = str(tmp_path / INDEX_NAME)
+    write_dataset(root, {"desert": 2})
+    load_index(root, index_path)
+    with open(index_path, "r+b") as f:
+        f.truncate(os.path.getsize(index_path) // 2)
+
+    assert len(load_index(root, index_path)) == 2
+    assert len(DatasetIndex.load(index_path)) == 2
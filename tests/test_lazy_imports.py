@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["tensorflow", "keras", "mlflow", "optuna", "onnxruntime"]
+# The training scripts import both ``model.*`` and ``src.*``
+ENV = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.join(ROOT, "src"), ROOT])}
+
+
+def imported_modules(code):
+    output = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys; print(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True, env=ENV, cwd=ROOT,
+    ).stdout
+    return set(output.split())
+
+
+# Test 1: Importing the training entry points does not load the ML frameworks
+def test_training_entry_points_import_lazily():
+    modules = imported_modules("import model.train, model.export, model.quantization, model.study")
+
+    assert not modules & set(HEAVY_MODULES)
+
+
+# Test 2: --help returns without the ML frameworks installed or imported
+def test_pipeline_help():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "src", "pipeline", "pipeline.py"), "--help"],
+        capture_output=True, text=True, env=ENV, cwd=ROOT,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "--registry_dir" in result.stdout
+
+
+# Test 3: The API configuration and CLIs do not pay for pandas
+def test_api_config_skips_pandas():
+    modules = imported_modules("import src.app.config, src.app.scene, src.app.similarity")
+
+    assert "pandas" not in modules
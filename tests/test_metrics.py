@@ -0,0 +1,44 @@
+from src.app.metrics import NULL_TIMER, MetricsRegistry
+
+
+# Test 1: Histograms render cumulative Prometheus buckets, sums and counts
+def test_histogram_rendering():
+    registry = MetricsRegistry(enabled=True)
+    histogram = registry.histogram("edge_test_seconds", "Test timings.", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "decode")
+    histogram.observe(0.5, "decode")
+    histogram.observe(5.0, "decode")
+
+    text = registry.render()
+
+    assert "# TYPE edge_test_seconds histogram" in text
+    assert 'edge_test_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'edge_test_seconds_bucket{stage="decode",le="1.0"} 2' in text
+    assert 'edge_test_seconds_bucket{stage="decode",le="+Inf"} 3' in text
+    assert 'edge_test_seconds_count{stage="decode"} 3' in text
+
+
+# Test 2: Counters, gauges and function-backed metrics
+def test_counters_and_gauges():
+    registry = MetricsRegistry(enabled=True)
+    requests = registry.counter("edge_test_requests_total", "Requests.", ["status"])
+    requests.inc(1, "200")
+    requests.inc(2, "200")
+    registry.gauge("edge_test_info", "Info.", ["version"]).set_function(lambda: {("v1",): 1})
+
+    text = registry.render()
+
+    assert 'edge_test_requests_total{status="200"} 3.0' in text
+    assert 'edge_test_info{version="v1"} 1.0' in text
+
+
+# Test 3: A disabled registry hands out the shared no-op timer and records nothing
+def test_disabled_metrics():
+    registry = MetricsRegistry(enabled=False)
+    histogram = registry.histogram("edge_test_seconds", "Test timings.", ["stage"])
+
+    with histogram.time("decode") as timer:
+        pass
+
+    assert histogram.time("decode") is NULL_TIMER and timer is None
+    assert histogram.totals() == {}
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from src.app.prediction_cache import PredictionCache
+
+
+# Test 1: Keys depend on both the upload contents and the model version
+def test_keys():
+    key = PredictionCache.key(b"tile", "v1")
+    assert key == PredictionCache.key(b"tile", "v1")
+    assert key != PredictionCache.key(b"tile", "v2")
+    assert key != PredictionCache.key(b"other", "v1")
+
+
+# Test 2: Hits, misses and LRU eviction are counted
+def test_lru_eviction():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", np.array([1.0]))
+    cache.put("b", np.array([2.0]))
+    assert cache.get("a")[0] == 1.0  # "a" is now the most recently used
+    cache.put("c", np.array([3.0]))
+
+    assert cache.get("b") is None
+    assert cache.get("c")[0] == 3.0
+    assert cache.stats() == {"entries": 2, "hits": 2, "disk_hits": 0, "misses": 1, "evictions": 1}
+
+
+# Test 3: Expired and invalidated entries are misses
+def test_ttl_and_invalidate():
+    cache = PredictionCache(ttl_seconds=0.01)
+    cache.put("a", np.array([1.0]))
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+    cache = PredictionCache()
+    cache.put("a", np.array([1.0]))
+    cache.invalidate()
+    assert cache.get("a") is None
+
+
+# Test 4: The disk tier is shared between cache instances
+def test_disk_tier(tmp_path):
+    PredictionCache(disk_dir=str(tmp_path)).put("ab12", np.array([0.25, 0.75]))
+
+    cache = PredictionCache(disk_dir=str(tmp_path))
+    assert np.array_equal(cache.get("ab12"), [0.25, 0.75])
+    assert cache.stats()["disk_hits"] == 1
+
+    old = time.time() - 7200
+    os.utime(os.path.join(str(tmp_path), "ab", "ab12.npy"), (old, old))
+    assert cache.prune_disk() == 1
+
+
+# Test 5: Pruning removes the oldest disk entries beyond the size cap
+def test_disk_size_cap(tmp_path):
+    cache = PredictionCache(disk_dir=str(tmp_path), disk_max_bytes=500)
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.put(key, np.zeros(20))  # About 288 bytes on disk
+        path = os.path.join(str(tmp_path), key[:2], key + ".npy")
+        stored_at = time.time() - 10 * (3 - i)
+        os.utime(path, (stored_at, stored_at))
+
+    assert cache.prune_disk() == 2
+    assert os.listdir(os.path.join(str(tmp_path), "cc")) == ["cc03.npy"]
+    assert not os.listdir(os.path.join(str(tmp_path), "aa"))
+
+
+# Test 6: The async API reads and writes the disk tier off the event loop
+def test_async_disk_tier(tmp_path):
+    async def put():
+        await PredictionCache(disk_dir=str(tmp_path)).aput("cd34", np.array([0.5, 0.5]))
+
+    # asyncio.run waits for the executor, and with it the disk write
+    asyncio.run(put())
+    cache = PredictionCache(disk_dir=str(tmp_path))
+
+    assert np.array_equal(asyncio.run(cache.aget("cd34")), [0.5, 0.5])
+    assert asyncio.run(cache.aget("missing")) is None
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+
+from src.app.batching import BatchingEngine
+from src.app.registry import ModelRegistry, ModelServer
+
+
+class ConstantModel:
+    # Stand-in for a model version: predicts its own version number for every image
+    def __init__(self, version):
+        self.value = float(version)
+        self.warmed_up = False
+
+    def predict(self, batch):
+        self.warmed_up = True
+        return np.full((len(batch), 1), self.value, dtype=np.float32)
+
+
+def make_server(loaded):
+    def load_fn(version):
+        loaded[version] = ConstantModel(version)
+        return loaded[version]
+
+    return ModelServer(
+        load_fn,
+        lambda predict_fn: BatchingEngine(predict_fn, max_batch_size=4, max_wait_ms=1),
+        warmup_batches=[np.zeros((1, 2, 2, 3), dtype=np.float32)],
+    )
+
+
+# Test 1: Published versions are listed in order and resolved to their model files
+def test_registry_publish(tmp_path):
+    model_file = tmp_path / "best_model.tflite"
+    model_file.write_bytes(b"model")
+    registry = ModelRegistry(str(tmp_path / "registry"))
+
+    registry.publish([str(model_file)], version="1")
+    registry.publish([str(model_file)], version="2")
+
+    assert registry.versions() == ["1", "2"]
+    assert registry.latest() == "2"
+    assert registry.model_path("2", "tflite").endswith("2/best_model.tflite")
+
+
+# Test 2: A reload swaps versions while requests routed earlier finish on the old one
+def test_hot_swap_keeps_in_flight_requests():
+    loaded = {}
+    server = make_server(loaded)
+    image = np.zeros((2, 2, 3), dtype=np.float32)
+
+    async def scenario():
+        await server.load("1")
+        async with server.use() as old_model:
+            await server.load("2")
+            # The replaced engine keeps serving the request that holds it
+            old_prediction = await old_model.engine.submit(image)
+        async with server.use() as new_model:
+            new_prediction = await new_model.engine.submit(image)
+        await asyncio.sleep(0.01)
+        stopped = old_model.engine._task is None
+        await server.stop()
+        return old_prediction, new_prediction, stopped
+
+    old_prediction, new_prediction, stopped = asyncio.run(scenario())
+
+    assert old_prediction[0] == 1.0 and new_prediction[0] == 2.0
+    assert stopped, "The old version should stop once its last request is done"
+    assert all(model.warmed_up for model in loaded.values())
+
+
+# Test 3: The A/B split sends a stable share of uploads to the candidate
+def test_candidate_split():
+    server = make_server({})
+
+    async def scenario():
+        await server.load("1", candidate_version="2", candidate_weight=0.25)
+        versions = [server.route(str(i).encode()).version for i in range(2000)]
+        repeat = [server.route(b"same").version for _ in range(10)]
+        status = server.status()
+        await server.stop()
+        return versions, repeat, status
+
+    versions, repeat, status = asyncio.run(scenario())
+
+    assert 0.2 < versions.count("2") / len(versions) < 0.3
+    assert len(set(repeat)) == 1
+    assert status == {"active": "1", "candidate": "2", "candidate_weight": 0.25}
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from src.app.scene import (ArrayScene, classify_scene, dtype_limits, open_scene,
+                           render_class_map, resolve_stride, run_scene,
+                           tile_origins, to_uint8)
+
+
+def brightness_classes(batch):
+    # Stand-in for the model: class 1 for bright tiles, class 0 otherwise
+    bright = batch.reshape(len(batch), -1).mean(axis=1) > 0.5
+    return np.stack([~bright, bright], axis=1).astype(np.float32)
+
+
+# Test 1: Tiles cover the whole axis, with the last one flush with the edge
+def test_tile_origins():
+    assert tile_origins(500, 224, 224) == [0, 224, 276]
+    assert tile_origins(448, 224, 112) == [0, 112, 224]
+    assert tile_origins(100, 224, 224) == [0]
+    assert resolve_stride(224, overlap=32) == 192
+    for tile_size, stride in [(-5, -5), (224, -1), (224, 300)]:
+        with pytest.raises(ValueError):
+            resolve_stride(tile_size, stride)
+    with pytest.raises(ValueError):
+        tile_origins(100, -5, -5)
+
+
+# Test 2: A memory-mapped scene is classified tile by tile in batches
+def test_classify_memory_mapped_scene(tmp_path):
+    scene = np.zeros((64, 96, 3), dtype=np.uint8)
+    scene[:, 48:] = 255  # right half bright
+    path = str(tmp_path / "scene.npy")
+    np.save(path, scene)
+
+    batch_sizes = []
+
+    def predict(batch):
+        batch_sizes.append(len(batch))
+        return brightness_classes(batch)
+
+    probabilities, xs, ys = classify_scene(
+        open_scene(path), predict, tile_size=32, stride=16, batch_size=4, target_size=(8, 8)
+    )
+
+    assert xs == [0, 16, 32, 48, 64] and ys == [0, 16, 32]
+    assert probabilities.argmax(axis=-1).tolist() == [[0, 0, 0, 1, 1]] * 3
+    assert max(batch_sizes) == 4 and sum(batch_sizes) == 15
+
+
+# Test 3: The report and raster describe the tile grid
+def test_scene_report_and_raster(tmp_path):
+    path = str(tmp_path / "scene.npy")
+    np.save(path, np.full((40, 40, 3), 255, dtype=np.uint8))
+
+    report = run_scene(path, brightness_classes, ["cloudy", "desert"], tile_size=32)
+    raster = render_class_map(report["class_map"], report["classes"], cell_size=4)
+
+    assert report["class_map"] == [[1, 1], [1, 1]]
+    assert report["class_fractions"] == {"cloudy": 0.0, "desert": 1.0}
+    assert raster.shape == (8, 8, 3)
+
+
+# Test 4: 16-bit bands are rescaled to uint8 instead of saturating
+def test_uint16_window():
+    window = np.array([[[0, 1000, 65535], [32768, 4095, 100]]], dtype=np.uint16)
+
+    np.testing.assert_array_equal(
+        to_uint8(window, *dtype_limits(window.dtype)), [[[0, 3, 255], [127, 15, 0]]]
+    )
+
+    # A 12-bit sensor fills the 0-255 range once stretched to its own percentiles
+    scene = np.zeros((40, 40, 3), dtype=np.uint16)
+    scene[:, 20:] = 4095
+    tiles = ArrayScene(scene, stretch=(2, 98)).read(0, 0, 40, 1)
+    assert tiles[0, 0].tolist() == [0, 0, 0] and tiles[0, -1].tolist() == [255, 255, 255]
+    assert ArrayScene(scene).read(0, 0, 40, 1)[0, -1].tolist() == [15, 15, 15]
@@ -0,0 +1,85 @@
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+
+from src.model.schema import TooManyImages, decode_tensor, parse_tensor_upload, validate_images
+
+SHAPE = (2, 224, 224, 3)
+
+
+# Test 1: uint8 tensors are scaled to [0, 1] and single images gain a batch axis
+def test_validate_images():
+    pixels = np.full(SHAPE[1:], 255, dtype=np.uint8)
+
+    images = validate_images(pixels)
+
+    assert images.shape == (1, *SHAPE[1:]) and images.dtype == np.float32
+    assert images.max() == 1.0
+
+
+# Test 2: Wrong shapes, out-of-range and non-finite pixels are rejected
+@pytest.mark.parametrize(
+    "array",
+    [
+        np.zeros((1, 100, 100, 3), dtype=np.float32),
+        np.full(SHAPE, 2.0, dtype=np.float32),
+        np.full(SHAPE, np.nan, dtype=np.float32),
+        np.zeros(SHAPE, dtype=np.int64),
+    ],
+)
+def test_validate_images_rejects(array):
+    with pytest.raises(ValueError):
+        validate_images(array)
+
+
+# Test 3: Raw, .npy and base64 JSON bodies decode to the same batch
+def test_parse_tensor_upload():
+    array = np.random.default_rng(0).random(SHAPE, dtype=np.float32)
+    npy = io.BytesIO()
+    np.save(npy, array)
+    payload = json.dumps(
+        {"data": base64.b64encode(array.tobytes()).decode(), "shape": list(SHAPE), "dtype": "float32"}
+    )
+
+    raw = parse_tensor_upload(array.tobytes(), "application/octet-stream", "2,224,224,3")
+    from_npy = parse_tensor_upload(npy.getvalue(), "application/x-npy")
+    from_json = parse_tensor_upload(payload.encode(), "application/json")
+
+    np.testing.assert_array_equal(raw, array)
+    np.testing.assert_array_equal(from_npy, array)
+    np.testing.assert_array_equal(from_json, array)
+
+
+# Test 4: A buffer that does not match its declared shape is rejected
+def test_decode_tensor_size_mismatch():
+    with pytest.raises(ValueError, match="Expected"):
+        decode_tensor(b"\x00" * 10, (1, 224, 224, 3), "uint8")
+
+
+# Test 5: Empty and truncated .npy bodies are rejected as bad input
+@pytest.mark.parametrize("cut", [0, 100, -1000])
+def test_truncated_npy(cut):
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros((1, 224, 224, 3), dtype=np.uint8))
+
+    with pytest.raises(ValueError):
+        parse_tensor_upload(buffer.getvalue()[:cut], "application/x-npy", None, "uint8")
+
+
+# Test 6: The image limit is checked on the declared shape, before the pixels are read
+def test_too_many_images():
+    npy = io.BytesIO()
+    np.save(npy, np.zeros((3, 224, 224, 3), dtype=np.uint8))
+    payload = json.dumps({"data": "", "shape": [3, 224, 224, 3], "dtype": "uint8"})
+
+    # The bodies hold no pixels: the shape alone rejects them
+    with pytest.raises(TooManyImages):
+        parse_tensor_upload(b"", "application/octet-stream", "3,224,224,3", "uint8", max_images=2)
+    with pytest.raises(TooManyImages):
+        parse_tensor_upload(npy.getvalue()[:128], "application/x-npy", max_images=2)
+    with pytest.raises(TooManyImages):
+        parse_tensor_upload(payload.encode(), "application/json", max_images=2)
+    assert len(parse_tensor_upload(npy.getvalue(), "application/x-npy", max_images=3)) == 3
@@ -0,0 +1,38 @@
+from src.model.search import architecture_from_params, pareto_front, select_trial
+
+
+def point(number, accuracy, latency, size):
+    return {"number": number, "params": {}, "val_accuracy": accuracy, "latency_ms": latency, "size_mb": size}
+
+
+POINTS = [
+    point(0, 0.95, 20.0, 6.0),
+    point(1, 0.90, 8.0, 2.0),
+    point(2, 0.89, 9.0, 2.5),  # Dominated by trial 1
+    point(3, 0.80, 4.0, 1.0),
+    point(4, 0.95, 25.0, 7.0),  # Dominated by trial 0
+]
+
+
+# Test 1: The Pareto front drops dominated trials and is sorted by latency
+def test_pareto_front():
+    front = pareto_front(POINTS)
+
+    assert [p["number"] for p in front] == [3, 1, 0]
+    assert pareto_front([]) == []
+
+
+# Test 2: Selection honours the latency budget and prefers the fastest model over the accuracy floor
+def test_select_trial():
+    assert select_trial(POINTS)["number"] == 0
+    assert select_trial(POINTS, max_latency_ms=10)["number"] == 1
+    assert select_trial(POINTS, min_accuracy=0.85)["number"] == 1
+    assert select_trial(POINTS, max_latency_ms=5, min_accuracy=0.85) is None
+
+
+# Test 3: Params of a study without architecture search map to the default architecture
+def test_architecture_from_params():
+    assert architecture_from_params({"learning_rate": 0.01}) == {
+        "backbone": "mobilenet_v3_small", "alpha": 1.0, "image_size": 224
+    }
+    assert architecture_from_params({"backbone": "mobilenet_v2", "alpha": 0.75, "image_size": 160})["alpha"] == 0.75
@@ -0,0 +1,36 @@
+import os
+
+from src.app import config
+from src.app.serve import cpu_sets, preload_model_files, served_model_files
+
+
+# Test 1: Workers get disjoint CPU sets while there are enough cores
+def test_cpu_sets():
+    cpus = sorted(os.sched_getaffinity(0))
+    sets = cpu_sets(2, 1)
+
+    assert len(sets) == 2 and all(len(cpu_set) == 1 for cpu_set in sets)
+    assert set().union(*sets) <= set(cpus)
+    if len(cpus) >= 2:
+        assert sets[0] != sets[1]
+
+
+# Test 2: Model files are mapped read-only; missing and empty files are skipped
+def test_preload_model_files(tmp_path):
+    model_file = tmp_path / "best_model.tflite"
+    model_file.write_bytes(b"\x00" * 4096)
+    empty_file = tmp_path / "empty.tflite"
+    empty_file.write_bytes(b"")
+
+    maps = preload_model_files([str(model_file), str(empty_file), str(tmp_path / "missing")])
+
+    assert len(maps) == 1 and len(maps[0]) == 4096
+    maps[0].close()
+
+
+# Test 3: An empty registry skips the warm-up instead of stopping the launcher
+def test_served_model_files_empty_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REGISTRY_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MODEL_VERSION", None)
+
+    assert served_model_files() == []
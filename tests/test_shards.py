@@ -0,0 +1,57 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.data.decode import load_image
+from src.data.shards import iter_shard, shard_paths, write_shards
+
+
+def write_images(directory, count, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"tile_{i}.png")
+        cv2.imwrite(path, rng.integers(0, 256, size=(64, 80, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def read_all(shard_dir, image_format):
+    return [
+        sample
+        for path in shard_paths(shard_dir)
+        for sample in iter_shard(path, image_format)
+    ]
+
+
+# Test 1: Shards hold every sample in order, with the same pixels as a direct decode
+def test_shards_round_trip(tmp_path):
+    paths = write_images(str(tmp_path), 5)
+    labels = [0, 1, 2, 3, 0]
+
+    for image_format in ["raw", "encoded"]:
+        shard_dir = str(tmp_path / image_format)
+        index = write_shards(paths, labels, shard_dir, shard_size=2, image_format=image_format)
+        samples = read_all(shard_dir, image_format)
+
+        assert [shard["count"] for shard in index["shards"]] == [2, 2, 1]
+        assert [label for _, label in samples] == labels
+        for (image, _), path in zip(samples, paths):
+            assert np.array_equal(image, load_image(path))
+
+
+# Test 2: Unchanged sources are not repacked, changed ones are
+def test_shards_are_reused(tmp_path):
+    paths = write_images(str(tmp_path), 3)
+    shard_dir = str(tmp_path / "shards")
+    write_shards(paths, [0, 1, 2], shard_dir)
+    shard_path = shard_paths(shard_dir)[0]
+    mtime = os.stat(shard_path).st_mtime_ns
+
+    write_shards(paths, [0, 1, 2], shard_dir)
+    assert os.stat(shard_path).st_mtime_ns == mtime, "Unchanged shards should not be rewritten"
+
+    index = write_shards(paths[:2], [0, 1], shard_dir)
+    assert index["count"] == 2
+    assert len(read_all(shard_dir, "raw")) == 2
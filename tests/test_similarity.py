@@ -0,0 +1,137 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.app.similarity import EmbeddingIndex, Segment, index_tiles, kmeans, list_tiles
+
+
+def clustered_vectors(n=400, dim=16, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    return (centres[rng.integers(clusters, size=n)] + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+# Test 1: k-means returns unit-norm centroids, one per list
+def test_kmeans():
+    centroids = kmeans(clustered_vectors(), n_clusters=8)
+
+    assert centroids.shape == (8, 16)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+# Test 2: Every indexed vector finds itself first, and vectors are stored as float16
+def test_search_finds_itself(tmp_path):
+    vectors = clustered_vectors()
+    keys = [f"tile_{i}.jpg" for i in range(len(vectors))]
+    index = EmbeddingIndex.create(str(tmp_path), vectors, n_lists=8)
+    index.add(vectors, keys)
+    index.flush()
+
+    assert len(index) == len(vectors)
+    assert index.segments()[0].vectors.dtype == np.float16
+    for i in range(0, len(vectors), 37):
+        results = index.search(vectors[i], k=5, n_probe=2)
+        assert len(results) == 5
+        assert results[0][0] == keys[i]
+        assert results[0][1] > 0.99
+        assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+# Test 3: Appends are searchable before and after being flushed, and survive reopening
+def test_incremental_append(tmp_path):
+    vectors = clustered_vectors()
+    index = EmbeddingIndex.create(str(tmp_path), vectors[:200], n_lists=8, flush_size=50)
+    index.add(vectors[:200], [f"old_{i}" for i in range(200)])
+    index.flush()
+
+    index.add(vectors[200:210], [f"new_{i}" for i in range(10)])
+    assert index.search(vectors[205], k=1)[0][0] == "new_5"
+
+    index.add(vectors[210:260], [f"new_{i}" for i in range(10, 60)])
+    assert len(index.segments()) == 2
+
+    reopened = EmbeddingIndex(str(tmp_path))
+    assert len(reopened) == 260
+    assert reopened.search(vectors[205], k=1)[0][0] == "new_5"
+
+    reopened.compact()
+    assert len(reopened.segments()) == 1
+    assert reopened.keys() == index.keys()
+
+    # Keys already indexed, or repeated in a batch, are not added again
+    assert reopened.add(vectors[:3], ["old_0", "fresh", "fresh"]) == 1
+    assert len(reopened) == 261
+
+
+# Test 4: The indexing job embeds tiles in batches and only adds tiles it has not seen
+def test_index_tiles(tmp_path):
+    tile_dir = tmp_path / "tiles" / "water"
+    tile_dir.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for i in range(6):
+        cv2.imwrite(str(tile_dir / f"{i}.png"), rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+    (tile_dir / "broken.jpg").write_bytes(b"not an image")
+    batch_sizes = []
+
+    def predict_fn(batch):
+        batch_sizes.append(len(batch))
+        return batch.mean(axis=(1, 2))
+
+    index_dir = str(tmp_path / "index")
+    paths = list_tiles(str(tmp_path / "tiles"))
+    index, added = index_tiles(index_dir, paths[:4], predict_fn, batch_size=3, n_lists=2)
+    assert added == 4
+    assert batch_sizes == [3, 1]
+
+    index, added = index_tiles(index_dir, paths, predict_fn, batch_size=3)
+    assert added == 2  # The undecodable tile is skipped
+    assert len(index) == 6
+    assert os.path.join(str(tile_dir), "5.png") in index.keys()
+
+
+# Test 5: A first run larger than the training sample creates the index mid-stream
+def test_index_tiles_streams_after_training(tmp_path):
+    tile_dir = tmp_path / "tiles"
+    tile_dir.mkdir()
+    rng = np.random.default_rng(1)
+    for i in range(10):
+        cv2.imwrite(str(tile_dir / f"{i}.png"), rng.integers(0, 256, (16, 16, 3), dtype=np.uint8))
+
+    index, added = index_tiles(
+        str(tmp_path / "index"),
+        list_tiles(str(tile_dir)),
+        lambda batch: batch.mean(axis=(1, 2)),
+        batch_size=2,
+        n_lists=2,
+        training_size=4,
+    )
+
+    assert added == 10
+    assert len(EmbeddingIndex(str(tmp_path / "index"))) == 10
+
+
+# Test 6: Merging copies lists in chunks and keeps every row in its list
+def test_merge_segments(tmp_path):
+    vectors = clustered_vectors()
+    index = EmbeddingIndex.create(str(tmp_path), vectors, n_lists=8, flush_size=100)
+    for start in range(0, len(vectors), 100):
+        index.add(vectors[start : start + 100], [f"tile_{i}" for i in range(start, start + 100)])
+    segments = index.segments()
+    assert len(segments) == 4
+
+    merged = Segment(Segment.merge(index.segments_dir, segments, chunk_rows=30))
+
+    assert np.array_equal(merged.offsets, sum(segment.offsets for segment in segments))
+    assert sorted(merged.keys.tolist()) == sorted(f"tile_{i}" for i in range(len(vectors)))
+    for i in range(8):
+        expected = np.concatenate([segment.vectors[segment.rows([i])] for segment in segments])
+        np.testing.assert_array_equal(merged.vectors[merged.rows([i])], expected)
+
+
+# Test 7: An explicit n_lists is clamped to the training sample size
+def test_n_lists_clamped(tmp_path):
+    index = EmbeddingIndex.create(str(tmp_path), clustered_vectors(n=5), n_lists=64)
+
+    assert index.metadata["n_lists"] == 5
+    assert index.centroids.shape == (5, 16)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from src.app.tta import aggregate, make_tta_augmenter, tta_predict_fn
+from src.data.augmentation import augment_image_for_inference
+
+
+# Test 1: Inference views are deterministic, start with the original and stack into one batch
+def test_inference_views():
+    image = np.random.default_rng(0).random((32, 32, 3), dtype=np.float32)
+    augmenter = make_tta_augmenter()
+
+    views = augment_image_for_inference(image, augmenter, n_views=8)
+
+    assert views.shape == (8, 32, 32, 3)
+    np.testing.assert_array_equal(views[0], image)
+    np.testing.assert_array_equal(views[1], image[:, ::-1])
+    np.testing.assert_array_equal(views, augment_image_for_inference(image, augmenter, n_views=8))
+    with pytest.raises(ValueError):
+        augment_image_for_inference(image, augmenter, n_views=9)
+
+
+# Test 2: Aggregation rules return normalised probabilities per image
+def test_aggregate():
+    probabilities = np.array([[0.6, 0.4], [0.6, 0.4], [0.1, 0.9]], dtype=np.float32)
+
+    np.testing.assert_allclose(aggregate(probabilities, "mean"), [0.433333, 0.566667], rtol=1e-5)
+    np.testing.assert_allclose(aggregate(probabilities, "vote"), [2 / 3, 1 / 3], rtol=1e-5)
+    for rule in ("geometric_mean", "max"):
+        assert aggregate(probabilities, rule).sum() == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        aggregate(probabilities, "median")
+
+
+# Test 3: All views of a batch are predicted in a single call
+def test_tta_predict_fn():
+    calls = []
+
+    def predict_fn(batch):
+        calls.append(len(batch))
+        # Brightness-based two-class "model"
+        brightness = batch.mean(axis=(1, 2, 3))
+        return np.stack([brightness, 1 - brightness], axis=1)
+
+    batch = np.stack([np.full((16, 16, 3), 0.2, np.float32), np.full((16, 16, 3), 0.9, np.float32)])
+
+    predictions = tta_predict_fn(predict_fn, n_views=4)(batch)
+
+    assert calls == [8]
+    np.testing.assert_allclose(predictions, [[0.2, 0.8], [0.9, 0.1]], rtol=1e-5)
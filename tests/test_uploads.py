@@ -0,0 +1,74 @@
+import io
+import tarfile
+import zipfile
+
+from src.app.uploads import extract_images, is_archive
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_zip_deflated(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+# Test 1: Archive detection by filename
+def test_is_archive():
+    assert is_archive("tiles.zip")
+    assert is_archive("tiles.TAR.GZ")
+    assert not is_archive("tile.jpg")
+
+
+# Test 2: Only image members are extracted from zip and tar archives
+def test_extract_images():
+    members = {"a/tile_1.jpg": b"one", "b/tile_2.png": b"two", "notes.txt": b"skip"}
+
+    for filename, contents in [("tiles.zip", make_zip(members)), ("tiles.tgz", make_tar(members))]:
+        extracted = dict(extract_images(filename, contents))
+        assert extracted == {"a/tile_1.jpg": b"one", "b/tile_2.png": b"two"}
+
+
+# Test 3: Archives above the member limit are rejected
+def test_extract_images_member_limit():
+    contents = make_zip({f"tile_{i}.jpg": b"x" for i in range(5)})
+    try:
+        extract_images("tiles.zip", contents, max_members=4)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected the member limit to be enforced.")
+
+
+# Test 4: Archives whose images decompress beyond the size limit are rejected before extraction
+def test_extract_images_size_limit():
+    # 10 MB of zeros compress to a few kilobytes
+    members = {"bomb.png": bytes(10 << 20)}
+
+    for filename, contents in [("tiles.zip", make_zip_deflated(members)), ("tiles.tgz", make_tar(members))]:
+        assert len(contents) < 100_000
+        try:
+            extract_images(filename, contents, max_bytes=1 << 20)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Expected the size limit to be enforced.")
+        assert len(extract_images(filename, contents, max_bytes=20 << 20)) == 1